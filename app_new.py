@@ -9,7 +9,6 @@ import os
 from flask import Flask
 from flask_pymongo import PyMongo
 import logging
-import pytz
 
 # Global extensions
 mongo = PyMongo()
@@ -60,16 +59,24 @@ def create_app(config_name=None):
     from routes.auth import auth_bp
     from routes.routes import routes_bp
     from routes.pois import pois_bp
+    from routes.search import search_bp
+    from routes.coverage import coverage_bp
     
     app.register_blueprint(main_bp)
     app.register_blueprint(auth_bp)  # Prefix: /auth
     app.register_blueprint(routes_bp)  # Prefix: /api/routes
     app.register_blueprint(pois_bp)  # Prefix: /api/pois
+    app.register_blueprint(search_bp)  # Prefix: /api/search
+    app.register_blueprint(coverage_bp)  # Prefix: /api/coverage
     
     # Register error handlers
     from utils.error_handlers import register_error_handlers
     register_error_handlers(app)
     
+    # Register CLI commands
+    from utils.cli import register_commands
+    register_commands(app)
+    
     # Set up logging
     if not app.debug and not app.testing:
         logging.basicConfig(
@@ -77,6 +84,11 @@ def create_app(config_name=None):
             format='%(asctime)s %(levelname)s: %(message)s'
         )
     
+    # Structured per-request logging (after handlers exist so the async
+    # listener can take them over)
+    from utils.request_logging import init_request_logging
+    init_request_logging(app)
+    
     return app
 
 # For WSGI servers, they will call create_app() directly
@@ -0,0 +1,60 @@
+"""
+Run the routing benchmarks.
+
+    python -m benchmarks --sizes 30,300,3000 --save benchmarks/baselines/local.json
+    python -m benchmarks --check benchmarks/baselines/local.json --threshold 0.15
+
+Exits with status 1 when ``--check`` finds a p50/p95 regression.
+"""
+import argparse
+import json
+import sys
+from benchmarks.cases import run_suite
+from benchmarks.harness import compare, load_results, save_results
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', default='30,300,3000', help='comma-separated route counts')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--od-pairs', type=int, default=50, help='origin/destination pairs per size')
+    parser.add_argument('--save', metavar='PATH', help='write results as a JSON baseline')
+    parser.add_argument('--check', metavar='PATH', help='compare against a saved baseline')
+    parser.add_argument('--threshold', type=float, default=0.20,
+                        help='allowed relative p50/p95 slowdown before failing (default 0.20)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    report = run_suite(sizes, args.seed, args.od_pairs)
+
+    for size, cases in report['results'].items():
+        print(f"\n{size} routes")
+        for case, stats in sorted(cases.items()):
+            print(f"  {case:<22} p50 {stats['p50_ms']:>10.3f} ms   p95 {stats['p95_ms']:>10.3f} ms   n={stats['n']}")
+        for counter, stats in sorted(report['counters'].get(size, {}).items()):
+            print(f"  {counter:<22} p50 {stats['p50']:>10}      p95 {stats['p95']:>10}      n={stats['n']}")
+        for case, reason in report['skipped'].get(size, {}).items():
+            print(f"  {case:<22} skipped: {reason}")
+
+    if args.save:
+        save_results(report, args.save)
+        print(f"\nBaseline written to {args.save}")
+
+    if args.check:
+        baseline = load_results(args.check)
+        if baseline['meta'].get('seed') != args.seed:
+            print("Warning: baseline was recorded with a different seed", file=sys.stderr)
+        regressions = compare(baseline, report, args.threshold)
+        if regressions:
+            print("\nRegressions:")
+            print(json.dumps(regressions, indent=2))
+            return 1
+        print("\nNo regressions against baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
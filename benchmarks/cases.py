@@ -0,0 +1,174 @@
+"""
+Benchmark cases for the routing engine.
+
+Each network size runs in its own process so that engines which build their
+graph at import time load the synthetic network for that size.
+"""
+import platform
+import time
+from contextlib import contextmanager
+from unittest import mock
+from route_generation.models.route_models import Coordinate, RouteResult, RouteSegment
+from benchmarks.harness import in_memory_mongo, instrument, resolve, summarize, summarize_counts, time_calls
+from benchmarks.synthetic_network import generate_network, generate_od_pairs, polyline_length_km
+
+ROUTE_GENERATOR = 'route_gen_clean.route_generator'
+
+# Engine internals timed in situ while the end-to-end benchmark runs
+ENGINE_STAGES = {
+    'nearby_edges': 'route_generation.RouteGenerator._find_nearby_edges',
+    'select_best_routes': 'route_generation.RouteGenerator._select_best_routes',
+    'engine_to_geojson': 'route_generation.models.route_models.RouteResult.to_geojson',
+}
+
+# Same stages for the CSR engine that serves requests when a snapshot exists
+CSR_ENGINE_STAGES = {
+    'csr_nearby_edges': 'route_generation.services.routing_engine.RoutingEngine._find_access',
+    'csr_search': 'route_generation.services.routing_engine.RoutingEngine._search',
+    'csr_select_best_routes': 'route_generation.services.routing_engine.RoutingEngine._select_best_routes',
+}
+
+DEFAULT_WALK_RADIUS = 100.0
+
+
+def synthetic_route_results(routes, count):
+    """Two-ride RouteResults built straight from the synthetic polylines."""
+    results = []
+    for index in range(count):
+        first = routes[index % len(routes)]
+        second = routes[(index * 7 + 3) % len(routes)]
+        segments = []
+        for route in (first, second):
+            coords = [Coordinate.from_tuple(tuple(c)) for c in route['coordinates'][:40]]
+            segments.append(RouteSegment(
+                route_name=route['name'],
+                start_coordinate=coords[0],
+                end_coordinate=coords[-1],
+                distance_km=polyline_length_km(route['coordinates'][:40]),
+                fare=13.0,
+                coordinates=coords,
+            ))
+        results.append(RouteResult(
+            segments=segments,
+            total_distance_km=sum(s.distance_km for s in segments),
+            total_fare=sum(s.fare for s in segments),
+            total_transfers=1,
+            walk_distance_km=0.1,
+            iteration=index,
+        ))
+    return results
+
+
+def run_size(size, seed, od_count):
+    """Run every case against a network of ``size`` routes."""
+    routes = generate_network(size, seed=seed)
+    pairs = generate_od_pairs(routes, od_count, seed=seed)
+    results, skipped = {}, {}
+
+    geojson_inputs = [(r,) for r in synthetic_route_results(routes, od_count)]
+    results['to_geojson'] = summarize(time_calls(RouteResult.to_geojson, geojson_inputs))
+
+    with in_memory_mongo(routes):
+        try:
+            _, _, route_generator = resolve(ROUTE_GENERATOR)
+        except (ImportError, AttributeError) as e:
+            skipped['route_generator'] = str(e)
+        else:
+            with instrument(ENGINE_STAGES) as recorded:
+                durations = time_calls(
+                    route_generator,
+                    [(origin, destination, DEFAULT_WALK_RADIUS) for origin, destination in pairs],
+                )
+            results['route_generator'] = summarize(durations)
+            skipped.update(recorded.pop('_skipped'))
+            for label, stage_durations in recorded.items():
+                if stage_durations:
+                    results[label] = summarize(stage_durations)
+
+    csr_results, counters = run_csr_engine(routes, pairs)
+    results.update(csr_results)
+    return {'results': results, 'skipped': skipped, 'counters': counters}
+
+
+@contextmanager
+def count_expansions(engine):
+    """Record ``visited_nodes`` of every search ``engine`` runs."""
+    expanded = []
+    search = engine._search
+
+    def counted(*args, **kwargs):
+        result = search(*args, **kwargs)
+        expanded.append(result.visited_nodes)
+        return result
+
+    with mock.patch.object(engine, '_search', counted):
+        yield expanded
+
+
+def run_csr_engine(routes, pairs):
+    """Time snapshot compilation and the CSR engine end to end and per stage.
+
+    Requests run once per search heuristic; the second element of the return
+    value holds the nodes expanded per search for each heuristic.
+    """
+    from route_generation.models.route_models import RouteOptions
+    from route_generation.services.graph_snapshot import compile_network
+    from route_generation.services.landmarks import attach_landmarks, compute_landmarks
+    from route_generation.services.routing_engine import DEFAULT_TRANSFER_PENALTY_KM, RoutingEngine
+    from route_generation.services.transfer_index import attach_transfers, compute_transfers
+
+    results, counters = {}, {}
+    start = time.perf_counter()
+    network = compile_network(routes)
+    results['snapshot_compile'] = summarize([(time.perf_counter() - start) * 1000.0])
+
+    start = time.perf_counter()
+    network = attach_transfers(network, compute_transfers(network))
+    results['transfer_index'] = summarize([(time.perf_counter() - start) * 1000.0])
+
+    start = time.perf_counter()
+    landmarks = compute_landmarks(network, transfer_penalty_km=DEFAULT_TRANSFER_PENALTY_KM)
+    network = attach_landmarks(network, landmarks, DEFAULT_TRANSFER_PENALTY_KM)
+    results['landmarks'] = summarize([(time.perf_counter() - start) * 1000.0])
+
+    engine = RoutingEngine(network)
+    for heuristic, label in (('haversine', 'csr_generate_route'), ('alt', 'csr_generate_route_alt')):
+        options = RouteOptions.from_dict({'heuristic': heuristic})
+        args = [(origin, destination, DEFAULT_WALK_RADIUS, options) for origin, destination in pairs]
+        stages = CSR_ENGINE_STAGES if heuristic == 'haversine' else {}
+        with instrument(stages) as recorded, count_expansions(engine) as expanded:
+            results[label] = summarize(time_calls(engine.generate_route, args))
+        counters[f'expanded_{heuristic}'] = summarize_counts(expanded)
+        recorded.pop('_skipped')
+        for stage, stage_durations in recorded.items():
+            if stage_durations:
+                results[stage] = summarize(stage_durations)
+    return results, counters
+
+
+def run_suite(sizes, seed, od_count):
+    """Run ``run_size`` for every size in a fresh process."""
+    import multiprocessing
+
+    report = {
+        'meta': {
+            'seed': seed,
+            'sizes': list(sizes),
+            'od_pairs': od_count,
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': {},
+        'skipped': {},
+        'counters': {},
+    }
+    context = multiprocessing.get_context('spawn')
+    for size in sizes:
+        with context.Pool(1) as pool:
+            outcome = pool.apply(run_size, (size, seed, od_count))
+        report['results'][str(size)] = outcome['results']
+        report['counters'][str(size)] = outcome['counters']
+        if outcome['skipped']:
+            report['skipped'][str(size)] = outcome['skipped']
+    return report
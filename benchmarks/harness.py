@@ -0,0 +1,178 @@
+"""
+Timing, instrumentation and baseline comparison helpers for the benchmarks.
+"""
+import importlib
+import json
+import math
+import time
+from contextlib import contextmanager
+from functools import wraps
+from unittest import mock
+
+BENCHMARK_DB_NAME = 'publink_bench'
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(durations_ms):
+    """Reduce raw durations to the statistics stored in baselines."""
+    ordered = sorted(durations_ms)
+    return {
+        'n': len(ordered),
+        'p50_ms': round(percentile(ordered, 0.50), 4),
+        'p95_ms': round(percentile(ordered, 0.95), 4),
+        'mean_ms': round(sum(ordered) / len(ordered), 4) if ordered else 0.0,
+    }
+
+
+def summarize_counts(values):
+    """Same statistics for unitless counts (e.g. nodes expanded per search)."""
+    ordered = sorted(values)
+    return {
+        'n': len(ordered),
+        'p50': percentile(ordered, 0.50),
+        'p95': percentile(ordered, 0.95),
+        'mean': round(sum(ordered) / len(ordered), 1) if ordered else 0.0,
+    }
+
+
+def time_calls(fn, args_list, warmup=1):
+    """Call ``fn(*args)`` for each entry and return per-call durations in ms."""
+    for args in args_list[:warmup]:
+        fn(*args)
+    durations = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        durations.append((time.perf_counter() - start) * 1000.0)
+    return durations
+
+
+def resolve(dotted_path):
+    """Import ``package.module.Attr.attr`` and return (owner, name, value)."""
+    parts = dotted_path.split('.')
+    for split in range(len(parts) - 1, 0, -1):
+        try:
+            owner = importlib.import_module('.'.join(parts[:split]))
+        except ImportError:
+            continue
+        for name in parts[split:-1]:
+            owner = getattr(owner, name)
+        return owner, parts[-1], getattr(owner, parts[-1])
+    raise ImportError(f"Cannot import {dotted_path}")
+
+
+@contextmanager
+def instrument(targets):
+    """Wrap each ``{label: dotted_path}`` target with a timer.
+
+    Yields a dict mapping label to the list of recorded durations (ms).
+    Targets that cannot be imported are skipped and reported under
+    ``'_skipped'``.
+    """
+    recorded = {'_skipped': {}}
+    patches = []
+    for label, path in targets.items():
+        try:
+            owner, name, original = resolve(path)
+        except (ImportError, AttributeError) as e:
+            recorded['_skipped'][label] = str(e)
+            continue
+        durations = recorded.setdefault(label, [])
+
+        def make_wrapper(func, sink):
+            @wraps(func)
+            def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    sink.append((time.perf_counter() - start) * 1000.0)
+            return timed
+
+        patches.append(mock.patch.object(owner, name, make_wrapper(original, durations)))
+    for patcher in patches:
+        patcher.start()
+    try:
+        yield recorded
+    finally:
+        for patcher in reversed(patches):
+            patcher.stop()
+
+
+@contextmanager
+def in_memory_mongo(route_documents):
+    """Point every ``pymongo.MongoClient`` at one seeded in-memory database.
+
+    Whatever database name the engine asks for, it gets the same mongomock
+    database holding the synthetic ``jeepney_routes`` collection.
+    """
+    import mongomock
+
+    class SeededClient(mongomock.MongoClient):
+        def get_database(self, name=None, *args, **kwargs):
+            return super().get_database(BENCHMARK_DB_NAME, *args, **kwargs)
+
+    client = SeededClient()
+    client[BENCHMARK_DB_NAME].jeepney_routes.insert_many([dict(doc) for doc in route_documents])
+
+    with mock.patch('pymongo.MongoClient', lambda *args, **kwargs: client):
+        yield client[BENCHMARK_DB_NAME]
+
+
+def attach_in_memory_mongo(app, route_documents=(), pois=()):
+    """Swap the app's PyMongo connection for a seeded in-memory database."""
+    import mongomock
+
+    client = mongomock.MongoClient()
+    db = client[BENCHMARK_DB_NAME]
+    if route_documents:
+        db.jeepney_routes.insert_many([dict(doc) for doc in route_documents])
+        db.route_descriptions.insert_many([
+            {"route_id": doc["name"], "route_name": doc["name"], "route_desc": f"{doc['name']} loop"}
+            for doc in route_documents
+        ])
+    if pois:
+        db.iloilo_pois.insert_many([dict(poi) for poi in pois])
+
+    mongo = app.extensions['pymongo']
+    mongo.cx = client
+    mongo.db = db
+    return db
+
+
+def load_results(path):
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def save_results(results, path):
+    with open(path, 'w') as fh:
+        json.dump(results, fh, indent=2, sort_keys=True)
+
+
+def compare(baseline, current, threshold):
+    """Return a list of regressions where p50 or p95 grew beyond ``threshold``."""
+    regressions = []
+    for size, cases in current['results'].items():
+        for case, stats in cases.items():
+            base = baseline.get('results', {}).get(size, {}).get(case)
+            if not base:
+                continue
+            for metric in ('p50_ms', 'p95_ms'):
+                if base[metric] > 0 and stats[metric] > base[metric] * (1.0 + threshold):
+                    regressions.append({
+                        'size': size,
+                        'case': case,
+                        'metric': metric,
+                        'baseline': base[metric],
+                        'current': stats[metric],
+                        'ratio': round(stats[metric] / base[metric], 3),
+                    })
+    return regressions
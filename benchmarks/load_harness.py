@@ -0,0 +1,218 @@
+"""
+Traffic replay load harness for the full Flask app.
+
+Each worker process builds the app through ``create_app('testing')`` on an
+in-memory MongoDB, mints a JWT through ``/auth/test-token`` and replays a
+request mix through the WSGI stack (``jwt_required``, ``handle_errors``,
+``after_request`` hooks, Mongo writes and JSON encoding included) from
+several threads.
+
+    python -m benchmarks.load_harness --workers 4 --concurrency 16 --duration 30
+    python -m benchmarks.load_harness --replay recorded.ndjson --save load.json
+
+Recorded traffic is NDJSON, one ``{"method", "path", "json"}`` object per
+line. Without ``--replay`` a synthetic mix of ``/api/routes/generate``,
+``/api/routes/history``, ``/api/pois/`` and ``/api/routes/<id>`` is used.
+"""
+import argparse
+import itertools
+import json
+import random
+import resource
+import sys
+import threading
+import time
+from benchmarks.harness import attach_in_memory_mongo, percentile, save_results
+from benchmarks.synthetic_network import generate_network, generate_od_pairs, generate_pois
+
+# (label, weight) of the synthetic request mix
+SYNTHETIC_MIX = (
+    ('generate', 0.55),
+    ('history', 0.15),
+    ('pois', 0.20),
+    ('route', 0.10),
+)
+
+
+def synthetic_requests(routes, count, seed):
+    """Build ``count`` synthetic requests following ``SYNTHETIC_MIX``."""
+    rng = random.Random(seed)
+    labels, weights = zip(*SYNTHETIC_MIX)
+    pairs = generate_od_pairs(routes, max(1, count), seed=seed)
+    requests = []
+    for index in range(count):
+        label = rng.choices(labels, weights)[0]
+        if label == 'generate':
+            origin, destination = pairs[index % len(pairs)]
+            requests.append({
+                'label': label,
+                'method': 'POST',
+                'path': '/api/routes/generate',
+                'json': {
+                    'origin': {'lng': origin[0], 'lat': origin[1]},
+                    'destination': {'lng': destination[0], 'lat': destination[1]},
+                    'walk_radius': 100,
+                },
+            })
+        elif label == 'history':
+            requests.append({'label': label, 'method': 'GET', 'path': '/api/routes/history'})
+        elif label == 'pois':
+            requests.append({'label': label, 'method': 'GET', 'path': '/api/pois/'})
+        else:
+            route = rng.choice(routes)
+            requests.append({'label': label, 'method': 'GET', 'path': f"/api/routes/{route['name']}"})
+    return requests
+
+
+def load_recorded(path):
+    """Read recorded NDJSON traffic."""
+    with open(path) as fh:
+        requests = [json.loads(line) for line in fh if line.strip()]
+    for entry in requests:
+        entry.setdefault('method', 'GET')
+        entry.setdefault('label', entry['path'].split('?')[0])
+    return requests
+
+
+def current_rss_mb():
+    """Resident set size of this process from /proc, falling back to peak RSS."""
+    try:
+        with open('/proc/self/statm') as fh:
+            pages = int(fh.read().split()[1])
+        return round(pages * resource.getpagesize() / 1048576.0, 1)
+    except OSError:
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1)
+
+
+def run_worker(worker_index, requests, threads, duration, network_size, seed):
+    """Replay ``requests`` from ``threads`` threads inside one worker process."""
+    from app_new import create_app
+
+    app = create_app('testing')
+    routes = generate_network(network_size, seed=seed)
+    attach_in_memory_mongo(app, routes, generate_pois(routes, 500, seed=seed))
+
+    bootstrap = app.test_client()
+    token = bootstrap.post('/auth/test-token', json={'user_id': f'load-{worker_index}'}).get_json()['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    cursor = itertools.cycle(requests)
+    cursor_lock = threading.Lock()
+    samples = []
+    samples_lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def replay():
+        client = app.test_client()
+        local = []
+        while time.monotonic() < deadline:
+            with cursor_lock:
+                entry = next(cursor)
+            start = time.perf_counter()
+            response = client.open(entry['path'], method=entry['method'], json=entry.get('json'), headers=headers)
+            local.append((entry['label'], response.status_code, (time.perf_counter() - start) * 1000.0))
+        with samples_lock:
+            samples.extend(local)
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=replay) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    from utils import metrics
+
+    return {
+        'worker': worker_index,
+        'elapsed_s': elapsed,
+        'samples': samples,
+        'metrics': metrics.snapshot(),
+        'rss_mb': current_rss_mb(),
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1),
+    }
+
+
+def latency_stats(latencies):
+    ordered = sorted(latencies)
+    return {
+        'count': len(ordered),
+        'p50_ms': round(percentile(ordered, 0.50), 3),
+        'p95_ms': round(percentile(ordered, 0.95), 3),
+        'p99_ms': round(percentile(ordered, 0.99), 3),
+    }
+
+
+def build_report(worker_results, wall_time, args):
+    all_samples = [sample for result in worker_results for sample in result['samples']]
+    by_label = {}
+    statuses = {}
+    for label, status, latency in all_samples:
+        by_label.setdefault(label, []).append(latency)
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    return {
+        'meta': {
+            'workers': args.workers,
+            'concurrency': args.concurrency,
+            'duration_s': args.duration,
+            'network_size': args.network_size,
+            'seed': args.seed,
+            'replay': args.replay,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'throughput_rps': round(len(all_samples) / wall_time, 2) if wall_time else 0.0,
+        'overall': latency_stats([latency for _, _, latency in all_samples]),
+        'endpoints': {label: latency_stats(values) for label, values in sorted(by_label.items())},
+        'status_counts': statuses,
+        'workers': [
+            {'worker': r['worker'], 'requests': len(r['samples']), 'rss_mb': r['rss_mb'], 'peak_rss_mb': r['peak_rss_mb'],
+             'metrics': r['metrics']}
+            for r in worker_results
+        ],
+    }
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.load_harness')
+    parser.add_argument('--workers', type=int, default=2, help='worker processes, like gunicorn workers')
+    parser.add_argument('--concurrency', type=int, default=8, help='total concurrent clients across workers')
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds to replay traffic')
+    parser.add_argument('--replay', metavar='NDJSON', help='recorded traffic to replay instead of the synthetic mix')
+    parser.add_argument('--requests', type=int, default=2000, help='size of the synthetic request mix')
+    parser.add_argument('--network-size', type=int, default=32, help='synthetic route count')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--save', metavar='PATH', help='write the report as JSON')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    import multiprocessing
+
+    args = parse_args(argv)
+    if args.replay:
+        requests = load_recorded(args.replay)
+    else:
+        requests = synthetic_requests(generate_network(args.network_size, seed=args.seed), args.requests, args.seed)
+
+    threads_per_worker = max(1, args.concurrency // args.workers)
+    context = multiprocessing.get_context('spawn')
+    started = time.perf_counter()
+    with context.Pool(args.workers) as pool:
+        worker_results = pool.starmap(run_worker, [
+            (index, requests[index::args.workers] or requests, threads_per_worker,
+             args.duration, args.network_size, args.seed)
+            for index in range(args.workers)
+        ])
+    wall_time = max(result['elapsed_s'] for result in worker_results) or (time.perf_counter() - started)
+
+    report = build_report(worker_results, wall_time, args)
+    print(json.dumps({key: report[key] for key in ('throughput_rps', 'overall', 'endpoints', 'status_counts', 'workers')}, indent=2))
+    if args.save:
+        save_results(report, args.save)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
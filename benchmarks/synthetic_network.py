@@ -0,0 +1,102 @@
+"""
+Seeded synthetic jeepney network generator.
+
+Produces ``jeepney_routes`` documents shaped like the production collection
+(``name``, ``uid``, ``coordinates`` as ``[lng, lat]`` pairs) so benchmarks
+can run offline at any network size. The same seed always yields the same
+network and the same origin/destination pairs.
+"""
+import math
+import random
+
+# Approximate Iloilo City service area (lng/lat)
+SERVICE_AREA = (122.50, 10.67, 122.60, 10.76)
+
+# Roughly one city block
+STREET_SPACING_DEG = 0.0012
+
+_HEADINGS = [(1, 0), (0, 1), (-1, 0), (0, -1)]
+
+
+def _clamp(value, low, high):
+    return max(low, min(high, value))
+
+
+def _route_polyline(rng, min_vertices, max_vertices):
+    """Random walk on a jittered street grid that returns to its start."""
+    min_lng, min_lat, max_lng, max_lat = SERVICE_AREA
+    lng = rng.uniform(min_lng, max_lng)
+    lat = rng.uniform(min_lat, max_lat)
+    heading = rng.randrange(4)
+
+    outbound = [(lng, lat)]
+    for _ in range(rng.randint(min_vertices, max_vertices) // 2):
+        # Mostly keep going straight, sometimes turn at an intersection
+        if rng.random() < 0.25:
+            heading = (heading + rng.choice((1, 3))) % 4
+        dx, dy = _HEADINGS[heading]
+        step = STREET_SPACING_DEG * rng.uniform(0.6, 1.4)
+        lng = _clamp(lng + dx * step + rng.gauss(0, step * 0.05), min_lng, max_lng)
+        lat = _clamp(lat + dy * step + rng.gauss(0, step * 0.05), min_lat, max_lat)
+        outbound.append((lng, lat))
+
+    # Jeepneys loop back along a parallel street, offset a few metres
+    offset = STREET_SPACING_DEG * 0.05
+    inbound = [(x + offset, y + offset) for x, y in reversed(outbound[:-1])]
+    return [[round(x, 7), round(y, 7)] for x, y in outbound + inbound]
+
+
+def generate_network(route_count, seed=0, min_vertices=40, max_vertices=120):
+    """Return ``route_count`` synthetic ``jeepney_routes`` documents."""
+    rng = random.Random(seed)
+    return [
+        {
+            "name": f"Route {index + 1}",
+            "uid": index + 1,
+            "coordinates": _route_polyline(rng, min_vertices, max_vertices),
+        }
+        for index in range(route_count)
+    ]
+
+
+def generate_od_pairs(routes, count, seed=0, jitter_meters=60.0):
+    """Sample origin/destination pairs near vertices of two random routes."""
+    rng = random.Random(seed + 1)
+    jitter_deg = jitter_meters / 111320.0
+    pairs = []
+    for _ in range(count):
+        start_route, end_route = rng.choice(routes), rng.choice(routes)
+        start = rng.choice(start_route["coordinates"])
+        end = rng.choice(end_route["coordinates"])
+        pairs.append((
+            (start[0] + rng.uniform(-jitter_deg, jitter_deg), start[1] + rng.uniform(-jitter_deg, jitter_deg)),
+            (end[0] + rng.uniform(-jitter_deg, jitter_deg), end[1] + rng.uniform(-jitter_deg, jitter_deg)),
+        ))
+    return pairs
+
+
+def polyline_length_km(coordinates):
+    """Haversine length of a ``[lng, lat]`` polyline in kilometres."""
+    total = 0.0
+    for (lng1, lat1), (lng2, lat2) in zip(coordinates, coordinates[1:]):
+        phi1, phi2 = math.radians(lat1), math.radians(lat2)
+        dphi = phi2 - phi1
+        dlmb = math.radians(lng2 - lng1)
+        a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+        total += 2 * 6371.0088 * math.asin(math.sqrt(a))
+    return total
+
+
+def generate_pois(routes, count, seed=0):
+    """Points of interest scattered along the synthetic routes."""
+    rng = random.Random(seed + 2)
+    categories = ('school', 'mall', 'hospital', 'church', 'terminal', 'market')
+    pois = []
+    for index in range(count):
+        lng, lat = rng.choice(rng.choice(routes)["coordinates"])
+        pois.append({
+            "name": f"Place {index + 1}",
+            "category": rng.choice(categories),
+            "coordinates": [lng, lat],
+        })
+    return pois
@@ -1,7 +1,13 @@
 import os
 import json
+import tempfile
 from datetime import timedelta
 
+basedir = os.path.abspath(os.path.dirname(__file__))
+
+# Worker processes per host, as gunicorn.conf.py computes them
+_web_workers = int(os.environ.get('WEB_CONCURRENCY') or (os.cpu_count() or 1) * 2 + 1)
+
 
 class Config:
     """Base configuration class."""
@@ -25,6 +31,90 @@ class Config:
     # Rate Limiting
     RATELIMIT_STORAGE_URL = os.environ.get('REDIS_URL', 'memory://')
     
+    # Request logging
+    # Fraction of requests whose payloads are logged at DEBUG level
+    REQUEST_LOG_SAMPLE_RATE = float(os.environ.get('REQUEST_LOG_SAMPLE_RATE', '0.0'))
+    # Write log records from a background thread instead of the request thread
+    REQUEST_LOG_ASYNC = os.environ.get('REQUEST_LOG_ASYNC', 'false').lower() == 'true'
+    
+    # Route network snapshot (built with `flask build-graph-snapshot`)
+    GRAPH_SNAPSHOT_PATH = os.environ.get('GRAPH_SNAPSHOT_PATH') or os.path.join(basedir, 'data', 'network.snapshot')
+    # Longest walk between two routes precomputed as a transfer
+    TRANSFER_MAX_WALK_METERS = float(os.environ.get('TRANSFER_MAX_WALK_METERS', '200'))
+    # Landmarks precomputed for the ALT heuristic (0 disables)
+    GRAPH_LANDMARK_COUNT = int(os.environ.get('GRAPH_LANDMARK_COUNT', '8'))
+    # Per-request search limits; past either, the best routes so far are returned (0 disables)
+    SEARCH_MAX_EXPANSIONS = int(os.environ.get('SEARCH_MAX_EXPANSIONS', '200000'))
+    SEARCH_DEADLINE_SECONDS = float(os.environ.get('SEARCH_DEADLINE_SECONDS', '10'))
+    # Share one search between concurrent identical route requests
+    ROUTE_COALESCE = os.environ.get('ROUTE_COALESCE', 'true').lower() == 'true'
+    # Decimal places origin/destination are snapped to for coalescing (5 is about 1 m)
+    ROUTE_COALESCE_PRECISION = int(os.environ.get('ROUTE_COALESCE_PRECISION', '5'))
+    # Directory for lock files that coalesce across workers on a host (empty = per worker only)
+    ROUTE_COALESCE_DIR = os.environ.get('ROUTE_COALESCE_DIR', '')
+    # Longest a duplicate request waits before searching itself (0 = no limit)
+    ROUTE_COALESCE_TIMEOUT = float(os.environ.get('ROUTE_COALESCE_TIMEOUT', '15'))
+    # Completed route results reused for identical requests (0 entries = off)
+    ROUTE_CACHE_SIZE = int(os.environ.get('ROUTE_CACHE_SIZE', '1024'))
+    ROUTE_CACHE_TTL = float(os.environ.get('ROUTE_CACHE_TTL', '300'))
+    # Admission control for route searches; cache hits and coalesced requests skip it
+    ROUTE_ADMISSION = os.environ.get('ROUTE_ADMISSION', 'true').lower() == 'true'
+    # Concurrent searches per worker process (only matters with threaded workers)
+    ROUTE_ADMISSION_WORKER_LIMIT = int(os.environ.get('ROUTE_ADMISSION_WORKER_LIMIT', '2'))
+    # Directory of slot lock files that cap searches across the host's workers
+    ROUTE_ADMISSION_DIR = os.environ.get('ROUTE_ADMISSION_DIR') or os.path.join(tempfile.gettempdir(), 'publink-admission')
+    # Concurrent searches per host, below the worker count so the rest stay free for
+    # cheap endpoints (default: CPU count, at most workers - 1; 0 = per worker only)
+    ROUTE_ADMISSION_HOST_LIMIT = int(os.environ.get('ROUTE_ADMISSION_HOST_LIMIT')
+                                     or max(1, min(os.cpu_count() or 1, _web_workers - 1)))
+    # Searches allowed to wait for a slot, and for how long, before a 503 with Retry-After
+    ROUTE_ADMISSION_QUEUE = int(os.environ.get('ROUTE_ADMISSION_QUEUE', '8'))
+    ROUTE_ADMISSION_MAX_WAIT = float(os.environ.get('ROUTE_ADMISSION_MAX_WAIT', '2'))
+    # Pre-warm the route cache with the busiest origin/destination pairs in user_history
+    ROUTE_WARM = os.environ.get('ROUTE_WARM', 'true').lower() == 'true'
+    ROUTE_WARM_TOP_N = int(os.environ.get('ROUTE_WARM_TOP_N', '200'))
+    ROUTE_WARM_HISTORY_LIMIT = int(os.environ.get('ROUTE_WARM_HISTORY_LIMIT', '50000'))
+    # Seconds between scheduled warming passes (0 = only at startup and after reloads)
+    ROUTE_WARM_INTERVAL = float(os.environ.get('ROUTE_WARM_INTERVAL', '3600'))
+    # Pause between warmed routes, so warming never competes with live searches
+    ROUTE_WARM_PAUSE = float(os.environ.get('ROUTE_WARM_PAUSE', '0.05'))
+    # Walk-access coverage grid built by `flask build-coverage` and served on /api/coverage
+    COVERAGE_PATH = os.environ.get('COVERAGE_PATH') or os.path.join(basedir, 'data', 'coverage.grid')
+    # Cell size (0.0005 deg is about 55 m) and farthest distance measured, in metres
+    COVERAGE_CELL_DEG = float(os.environ.get('COVERAGE_CELL_DEG', '0.0005'))
+    COVERAGE_MAX_DISTANCE_M = float(os.environ.get('COVERAGE_MAX_DISTANCE_M', '1000'))
+    # Default walking distance counted as covered, and most cells per response
+    COVERAGE_WALK_METERS = float(os.environ.get('COVERAGE_WALK_METERS', '400'))
+    COVERAGE_MAX_CELLS = int(os.environ.get('COVERAGE_MAX_CELLS', '250000'))
+    # How often /db-test, /debug-routes and /diagnostics re-query MongoDB in the background
+    DIAGNOSTICS_REFRESH_SECONDS = float(os.environ.get('DIAGNOSTICS_REFRESH_SECONDS', '60'))
+    # Route map tiles, generated per snapshot into TILE_CACHE_DIR/<network_id>
+    TILE_CACHE_DIR = os.environ.get('TILE_CACHE_DIR') or os.path.join(basedir, 'data', 'tiles')
+    TILE_MIN_ZOOM = int(os.environ.get('TILE_MIN_ZOOM', '10'))
+    TILE_MAX_ZOOM = int(os.environ.get('TILE_MAX_ZOOM', '16'))
+    TILE_PREGENERATE = os.environ.get('TILE_PREGENERATE', 'true').lower() == 'true'
+    TILE_MAX_AGE = int(os.environ.get('TILE_MAX_AGE', '86400'))
+    # Most origins (and most destinations) accepted by /api/routes/matrix
+    ROUTE_MATRIX_MAX_POINTS = int(os.environ.get('ROUTE_MATRIX_MAX_POINTS', '100'))
+    # /api/routes/reachable snaps origins to cells this size and caches results per cell
+    REACHABLE_CELL_DEG = float(os.environ.get('REACHABLE_CELL_DEG', '0.001'))
+    REACHABLE_CACHE_SIZE = int(os.environ.get('REACHABLE_CACHE_SIZE', '512'))
+    REACHABLE_CACHE_TTL = float(os.environ.get('REACHABLE_CACHE_TTL', '3600'))
+
+    # In-memory POI grid index for /api/pois/nearby; rebuilt from Mongo once this old
+    POI_INDEX_CELL_DEG = float(os.environ.get('POI_INDEX_CELL_DEG', '0.005'))
+    POI_INDEX_TTL = float(os.environ.get('POI_INDEX_TTL', '300'))
+    POI_NEARBY_MAX_RADIUS = float(os.environ.get('POI_NEARBY_MAX_RADIUS', '5000'))
+    POI_NEARBY_MAX_LIMIT = int(os.environ.get('POI_NEARBY_MAX_LIMIT', '100'))
+    # User ids (token "sub") allowed to use POST /api/pois/bulk, comma-separated
+    POI_ADMIN_USERS = frozenset(filter(None, os.environ.get('POI_ADMIN_USERS', '').split(',')))
+    # /api/search autocomplete index over POI and route names
+    AUTOCOMPLETE_INDEX_TTL = float(os.environ.get('AUTOCOMPLETE_INDEX_TTL', '600'))
+    # Score boost per log-count of user_history entries using a place or route (0 disables)
+    AUTOCOMPLETE_POPULARITY_WEIGHT = float(os.environ.get('AUTOCOMPLETE_POPULARITY_WEIGHT', '0.2'))
+    # Latest user_history entries read for POI and route popularity
+    AUTOCOMPLETE_HISTORY_LIMIT = int(os.environ.get('AUTOCOMPLETE_HISTORY_LIMIT', '20000'))
+    
     # Timezone
     TIMEZONE = 'Asia/Manila'
     
@@ -68,6 +158,10 @@ class TestingConfig(Config):
     DEBUG = True
     TESTING = True
     MONGO_URI = 'mongodb://localhost:27017/publink_test'
+    RATELIMIT_ENABLED = False
+    # Render tiles on request instead of writing a tile cache
+    TILE_PREGENERATE = False
+    ROUTE_WARM = False
 
 
 # Configuration mapping
@@ -48,6 +48,15 @@ tmp_upload_dir = None
 def when_ready(server):
     """Called just after the server is started."""
     server.log.info("PubLink server is ready. Listening on: %s", server.address)
+    # Load the route network once in the master so forked (and recycled)
+    # workers share it instead of each loading it on their first request
+    try:
+        from services.route_service import load_routing_engine
+        from services.network_service import get_network
+        get_network()
+        load_routing_engine()
+    except Exception as e:
+        server.log.warning("Routing engine warm-up failed: %s", e)
 
 def worker_int(worker):
     """Called just after a worker has been interrupted by SIGINT."""
@@ -61,6 +70,30 @@ def post_fork(server, worker):
     """Called just after a worker has been forked."""
     server.log.info("Worker spawned (pid: %s)", worker.pid)
 
+def post_worker_init(worker):
+    """Called just after a worker has initialized the application."""
+    # `kill -USR2 <worker pid>` samples that worker for PROFILE_SECONDS and
+    # writes a collapsed-stack file to PROFILE_DIR. Send it to a worker, never
+    # to the master: USR2 on the master triggers a binary upgrade.
+    from utils.profiler import install_signal_handler
+    install_signal_handler()
+    # Tile generation runs on a thread, so it starts here rather than in
+    # when_ready: a thread started in the master would not survive the fork
+    try:
+        from services.network_service import get_network
+        from services.tile_service import pregenerate
+        network = get_network()
+        if network is not None:
+            pregenerate(network)
+    except Exception as e:
+        worker.log.warning("Route tile pre-generation failed to start: %s", e)
+    # Route cache warming likewise runs on a per-worker thread
+    try:
+        from services.cache_warming import start
+        start(worker.wsgi)
+    except Exception as e:
+        worker.log.warning("Route cache warming failed to start: %s", e)
+
 def pre_fork(server, worker):
     """Called just before a worker is forked."""
     pass
@@ -5,7 +5,50 @@ Data models for route generation system.
 """
 
 from typing import List, Tuple, Optional, Dict, Any
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
+
+
+# Map color per route name; anything else is drawn black
+ROUTE_COLORS = {
+    "Route 1": "#226C0A",
+    "Route 2": "#FB121A",
+    "Route 3": "#08056E",
+    "Route 4": "#4E0881",
+    "Route 5": "#A5AD0B",
+    "Route 6": "#387AED",
+    "Route 7": "#13409F",
+    "Route 8": "#43A755",
+    "Route 9": "#FD4217",
+    "Route 10": "#D56844",
+    "Route 11": "#323230",
+    "Route 12": "#5BAE40",
+    "Route 13": "#66A5CD",
+    "Route 14": "#5A3408",
+    "Route 15": "#FBC12D",
+    "Route 16": "#040232",
+    "Route 17": "#092308",
+    "Route 18": "#A75214",
+    "Route 19": "#A90F84",
+    "Route 20": "#72C5C3",
+    "Route 21": "#C57216",
+    "Route 22": "#7CBD74",
+    "Route 23": "#19A5C5",
+    "Route 24": "#B95E32",
+    "Route 25": "#F7A51E",
+    "Route 26": "#2C3E50",
+    "Route 27": "#E74C3C",
+    "Route 28": "#F1C40F",
+    "Route 29": "#2ECC71",
+    "Route 30": "#3498DB",
+    "Route 31": "#9B59B6",
+    "Route 32": "#E67E22",
+    "Transfer": "#808080",
+}
+
+
+def route_color(route_name: str) -> str:
+    """Color used to draw ``route_name`` on the map."""
+    return ROUTE_COLORS.get(route_name, "#000000")
 
 
 @dataclass
@@ -99,42 +142,7 @@ class RouteResult:
     
     def _get_route_color(self, route_name: str) -> str:
         """Get color for route visualization."""
-        route_colors = {
-            "Route 1": "#226C0A",
-            "Route 2": "#FB121A",
-            "Route 3": "#08056E",
-            "Route 4": "#4E0881",
-            "Route 5": "#A5AD0B",
-            "Route 6": "#387AED",
-            "Route 7": "#13409F",
-            "Route 8": "#43A755",
-            "Route 9": "#FD4217",
-            "Route 10": "#D56844",
-            "Route 11": "#323230",
-            "Route 12": "#5BAE40",
-            "Route 13": "#66A5CD",
-            "Route 14": "#5A3408",
-            "Route 15": "#FBC12D",
-            "Route 16": "#040232",
-            "Route 17": "#092308",
-            "Route 18": "#A75214",
-            "Route 19": "#A90F84",
-            "Route 20": "#72C5C3",
-            "Route 21": "#C57216",
-            "Route 22": "#7CBD74",
-            "Route 23": "#19A5C5",
-            "Route 24": "#B95E32",
-            "Route 25": "#F7A51E",
-            "Route 26": "#2C3E50",
-            "Route 27": "#E74C3C",
-            "Route 28": "#F1C40F",
-            "Route 29": "#2ECC71",
-            "Route 30": "#3498DB",
-            "Route 31": "#9B59B6",
-            "Route 32": "#E67E22",
-            "Transfer": "#808080"
-        }
-        return route_colors.get(route_name, "#000000")
+        return route_color(route_name)
 
 
 @dataclass
@@ -155,17 +163,81 @@ class SearchResult:
     checked_nodes: int
     success: bool
     error_message: Optional[str] = None
+    partial: bool = False  # stopped by an expansion budget or deadline
+    cost: Optional[float] = None  # search cost of the path found
 
 
 @dataclass
 class RouteOptions:
-    """Configuration options for route generation."""
+    """Configuration options for route generation.
+
+    ``max_walking_distance`` and ``max_transfers`` are hard search bounds
+    when named in ``enforced``. ``from_dict`` enforces only the ones the
+    request sent, so walking is otherwise left to the walk radius and
+    transfers are unlimited.
+    """
     max_walking_distance: float = 0.5  # km
     max_transfers: int = 3
     prefer_distance: bool = False
     prefer_fare: bool = True
     include_walking: bool = True
     penalty_per_transfer: float = 0.01  # 1% penalty per transfer
+    heuristic: str = 'haversine'  # 'haversine' or 'alt' (landmarks)
+    enforced: Tuple[str, ...] = ('max_walking_distance', 'max_transfers')
+
+    HEURISTICS = ('haversine', 'alt')
+    BOUNDS = ('max_walking_distance', 'max_transfers')
+    MAX_TRANSFERS_LIMIT = 10
+    MAX_WALKING_LIMIT_KM = 5.0
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'RouteOptions':
+        """Build options from request JSON; raises ``ValueError`` on invalid input."""
+        if not isinstance(data, dict):
+            raise ValueError("options must be an object")
+        types = {f.name: f.type for f in fields(cls) if f.name != 'enforced'}
+        unknown = sorted(set(data) - set(types))
+        if unknown:
+            raise ValueError(f"Unknown route options: {', '.join(unknown)}")
+
+        values = {}
+        for name, value in data.items():
+            expected = types[name]
+            if value is None and name in cls.BOUNDS:
+                continue  # same as leaving the bound out
+            if expected is bool and not isinstance(value, bool):
+                raise ValueError(f"{name} must be true or false")
+            if expected is int and (isinstance(value, bool) or not isinstance(value, int)):
+                raise ValueError(f"{name} must be an integer")
+            if expected is float:
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    raise ValueError(f"{name} must be a number")
+                value = float(value)
+            if expected is str and not isinstance(value, str):
+                raise ValueError(f"{name} must be a string")
+            values[name] = value
+
+        options = cls(**values, enforced=tuple(name for name in cls.BOUNDS if name in values))
+        options.validate()
+        return options
+
+    def bound(self, name: str) -> Optional[float]:
+        """Value of the search bound ``name``, or ``None`` when it is not enforced."""
+        return getattr(self, name) if name in self.enforced else None
+
+    def validate(self):
+        """Check value ranges; raises ``ValueError``."""
+        if not 0.0 <= self.max_walking_distance <= self.MAX_WALKING_LIMIT_KM:
+            raise ValueError(f"max_walking_distance must be between 0 and {self.MAX_WALKING_LIMIT_KM} km")
+        if not 0 <= self.max_transfers <= self.MAX_TRANSFERS_LIMIT:
+            raise ValueError(f"max_transfers must be between 0 and {self.MAX_TRANSFERS_LIMIT}")
+        if not 0.0 <= self.penalty_per_transfer <= 1.0:
+            raise ValueError("penalty_per_transfer must be between 0 and 1")
+        if self.heuristic not in self.HEURISTICS:
+            raise ValueError(f"heuristic must be one of {', '.join(self.HEURISTICS)}")
+        if not self.include_walking:
+            # Dropping transfer walks would leave gaps between the rides
+            raise ValueError("include_walking=false is not supported")
 
 
 @dataclass
@@ -0,0 +1,200 @@
+"""
+Coverage Module
+
+Walking-access grid over the service area: for every cell of a regular
+lng/lat raster, the distance in metres from the cell centre to the nearest
+route segment of a ``TransitNetwork``.
+
+Cells are processed in square blocks. Each block takes its candidate
+segments from the network's segment grid once, then measures every
+cell-to-segment distance of the block in one broadcast NumPy kernel, so the
+whole city takes seconds rather than one nearest-edge query per cell.
+
+Distances are stored as ``uint16`` metres; cells farther than the grid's
+``max_distance_m`` from every route hold ``NO_ROUTE``. The file layout
+mirrors the graph snapshot::
+
+    MAGIC (8 bytes) | header length (uint32) | JSON header | distance array
+"""
+
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from route_generation.services.graph_snapshot import TransitNetwork
+from route_generation.utils.array_geometry import haversine_km, meters_to_degrees, project_onto_segments
+
+MAGIC = b'PLNKCOV\x00'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+NO_ROUTE = np.iinfo(np.uint16).max
+
+# Cells per block side; a block's cells share one candidate segment lookup
+BLOCK_CELLS = 16
+
+# Largest grid compute_coverage allocates by default (2 bytes per cell)
+MAX_GRID_CELLS = 50_000_000
+
+
+class CoverageError(Exception):
+    """Raised when a coverage file is missing, corrupt or incompatible."""
+
+
+@dataclass
+class CoverageGrid:
+    """``distance_m[row, col]``; row 0 is the southernmost, col 0 the westernmost."""
+    distance_m: np.ndarray
+    west: float
+    south: float
+    cell_deg: float
+    max_distance_m: float
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    _buffer: Optional[Any] = field(default=None, repr=False)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.distance_m.shape
+
+    def window(self, west: float, south: float, east: float, north: float) -> Tuple[slice, slice]:
+        """Row and column slices of the cells overlapping a bounding box."""
+        rows, cols = self.shape
+        row0 = max(0, int(math.floor((south - self.south) / self.cell_deg)))
+        row1 = min(rows, int(math.ceil((north - self.south) / self.cell_deg)))
+        col0 = max(0, int(math.floor((west - self.west) / self.cell_deg)))
+        col1 = min(cols, int(math.ceil((east - self.west) / self.cell_deg)))
+        return slice(row0, max(row0, row1)), slice(col0, max(col0, col1))
+
+    def window_bounds(self, rows: slice, cols: slice) -> Tuple[float, float, float, float]:
+        """``(west, south, east, north)`` of the cells in ``rows``/``cols``."""
+        return (self.west + cols.start * self.cell_deg, self.south + rows.start * self.cell_deg,
+                self.west + cols.stop * self.cell_deg, self.south + rows.stop * self.cell_deg)
+
+
+def _block_distances(network: TransitNetwork, lng: np.ndarray, lat: np.ndarray, max_distance_m: float):
+    """Nearest-segment distance (m) of every ``lng`` x ``lat`` cell centre, or None."""
+    center_lng, center_lat = float(lng.mean()), float(lat.mean())
+    half_diagonal_m = float(haversine_km(lng[0], lat[0], lng[-1], lat[-1])) * 500.0
+    candidates = network.candidate_segments(center_lng, center_lat, max_distance_m + half_diagonal_m)
+    if len(candidates) == 0:
+        return None
+    start = network.node_coords[candidates]
+    end = network.node_coords[candidates + 1]
+    px, py = np.meshgrid(lng, lat)
+    px, py = px.reshape(-1, 1), py.reshape(-1, 1)
+    _, qx, qy = project_onto_segments(px, py, start[:, 0], start[:, 1], end[:, 0], end[:, 1])
+    return haversine_km(px, py, qx, qy).min(axis=1).reshape(len(lat), len(lng)) * 1000.0
+
+
+def compute_coverage(network: TransitNetwork, cell_deg: float, max_distance_m: float,
+                     bounds: Optional[Tuple[float, float, float, float]] = None,
+                     max_cells: int = MAX_GRID_CELLS) -> CoverageGrid:
+    """Rasterize ``bounds`` (default: the network's extent plus ``max_distance_m``).
+
+    Raises ``ValueError`` for a non-positive ``cell_deg`` or a grid of more
+    than ``max_cells`` cells.
+    """
+    if not 0 < max_distance_m < NO_ROUTE:
+        raise ValueError(f"max_distance_m must be between 0 and {NO_ROUTE}")
+    if not cell_deg > 0:
+        raise ValueError("cell_deg must be positive")
+    started = time.perf_counter()
+    if bounds is None:
+        low, high = network.node_coords.min(axis=0), network.node_coords.max(axis=0)
+        margin = meters_to_degrees(max_distance_m, float(high[1]))
+        bounds = (low[0] - margin, low[1] - margin, high[0] + margin, high[1] + margin)
+    west, south, east, north = (float(value) for value in bounds)
+    cols = max(1, int(math.ceil((east - west) / cell_deg)))
+    rows = max(1, int(math.ceil((north - south) / cell_deg)))
+    if rows * cols > max_cells:
+        raise ValueError(f"A {rows}x{cols} grid exceeds {max_cells} cells; use a larger cell size")
+
+    distance = np.full((rows, cols), NO_ROUTE, dtype=np.uint16)
+    for row0 in range(0, rows, BLOCK_CELLS):
+        lat = south + (np.arange(row0, min(rows, row0 + BLOCK_CELLS)) + 0.5) * cell_deg
+        for col0 in range(0, cols, BLOCK_CELLS):
+            lng = west + (np.arange(col0, min(cols, col0 + BLOCK_CELLS)) + 0.5) * cell_deg
+            block = _block_distances(network, lng, lat, max_distance_m)
+            if block is not None:
+                distance[row0:row0 + len(lat), col0:col0 + len(lng)] = np.where(
+                    block <= max_distance_m, np.rint(block), NO_ROUTE)
+
+    logging.info(f"Coverage grid {rows}x{cols} computed in {time.perf_counter() - started:.1f} s")
+    return CoverageGrid(
+        distance_m=distance, west=west, south=south, cell_deg=float(cell_deg),
+        max_distance_m=float(max_distance_m),
+        metadata={
+            'network_id': network.network_id,
+            'built_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        },
+    )
+
+
+def write_coverage(grid: CoverageGrid, path: str) -> None:
+    """Write ``grid`` to ``path`` atomically."""
+    header = json.dumps({
+        'format_version': FORMAT_VERSION,
+        'west': grid.west,
+        'south': grid.south,
+        'cell_deg': grid.cell_deg,
+        'max_distance_m': grid.max_distance_m,
+        'shape': list(grid.shape),
+        'dtype': '<u2',
+        'metadata': grid.metadata,
+    }).encode('utf-8')
+    offset = (len(MAGIC) + 4 + len(header) + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = f"{path}.tmp-{os.getpid()}"
+    with open(temp_path, 'wb') as fh:
+        fh.write(MAGIC)
+        fh.write(struct.pack('<I', len(header)))
+        fh.write(header)
+        fh.seek(offset)
+        fh.write(np.ascontiguousarray(grid.distance_m, dtype='<u2').tobytes())
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(temp_path, path)
+    logging.info(f"Coverage grid written to {path} ({offset + grid.distance_m.nbytes} bytes)")
+
+
+def load_coverage(path: str) -> CoverageGrid:
+    """Memory-map a coverage file; the distance array is a read-only view."""
+    try:
+        with open(path, 'rb') as fh:
+            buffer = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:
+        raise CoverageError(f"Cannot open coverage grid {path}: {e}") from e
+    if bytes(buffer[:len(MAGIC)]) != MAGIC:
+        raise CoverageError("Not a coverage grid file")
+    (header_length,) = struct.unpack_from('<I', buffer, len(MAGIC))
+    start = len(MAGIC) + 4
+    header = json.loads(bytes(buffer[start:start + header_length]).decode('utf-8'))
+    if header.get('format_version') != FORMAT_VERSION:
+        raise CoverageError(
+            f"Unsupported coverage version {header.get('format_version')} (expected {FORMAT_VERSION})"
+        )
+
+    offset = (start + header_length + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+    rows, cols = header['shape']
+    try:
+        distance = np.frombuffer(buffer, dtype=header['dtype'], count=rows * cols, offset=offset)
+    except ValueError as e:
+        raise CoverageError(f"Truncated coverage grid {path}: {e}") from e
+    return CoverageGrid(
+        distance_m=distance.reshape(rows, cols),
+        west=header['west'],
+        south=header['south'],
+        cell_deg=header['cell_deg'],
+        max_distance_m=header['max_distance_m'],
+        metadata=dict(header['metadata'], path=os.path.abspath(path)),
+        _buffer=buffer,
+    )
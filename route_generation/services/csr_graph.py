@@ -0,0 +1,571 @@
+"""
+CSR Graph Module
+
+Integer-indexed compressed sparse row view over a ``TransitNetwork`` used on
+the pathfinding hot path. Adjacency, weights and route ids are read through
+memoryviews of the (usually memory-mapped) arrays, the open set is a binary
+heap and distance/parent buffers are preallocated per thread and reset
+lazily. ``EdgeInfo`` objects are only built for edges on a final path.
+
+Two heuristics are available: straight-line haversine distance, and ALT
+bounds from the snapshot's landmark tables (see ``landmarks``).
+
+``search_tree`` runs a plain one-to-many Dijkstra, forwards or over the
+transposed rows, for callers that need costs to many targets at once.
+
+NetworkX is only imported for debugging (``to_networkx``).
+"""
+
+import heapq
+import math
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from route_generation.models.route_models import Coordinate, EdgeInfo, SearchResult
+from route_generation.services.graph_snapshot import TRANSFER_ROUTE, TransitNetwork
+from route_generation.utils.array_geometry import EARTH_RADIUS_KM
+
+INFINITY = math.inf
+
+# Expansions between wall-clock checks when a deadline is set
+DEADLINE_CHECK_INTERVAL = 512
+
+# Expansions between cancellation checks when a cutoff is given
+CUTOFF_CHECK_INTERVAL = 64
+
+BUDGET_EXHAUSTED = "Expansion budget exhausted"
+DEADLINE_REACHED = "Search deadline reached"
+CANCELLED = "Cancelled: cannot beat routes already found"
+
+
+@dataclass
+class SearchBounds:
+    """Hard limits on labels in a bounded search.
+
+    ``source_walk`` / ``target_walk`` hold the walking distance (km) already
+    spent reaching a source node or still needed after leaving at a target.
+    """
+    max_transfers: Optional[int] = None
+    max_walk_km: Optional[float] = None
+    source_walk: Dict[int, float] = field(default_factory=dict)
+    target_walk: Dict[int, float] = field(default_factory=dict)
+
+
+@dataclass
+class SearchTree:
+    """Settled costs of a one-to-many search, with the edge that reached each node.
+
+    ``parent`` maps a node to ``(neighbour, edge)``: the previous node for a
+    forward tree, the next node towards the roots for a reverse one.
+    ``reason`` is set when a budget or deadline stopped the search before
+    every target was settled.
+    """
+    dist: Dict[int, float]
+    parent: Dict[int, Tuple[int, int]]
+    reverse: bool = False
+    visited_nodes: int = 0
+    reason: Optional[str] = None
+
+    def path(self, node: int) -> List[Tuple[int, int, int]]:
+        """``(u, v, edge)`` tuples in travel order between a root and ``node``."""
+        path = []
+        while node in self.parent:
+            neighbour, edge = self.parent[node]
+            path.append((node, neighbour, edge) if self.reverse else (neighbour, node, edge))
+            node = neighbour
+        if not self.reverse:
+            path.reverse()
+        return path
+
+
+# Transfer counts tracked per node when only the walking budget is bounded
+_UNBOUNDED_TRANSFERS = 63
+
+
+class _SearchBuffers:
+    """Per-thread distance/parent arrays, reset only where a search wrote."""
+
+    def __init__(self, size: int):
+        self.dist = [INFINITY] * size
+        self.parent = [-1] * size
+        self.parent_edge = [-1] * size
+        self.closed = bytearray(size)
+        self.touched: List[int] = []
+
+    def reset(self):
+        dist, parent, parent_edge, closed = self.dist, self.parent, self.parent_edge, self.closed
+        for node in self.touched:
+            dist[node] = INFINITY
+            parent[node] = -1
+            parent_edge[node] = -1
+            closed[node] = 0
+        self.touched.clear()
+
+
+class CSRGraph:
+    """Array-backed directed graph over route vertices.
+
+    Node ``n`` (== ``node_count``) is a virtual sink used to finish
+    multi-target searches.
+    """
+
+    def __init__(self, network: TransitNetwork, transfer_penalty_km: float = 0.0):
+        self.network = network
+        self.node_count = network.node_count
+        self.sink = self.node_count
+        self.transfer_penalty_km = transfer_penalty_km
+
+        self._indptr = memoryview(network.indptr)
+        self._indices = memoryview(network.indices)
+        self._weights = memoryview(network.weights)
+        self._edge_route = memoryview(network.edge_route)
+        # Flat (lng, lat, lng, lat, ...) view; no per-worker copy of the coordinates
+        self._coords = memoryview(np.ascontiguousarray(network.node_coords)).cast('B').cast('d')
+        self._local = threading.local()
+        self._reverse = None
+        self._reverse_lock = threading.Lock()
+
+    def _buffers(self) -> _SearchBuffers:
+        buffers = getattr(self._local, 'buffers', None)
+        if buffers is None:
+            buffers = self._local.buffers = _SearchBuffers(self.node_count + 1)
+        return buffers
+
+    def haversine_heuristic(self, target: Tuple[float, float]) -> Callable[[int], float]:
+        """Straight-line distance (km) from a node to ``target``; admissible."""
+        coords = self._coords
+        t_lng, t_lat = math.radians(target[0]), math.radians(target[1])
+        cos_t = math.cos(t_lat)
+        radians, sin, cos, asin, sqrt = math.radians, math.sin, math.cos, math.asin, math.sqrt
+
+        def heuristic(node: int) -> float:
+            n_lat = radians(coords[2 * node + 1])
+            a = sin((t_lat - n_lat) / 2.0) ** 2 + cos(n_lat) * cos_t * sin((t_lng - radians(coords[2 * node])) / 2.0) ** 2
+            return 2.0 * EARTH_RADIUS_KM * asin(sqrt(min(1.0, a)))
+
+        return heuristic
+
+    @property
+    def has_landmarks(self) -> bool:
+        """Whether the snapshot carries landmark tables valid for this graph's penalty."""
+        network = self.network
+        return (network.landmark_nodes is not None and len(network.landmark_nodes) > 0
+                and self.transfer_penalty_km >= network.metadata.get('landmark_penalty_km', 0.0))
+
+    def landmark_heuristic(self, sources, targets: Dict[int, float],
+                           active: int = 4) -> Callable[[int], float]:
+        """ALT lower bound (km) from a node to the cheapest exit in ``targets``.
+
+        Only the ``active`` landmarks giving the tightest bound between
+        ``sources`` and ``targets`` are consulted per node.
+        """
+        landmark_from, landmark_to = self.network.landmark_from, self.network.landmark_to
+        source_nodes = np.fromiter(sources, dtype=np.int64)
+        target_nodes = np.fromiter(targets, dtype=np.int64)
+
+        # (landmarks, sources, targets) bounds; rank landmarks by their weakest pair
+        forward = landmark_from[:, None, target_nodes] - landmark_from[:, source_nodes, None]
+        backward = landmark_to[:, source_nodes, None] - landmark_to[:, None, target_nodes]
+        strength = np.maximum(forward, backward).reshape(len(landmark_from), -1).min(axis=1)
+        chosen = np.argsort(-strength, kind='stable')[:active].tolist()
+
+        def row(table, i):
+            return memoryview(np.ascontiguousarray(table[i])).cast('B').cast('d')
+
+        rows = [(row(landmark_from, i), row(landmark_to, i)) for i in chosen]
+        per_target = [
+            (exit_cost, [(from_row, to_row, from_row[t], to_row[t]) for from_row, to_row in rows])
+            for t, exit_cost in targets.items()
+        ]
+
+        def heuristic(node: int) -> float:
+            best = INFINITY
+            for exit_cost, bounds in per_target:
+                bound = 0.0
+                for from_row, to_row, from_target, to_target in bounds:
+                    ahead = from_target - from_row[node]
+                    if ahead > bound:
+                        bound = ahead
+                    behind = to_row[node] - to_target
+                    if behind > bound:
+                        bound = behind
+                bound += exit_cost
+                if bound < best:
+                    best = bound
+            return best
+
+        return heuristic
+
+    def astar(
+        self,
+        sources: Dict[int, float],
+        targets: Dict[int, float],
+        heuristic: Optional[Callable[[int], float]] = None,
+        max_expansions: Optional[int] = None,
+        deadline: Optional[float] = None,
+        bounds: Optional[SearchBounds] = None,
+        cutoff: Optional[Callable[[], float]] = None,
+    ) -> SearchResult:
+        """Multi-source A* to the cheapest of ``targets``.
+
+        ``sources`` maps start nodes to their initial cost and ``targets``
+        maps nodes to the cost of leaving the network there. The returned
+        ``SearchResult.path`` is a list of ``(u, v, edge_index)`` tuples.
+
+        The search stops after ``max_expansions`` expanded nodes or once
+        ``time.monotonic()`` passes ``deadline``. It then returns the best
+        exit reached so far, if any, flagged ``partial`` with the reason in
+        ``error_message``.
+
+        With ``bounds`` the search runs over ``(node, transfers)`` labels and
+        drops any label that needs more transfers or walking than allowed.
+
+        ``cutoff`` is polled every few expansions; once the smallest ``f`` in
+        the open set exceeds it, no path from this search can cost less and
+        the search is abandoned with ``error_message == CANCELLED``.
+        """
+        if bounds is not None and (bounds.max_transfers is not None or bounds.max_walk_km is not None):
+            return self._astar_bounded(sources, targets, heuristic, max_expansions, deadline, bounds, cutoff)
+
+        buffers = self._buffers()
+        dist, parent, parent_edge, closed, touched = (
+            buffers.dist, buffers.parent, buffers.parent_edge, buffers.closed, buffers.touched
+        )
+        indptr, indices, weights, edge_route = self._indptr, self._indices, self._weights, self._edge_route
+        penalty = self.transfer_penalty_km
+        sink = self.sink
+        h = heuristic or (lambda node: 0.0)
+        limit = max_expansions if max_expansions is not None else INFINITY
+        monotonic = time.monotonic
+
+        heap = []
+        for node, cost in sources.items():
+            if cost < dist[node]:
+                if dist[node] == INFINITY:
+                    touched.append(node)
+                dist[node] = cost
+                heapq.heappush(heap, (cost + h(node), cost, node))
+
+        visited = checked = 0
+        try:
+            while heap:
+                f, g, u = heapq.heappop(heap)
+                if closed[u]:
+                    continue
+                closed[u] = 1
+                visited += 1
+                if u == sink:
+                    return SearchResult(path=self._unwind(buffers), visited_nodes=visited,
+                                        checked_nodes=checked, success=True, cost=g)
+                if visited >= limit:
+                    return self._partial(buffers, visited, checked, BUDGET_EXHAUSTED)
+                if deadline is not None and not visited % DEADLINE_CHECK_INTERVAL and monotonic() >= deadline:
+                    return self._partial(buffers, visited, checked, DEADLINE_REACHED)
+                if cutoff is not None and not visited % CUTOFF_CHECK_INTERVAL and f > cutoff():
+                    return SearchResult(path=None, visited_nodes=visited, checked_nodes=checked,
+                                        success=False, error_message=CANCELLED)
+
+                exit_cost = targets.get(u)
+                if exit_cost is not None:
+                    candidate = g + exit_cost
+                    if candidate < dist[sink]:
+                        if dist[sink] == INFINITY:
+                            touched.append(sink)
+                        dist[sink] = candidate
+                        parent[sink] = u
+                        parent_edge[sink] = -1
+                        heapq.heappush(heap, (candidate, candidate, sink))
+
+                for edge in range(indptr[u], indptr[u + 1]):
+                    v = indices[edge]
+                    checked += 1
+                    if closed[v]:
+                        continue
+                    candidate = g + weights[edge]
+                    if edge_route[edge] == TRANSFER_ROUTE:
+                        candidate += penalty
+                    if candidate < dist[v]:
+                        if dist[v] == INFINITY:
+                            touched.append(v)
+                        dist[v] = candidate
+                        parent[v] = u
+                        parent_edge[v] = edge
+                        heapq.heappush(heap, (candidate + h(v), candidate, v))
+
+            return SearchResult(path=None, visited_nodes=visited, checked_nodes=checked,
+                                success=False, error_message="No path found")
+        finally:
+            buffers.reset()
+
+    def _astar_bounded(self, sources, targets, heuristic, max_expansions, deadline,
+                       bounds: SearchBounds, cutoff=None) -> SearchResult:
+        """A* over ``(node, transfers)`` labels with transfer and walking limits.
+
+        Labels are keyed ``node * stride + transfers``; each key keeps its
+        cheapest label and the walking distance that label has used. A label
+        is dominated, and dropped, once the same node has been settled with no
+        more transfers and no more walking. Labels are sparse, so they live in
+        dicts rather than the per-thread buffers.
+        """
+        indptr, indices, weights, edge_route = self._indptr, self._indices, self._weights, self._edge_route
+        penalty = self.transfer_penalty_km
+        max_transfers = bounds.max_transfers if bounds.max_transfers is not None else _UNBOUNDED_TRANSFERS
+        max_walk = bounds.max_walk_km if bounds.max_walk_km is not None else INFINITY
+        source_walk, target_walk = bounds.source_walk, bounds.target_walk
+        stride = max_transfers + 1
+        sink = -1
+        h = heuristic or (lambda node: 0.0)
+        limit = max_expansions if max_expansions is not None else INFINITY
+        monotonic = time.monotonic
+
+        dist: Dict[int, float] = {}
+        walked: Dict[int, float] = {}
+        parent: Dict[int, Tuple[int, int]] = {}
+        closed = set()
+        settled: Dict[int, List[Tuple[int, float]]] = {}  # node -> (transfers, walk) of closed labels
+        heap = []
+        for node, cost in sources.items():
+            walk = source_walk.get(node, 0.0)
+            key = node * stride
+            if walk <= max_walk and cost < dist.get(key, INFINITY):
+                dist[key] = cost
+                walked[key] = walk
+                heapq.heappush(heap, (cost + h(node), cost, key))
+
+        def result(reason=None):
+            path = []
+            if sink in parent:
+                key = parent[sink][0]
+                while key in parent:
+                    previous, edge = parent[key]
+                    path.append((previous // stride, key // stride, edge))
+                    key = previous
+                path.reverse()
+            found = sink in parent
+            return SearchResult(path=path if found else None, visited_nodes=visited, checked_nodes=checked,
+                                success=found, error_message=reason if reason or found else "No path found",
+                                partial=reason is not None, cost=dist[sink] if found else None)
+
+        visited = checked = 0
+        while heap:
+            f, g, key = heapq.heappop(heap)
+            if key in closed:
+                continue
+            closed.add(key)
+            if key == sink:
+                visited += 1
+                return result()
+            u, transfers = divmod(key, stride)
+            walk = walked[key]
+            labels = settled.setdefault(u, [])
+            if any(t <= transfers and w <= walk for t, w in labels):
+                continue
+            labels.append((transfers, walk))
+            visited += 1
+            if visited >= limit:
+                return result(BUDGET_EXHAUSTED)
+            if deadline is not None and not visited % DEADLINE_CHECK_INTERVAL and monotonic() >= deadline:
+                return result(DEADLINE_REACHED)
+            if cutoff is not None and not visited % CUTOFF_CHECK_INTERVAL and f > cutoff():
+                return SearchResult(path=None, visited_nodes=visited, checked_nodes=checked,
+                                    success=False, error_message=CANCELLED)
+
+            exit_cost = targets.get(u)
+            if exit_cost is not None and walk + target_walk.get(u, 0.0) <= max_walk:
+                candidate = g + exit_cost
+                if candidate < dist.get(sink, INFINITY):
+                    dist[sink] = candidate
+                    parent[sink] = (key, -1)
+                    heapq.heappush(heap, (candidate, candidate, sink))
+
+            for edge in range(indptr[u], indptr[u + 1]):
+                checked += 1
+                v = indices[edge]
+                candidate = g + weights[edge]
+                next_transfers, next_walk = transfers, walk
+                if edge_route[edge] == TRANSFER_ROUTE:
+                    if transfers >= max_transfers:
+                        continue
+                    next_walk += weights[edge]
+                    if next_walk > max_walk:
+                        continue
+                    candidate += penalty
+                    next_transfers += 1
+                next_key = v * stride + next_transfers
+                if next_key in closed or candidate >= dist.get(next_key, INFINITY):
+                    continue
+                labels = settled.get(v)
+                if labels and any(t <= next_transfers and w <= next_walk for t, w in labels):
+                    continue
+                dist[next_key] = candidate
+                walked[next_key] = next_walk
+                parent[next_key] = (key, edge)
+                heapq.heappush(heap, (candidate + h(v), candidate, next_key))
+
+        return result()
+
+    def _reverse_adjacency(self):
+        """Transposed CSR rows as ``(indptr, predecessors, edge ids)``, built on first use."""
+        if self._reverse is None:
+            with self._reverse_lock:
+                if self._reverse is None:
+                    indptr, indices = self.network.indptr, self.network.indices
+                    order = np.argsort(indices, kind='stable')
+                    counts = np.bincount(indices, minlength=self.node_count)
+                    reverse_indptr = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+                    predecessors = np.repeat(np.arange(self.node_count, dtype=np.int64), np.diff(indptr))[order]
+                    self._reverse = (memoryview(reverse_indptr), memoryview(predecessors),
+                                     memoryview(order.astype(np.int64)))
+        return self._reverse
+
+    def search_tree(
+        self,
+        sources: Dict[int, float],
+        targets,
+        reverse: bool = False,
+        max_expansions: Optional[int] = None,
+        deadline: Optional[float] = None,
+    ) -> SearchTree:
+        """Dijkstra from ``sources`` until every node in ``targets`` is settled.
+
+        With ``reverse`` edges are followed backwards, so the tree holds the
+        cost from each node to its cheapest source. One tree answers every
+        pair between its sources and targets, which is what the route matrix
+        builds on.
+        """
+        buffers = self._buffers()
+        dist, parent, parent_edge, closed, touched = (
+            buffers.dist, buffers.parent, buffers.parent_edge, buffers.closed, buffers.touched
+        )
+        if reverse:
+            indptr, neighbours, edge_ids = self._reverse_adjacency()
+        else:
+            indptr, neighbours, edge_ids = self._indptr, self._indices, None
+        weights, edge_route = self._weights, self._edge_route
+        penalty = self.transfer_penalty_km
+        limit = max_expansions if max_expansions is not None else INFINITY
+        monotonic = time.monotonic
+        remaining = set(targets)
+
+        heap = []
+        for node, cost in sources.items():
+            if cost < dist[node]:
+                if dist[node] == INFINITY:
+                    touched.append(node)
+                dist[node] = cost
+                heapq.heappush(heap, (cost, node))
+
+        visited = 0
+        reason = None
+        try:
+            while heap and remaining:
+                g, u = heapq.heappop(heap)
+                if closed[u]:
+                    continue
+                closed[u] = 1
+                visited += 1
+                remaining.discard(u)
+                if visited >= limit:
+                    reason = BUDGET_EXHAUSTED
+                    break
+                if deadline is not None and not visited % DEADLINE_CHECK_INTERVAL and monotonic() >= deadline:
+                    reason = DEADLINE_REACHED
+                    break
+
+                for slot in range(indptr[u], indptr[u + 1]):
+                    v = neighbours[slot]
+                    if closed[v]:
+                        continue
+                    edge = edge_ids[slot] if edge_ids is not None else slot
+                    candidate = g + weights[edge]
+                    if edge_route[edge] == TRANSFER_ROUTE:
+                        candidate += penalty
+                    if candidate < dist[v]:
+                        if dist[v] == INFINITY:
+                            touched.append(v)
+                        dist[v] = candidate
+                        parent[v] = u
+                        parent_edge[v] = edge
+                        heapq.heappush(heap, (candidate, v))
+
+            settled = [node for node in touched if closed[node]]
+            return SearchTree(
+                dist={node: dist[node] for node in settled},
+                parent={node: (parent[node], parent_edge[node]) for node in settled if parent[node] != -1},
+                reverse=reverse,
+                visited_nodes=visited,
+                reason=reason,
+            )
+        finally:
+            buffers.reset()
+
+    def _partial(self, buffers: _SearchBuffers, visited: int, checked: int, reason: str) -> SearchResult:
+        """Best exit found before the search was cut short, if any."""
+        if buffers.dist[self.sink] == INFINITY:
+            return SearchResult(path=None, visited_nodes=visited, checked_nodes=checked,
+                                success=False, error_message=reason, partial=True)
+        return SearchResult(path=self._unwind(buffers), visited_nodes=visited, checked_nodes=checked,
+                            success=True, error_message=reason, partial=True, cost=buffers.dist[self.sink])
+
+    def _unwind(self, buffers: _SearchBuffers) -> List[Tuple[int, int, int]]:
+        """Path edges from a source to the node that reached the sink.
+
+        Empty when the source node was itself the exit.
+        """
+        path = []
+        node = buffers.parent[self.sink]
+        while buffers.parent[node] != -1:
+            previous = buffers.parent[node]
+            path.append((previous, node, buffers.parent_edge[node]))
+            node = previous
+        path.reverse()
+        return path
+
+    def route_name(self, route_index: int) -> str:
+        return "Transfer" if route_index == TRANSFER_ROUTE else self.network.route_names[route_index]
+
+    def edge_info(self, u: int, v: int, edge: int) -> EdgeInfo:
+        """Materialize ``EdgeInfo`` for one edge of a final path."""
+        coords = self.network.node_coords
+        return EdgeInfo(
+            start_node=str(u),
+            end_node=str(v),
+            route_name=self.route_name(int(self.network.edge_route[edge])),
+            weight=float(self.network.weights[edge]),
+            coordinates=[Coordinate(float(coords[u, 0]), float(coords[u, 1])),
+                         Coordinate(float(coords[v, 0]), float(coords[v, 1]))],
+        )
+
+    def path_edges(self, path: List[Tuple[int, int, int]]) -> List[EdgeInfo]:
+        return [self.edge_info(u, v, edge) for u, v, edge in path]
+
+    def to_networkx(self):
+        """Build an equivalent NetworkX DiGraph, for debugging only."""
+        import networkx as nx
+
+        graph = nx.DiGraph()
+        coords = self.network.node_coords
+        for node in range(self.node_count):
+            graph.add_node(node, pos=(float(coords[node, 0]), float(coords[node, 1])))
+        indptr, indices = self.network.indptr, self.network.indices
+        for u in range(self.node_count):
+            for edge in range(int(indptr[u]), int(indptr[u + 1])):
+                graph.add_edge(u, int(indices[edge]), weight=float(self.network.weights[edge]),
+                               route=self.route_name(int(self.network.edge_route[edge])))
+        return graph
+
+    def get_graph_statistics(self) -> Dict[str, float]:
+        """Node/edge counts and density, matching GraphService's statistics."""
+        nodes, edges = self.node_count, self.network.edge_count
+        transfers = int(np.count_nonzero(self.network.edge_route == TRANSFER_ROUTE))
+        return {
+            'nodes': nodes,
+            'edges': edges,
+            'transfer_edges': transfers,
+            'routes': self.network.route_count,
+            'density': edges / (nodes * (nodes - 1)) if nodes > 1 else 0.0,
+        }
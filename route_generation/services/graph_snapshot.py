@@ -0,0 +1,430 @@
+"""
+Graph Snapshot Module
+
+Compiles the ``jeepney_routes`` collection into a flat, array-backed
+``TransitNetwork`` and stores it as one versioned binary file.
+
+Nodes are route vertices, numbered route by route, so a route's polyline is
+a contiguous slice of ``node_coords``. Edges are kept in compressed sparse
+row (CSR) form with parallel weight / route / geometry arrays, and segments
+are bucketed into a uniform grid for nearby-edge lookups.
+
+File layout (all arrays little-endian, 64-byte aligned)::
+
+    MAGIC (8 bytes) | header length (uint32) | JSON header | array sections
+
+Loading maps the file read-only and exposes every section as a NumPy view,
+so workers share the physical pages through the OS page cache and a new
+snapshot can be swapped in with an atomic rename.
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from route_generation.utils.array_geometry import haversine_km, meters_to_degrees
+
+MAGIC = b'PLNKNET\x00'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+# Roughly 220 m cells around Iloilo's latitude
+DEFAULT_CELL_SIZE_DEG = 0.002
+
+TRANSFER_ROUTE = -1
+
+# Array sections in file order; optional sections may be absent
+ARRAY_FIELDS = (
+    ('route_offsets', '<i8'),
+    ('node_coords', '<f8'),
+    ('node_route', '<i4'),
+    ('node_cumdist', '<f8'),
+    ('indptr', '<i8'),
+    ('indices', '<i4'),
+    ('weights', '<f8'),
+    ('edge_route', '<i4'),
+    ('edge_geom', '<i8'),
+    ('cell_indptr', '<i8'),
+    ('cell_segments', '<i4'),
+    ('transfer_from', '<i4'),
+    ('transfer_to', '<i4'),
+    ('transfer_km', '<f8'),
+    ('landmark_nodes', '<i4'),
+    ('landmark_from', '<f8'),
+    ('landmark_to', '<f8'),
+)
+
+# Field names probed, in order, for a route's coordinate list
+COORDINATE_FIELDS = ('coordinates', 'geometry', 'path', 'coords', 'points', 'route')
+
+# Packed polyline storage: little-endian float64 (lng, lat) pairs in one
+# binary field, tagged with its layout version
+POLYLINE_FIELD = 'polyline'
+POLYLINE_SCHEMA_FIELD = 'polyline_schema'
+POLYLINE_SCHEMA_VERSION = 1
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot file is missing, corrupt or incompatible."""
+
+
+@dataclass
+class TransitNetwork:
+    """Array-backed route network, either freshly compiled or memory-mapped."""
+    route_names: List[str]
+    route_offsets: np.ndarray
+    node_coords: np.ndarray
+    node_route: np.ndarray
+    node_cumdist: np.ndarray
+    indptr: np.ndarray
+    indices: np.ndarray
+    weights: np.ndarray
+    edge_route: np.ndarray
+    edge_geom: np.ndarray
+    cell_indptr: np.ndarray
+    cell_segments: np.ndarray
+    grid_origin: tuple
+    grid_cell_size: float
+    grid_shape: tuple
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    # Walking transfer table (see transfer_index); also merged into the CSR edges
+    transfer_from: Optional[np.ndarray] = None
+    transfer_to: Optional[np.ndarray] = None
+    transfer_km: Optional[np.ndarray] = None
+    # ALT landmark distance tables (see landmarks), shape (landmarks, nodes)
+    landmark_nodes: Optional[np.ndarray] = None
+    landmark_from: Optional[np.ndarray] = None
+    landmark_to: Optional[np.ndarray] = None
+    _buffer: Optional[mmap.mmap] = field(default=None, repr=False)
+
+    @property
+    def node_count(self) -> int:
+        return int(self.node_coords.shape[0])
+
+    @property
+    def edge_count(self) -> int:
+        return int(self.indices.shape[0])
+
+    @property
+    def route_count(self) -> int:
+        return len(self.route_names)
+
+    @property
+    def network_id(self) -> str:
+        return self.metadata.get('network_id', '')
+
+    def route_nodes(self, route_index: int) -> range:
+        """Node indices of a route, in travel order."""
+        return range(int(self.route_offsets[route_index]), int(self.route_offsets[route_index + 1]))
+
+    def route_polyline(self, route_index: int) -> np.ndarray:
+        """``(n, 2)`` view of a route's coordinates."""
+        start, end = self.route_offsets[route_index], self.route_offsets[route_index + 1]
+        return self.node_coords[start:end]
+
+    def candidate_segments(self, longitude: float, latitude: float, radius_meters: float) -> np.ndarray:
+        """Segment start nodes whose grid cells intersect the query radius."""
+        span = meters_to_degrees(radius_meters, latitude)
+        nx, ny = self.grid_shape
+        ox, oy = self.grid_origin
+        size = self.grid_cell_size
+        ix0 = max(0, int((longitude - span - ox) // size))
+        ix1 = min(nx - 1, int((longitude + span - ox) // size))
+        iy0 = max(0, int((latitude - span - oy) // size))
+        iy1 = min(ny - 1, int((latitude + span - oy) // size))
+        if ix0 > ix1 or iy0 > iy1:
+            return np.empty(0, dtype=np.int32)
+
+        chunks = []
+        for iy in range(iy0, iy1 + 1):
+            row = iy * nx
+            start = self.cell_indptr[row + ix0]
+            end = self.cell_indptr[row + ix1 + 1]
+            if end > start:
+                chunks.append(self.cell_segments[start:end])
+        if not chunks:
+            return np.empty(0, dtype=np.int32)
+        return np.unique(np.concatenate(chunks))
+
+    def memory_footprint(self) -> Dict[str, int]:
+        """Bytes held by each array section."""
+        return {
+            name: int(getattr(self, name).nbytes)
+            for name, _ in ARRAY_FIELDS
+            if getattr(self, name, None) is not None
+        }
+
+
+def encode_polyline(coordinates) -> bytes:
+    """Pack ``[lng, lat]`` pairs into the ``POLYLINE_FIELD`` byte layout."""
+    points = np.asarray(coordinates, dtype='<f8')
+    if points.ndim != 2 or points.shape[1] < 2:
+        raise ValueError("Polyline must be a sequence of [lng, lat] pairs")
+    return np.ascontiguousarray(points[:, :2]).tobytes()
+
+
+def decode_polyline(document: Dict[str, Any]) -> Optional[np.ndarray]:
+    """A document's packed polyline as a read-only ``(n, 2)`` array, or None.
+
+    None means the document has no packed polyline, or one in a schema
+    version this code does not know, and the legacy fields should be read.
+    """
+    data = document.get(POLYLINE_FIELD)
+    if not isinstance(data, (bytes, bytearray, memoryview)):
+        return None
+    version = document.get(POLYLINE_SCHEMA_FIELD)
+    if version != POLYLINE_SCHEMA_VERSION or len(data) % 16:
+        logging.warning(f"Ignoring packed polyline (schema {version}, {len(data)} bytes) "
+                        f"of route {document.get('name')}")
+        return None
+    return np.frombuffer(data, dtype='<f8').reshape(-1, 2)
+
+
+def route_polyline(document: Dict[str, Any]) -> np.ndarray:
+    """A route's vertices as an ``(n, 2)`` float64 array.
+
+    Reads the packed polyline when present, otherwise falls back to
+    ``extract_route_coordinates``.
+    """
+    points = decode_polyline(document)
+    if points is not None:
+        return points
+    return np.asarray(extract_route_coordinates(document), dtype=np.float64).reshape(-1, 2)
+
+
+def expand_polyline(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Replace a packed polyline with a plain ``coordinates`` list, for JSON."""
+    points = decode_polyline(document)
+    document.pop(POLYLINE_FIELD, None)
+    document.pop(POLYLINE_SCHEMA_FIELD, None)
+    if points is not None:
+        document['coordinates'] = points.tolist()
+    return document
+
+
+def extract_route_coordinates(document: Dict[str, Any]) -> List[List[float]]:
+    """Find a route's ``[lng, lat]`` list whichever field it is stored under."""
+    points = decode_polyline(document)
+    if points is not None:
+        return points.tolist()
+    for name in COORDINATE_FIELDS:
+        value = document.get(name)
+        if isinstance(value, dict):
+            value = value.get('coordinates')
+        if not value:
+            continue
+        # MultiLineString-style nesting: join the parts in order
+        if isinstance(value[0], (list, tuple)) and value[0] and isinstance(value[0][0], (list, tuple)):
+            value = [point for part in value for point in part]
+        if isinstance(value[0], (list, tuple)) and len(value[0]) >= 2:
+            return [[float(point[0]), float(point[1])] for point in value]
+    return []
+
+
+def _build_grid(node_coords, segment_starts, cell_size):
+    """Bucket each segment into every grid cell its bounding box touches."""
+    origin = node_coords.min(axis=0) - cell_size
+    span = node_coords.max(axis=0) + cell_size - origin
+    nx, ny = (int(np.ceil(span[0] / cell_size)) + 1, int(np.ceil(span[1] / cell_size)) + 1)
+
+    a = node_coords[segment_starts]
+    b = node_coords[segment_starts + 1]
+    low = ((np.minimum(a, b) - origin) // cell_size).astype(np.int64)
+    high = ((np.maximum(a, b) - origin) // cell_size).astype(np.int64)
+
+    single = (low == high).all(axis=1)
+    spanning_cells, spanning_members = [], []
+    for segment, (x0, y0), (x1, y1) in zip(segment_starts[~single].tolist(), low[~single].tolist(), high[~single].tolist()):
+        for iy in range(y0, y1 + 1):
+            for ix in range(x0, x1 + 1):
+                spanning_cells.append(iy * nx + ix)
+                spanning_members.append(segment)
+
+    cells = np.concatenate((low[single, 1] * nx + low[single, 0], np.array(spanning_cells, dtype=np.int64)))
+    members = np.concatenate((segment_starts[single], np.array(spanning_members, dtype=np.int64)))
+    order = np.argsort(cells, kind='stable')
+    counts = np.bincount(cells, minlength=nx * ny)
+    cell_indptr = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+    return (float(origin[0]), float(origin[1])), (nx, ny), cell_indptr, members[order].astype(np.int32)
+
+
+def compile_network(route_documents, cell_size_deg: float = DEFAULT_CELL_SIZE_DEG) -> TransitNetwork:
+    """Compile ``jeepney_routes`` documents into a ``TransitNetwork``."""
+    route_names, polylines = [], []
+    for document in route_documents:
+        coordinates = route_polyline(document)
+        if len(coordinates) < 2:
+            logging.warning(f"Skipping route without usable coordinates: {document.get('name')}")
+            continue
+        route_names.append(str(document.get('name') or document.get('route_name') or document.get('uid')))
+        polylines.append(coordinates)
+    if not polylines:
+        raise SnapshotError("No routes with coordinates to compile")
+
+    lengths = np.array([len(p) for p in polylines], dtype=np.int64)
+    route_offsets = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+    node_coords = np.vstack(polylines)
+    node_route = np.repeat(np.arange(len(polylines), dtype=np.int32), lengths)
+
+    # Segments join consecutive vertices of the same route
+    is_last = np.zeros(len(node_coords), dtype=bool)
+    is_last[route_offsets[1:] - 1] = True
+    segment_starts = np.flatnonzero(~is_last).astype(np.int64)
+    segment_km = haversine_km(
+        node_coords[segment_starts, 0], node_coords[segment_starts, 1],
+        node_coords[segment_starts + 1, 0], node_coords[segment_starts + 1, 1],
+    )
+
+    step = np.zeros(len(node_coords))
+    step[segment_starts + 1] = segment_km
+    node_cumdist = np.cumsum(step)
+    node_cumdist -= np.repeat(node_cumdist[route_offsets[:-1]], lengths)
+
+    # Ride edges follow the direction of travel; at most one per node
+    out_degree = (~is_last).astype(np.int64)
+    indptr = np.concatenate(([0], np.cumsum(out_degree))).astype(np.int64)
+
+    grid_origin, grid_shape, cell_indptr, cell_segments = _build_grid(node_coords, segment_starts, cell_size_deg)
+
+    digest = hashlib.sha1()
+    digest.update('\n'.join(route_names).encode('utf-8'))
+    digest.update(node_coords.tobytes())
+
+    return TransitNetwork(
+        route_names=route_names,
+        route_offsets=route_offsets,
+        node_coords=node_coords,
+        node_route=node_route,
+        node_cumdist=node_cumdist,
+        indptr=indptr,
+        indices=(segment_starts + 1).astype(np.int32),
+        weights=segment_km,
+        edge_route=node_route[segment_starts],
+        edge_geom=segment_starts,
+        cell_indptr=cell_indptr,
+        cell_segments=cell_segments,
+        grid_origin=grid_origin,
+        grid_cell_size=float(cell_size_deg),
+        grid_shape=grid_shape,
+        metadata={
+            'network_id': digest.hexdigest()[:16],
+            'built_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        },
+    )
+
+
+def _aligned(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_snapshot(network: TransitNetwork, path: str) -> Dict[str, Any]:
+    """Write ``network`` to ``path`` atomically and return the header."""
+    arrays = []
+    for name, dtype in ARRAY_FIELDS:
+        value = getattr(network, name, None)
+        if value is not None:
+            arrays.append((name, np.ascontiguousarray(value, dtype=dtype)))
+
+    header = {
+        'format_version': FORMAT_VERSION,
+        'route_names': network.route_names,
+        'grid_origin': list(network.grid_origin),
+        'grid_cell_size': network.grid_cell_size,
+        'grid_shape': list(network.grid_shape),
+        'node_count': network.node_count,
+        'edge_count': network.edge_count,
+        'metadata': network.metadata,
+        'sections': {},
+    }
+    # Section offsets depend on the header size, which depends on the offsets;
+    # reserve a generous fixed width for them so one pass is enough.
+    offset = 0
+    for name, array in arrays:
+        header['sections'][name] = {
+            'dtype': array.dtype.str,
+            'shape': list(array.shape),
+            'offset': 0,
+            'nbytes': int(array.nbytes),
+        }
+    provisional = len(json.dumps(header).encode('utf-8')) + 24 * len(arrays)
+    offset = _aligned(len(MAGIC) + 4 + provisional)
+    for name, array in arrays:
+        header['sections'][name]['offset'] = offset
+        offset = _aligned(offset + array.nbytes)
+
+    header_bytes = json.dumps(header).encode('utf-8')
+    header_bytes += b' ' * (provisional - len(header_bytes))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.tmp-{os.getpid()}"
+    with open(temp_path, 'wb') as fh:
+        fh.write(MAGIC)
+        fh.write(struct.pack('<I', len(header_bytes)))
+        fh.write(header_bytes)
+        for name, array in arrays:
+            fh.seek(header['sections'][name]['offset'])
+            fh.write(array.tobytes())
+        # Pad to the last aligned offset, where an empty trailing section starts
+        fh.truncate(offset)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(temp_path, path)
+    logging.info(f"Graph snapshot written to {path} ({offset} bytes)")
+    return header
+
+
+def read_header(buffer) -> Dict[str, Any]:
+    """Validate the magic/version and return the parsed JSON header."""
+    if bytes(buffer[:len(MAGIC)]) != MAGIC:
+        raise SnapshotError("Not a graph snapshot file")
+    (header_length,) = struct.unpack_from('<I', buffer, len(MAGIC))
+    start = len(MAGIC) + 4
+    header = json.loads(bytes(buffer[start:start + header_length]).decode('utf-8'))
+    if header.get('format_version') != FORMAT_VERSION:
+        raise SnapshotError(
+            f"Unsupported snapshot version {header.get('format_version')} (expected {FORMAT_VERSION})"
+        )
+    return header
+
+
+def load_snapshot(path: str) -> TransitNetwork:
+    """Memory-map a snapshot file; every array is a zero-copy read-only view."""
+    try:
+        with open(path, 'rb') as fh:
+            buffer = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:
+        raise SnapshotError(f"Cannot open graph snapshot {path}: {e}") from e
+
+    header = read_header(buffer)
+    arrays = {}
+    for name, _ in ARRAY_FIELDS:
+        section = header['sections'].get(name)
+        if section is None:
+            arrays[name] = None
+            continue
+        dtype = np.dtype(section['dtype'])
+        count = int(np.prod(section['shape'])) if section['shape'] else 1
+        if count == 0:
+            # Snapshots written before padding can place an empty section past EOF
+            arrays[name] = np.empty(section['shape'], dtype=dtype)
+            continue
+        arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=section['offset']).reshape(section['shape'])
+
+    return TransitNetwork(
+        route_names=header['route_names'],
+        grid_origin=tuple(header['grid_origin']),
+        grid_cell_size=header['grid_cell_size'],
+        grid_shape=tuple(header['grid_shape']),
+        metadata=dict(header['metadata'], path=os.path.abspath(path)),
+        _buffer=buffer,
+        **arrays,
+    )
@@ -0,0 +1,122 @@
+"""
+Landmarks Module
+
+Precomputation for the ALT (A*, landmarks, triangle inequality) heuristic.
+A handful of landmark vertices are picked on the edge of the network and
+exact shortest-path distances from and to every landmark are stored next to
+the CSR arrays. For any node ``v`` and target ``t`` the triangle inequality
+gives the admissible lower bounds
+
+    d(v, t) >= d(L, t) - d(L, v)
+    d(v, t) >= d(v, L) - d(t, L)
+
+which are much tighter than straight-line distance on routes that loop or
+double back. Distances include the transfer penalty, so the bounds hold for
+any search whose penalty is at least the one used here.
+"""
+
+import heapq
+import logging
+import math
+from dataclasses import replace
+from typing import Dict
+
+import numpy as np
+
+from route_generation.services.graph_snapshot import TRANSFER_ROUTE, TransitNetwork
+from route_generation.utils.array_geometry import haversine_km
+
+DEFAULT_LANDMARK_COUNT = 8
+
+# Stand-in for "unreachable" so that bound arithmetic never sees inf - inf
+UNREACHABLE_KM = 1.0e9
+
+
+def _dijkstra(indptr, indices, weights, source: int, size: int) -> np.ndarray:
+    """Single-source shortest distances over CSR memoryviews."""
+    dist = [math.inf] * size
+    dist[source] = 0.0
+    heap = [(0.0, source)]
+    done = bytearray(size)
+    while heap:
+        d, u = heapq.heappop(heap)
+        if done[u]:
+            continue
+        done[u] = 1
+        for edge in range(indptr[u], indptr[u + 1]):
+            v = indices[edge]
+            candidate = d + weights[edge]
+            if candidate < dist[v]:
+                dist[v] = candidate
+                heapq.heappush(heap, (candidate, v))
+    distances = np.array(dist, dtype=np.float64)
+    distances[np.isinf(distances)] = UNREACHABLE_KM
+    return distances
+
+
+def _reverse_csr(indptr, indices, weights, node_count):
+    """CSR arrays of the transposed graph."""
+    sources = np.repeat(np.arange(node_count, dtype=np.int32), np.diff(indptr))
+    order = np.argsort(indices, kind='stable')
+    counts = np.bincount(indices, minlength=node_count)
+    reverse_indptr = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+    return reverse_indptr, sources[order], weights[order]
+
+
+def select_landmarks(network: TransitNetwork, count: int = DEFAULT_LANDMARK_COUNT) -> np.ndarray:
+    """Farthest-point selection over vertex coordinates.
+
+    The first landmark is the vertex farthest from the network centroid; each
+    next one is the vertex farthest from all landmarks chosen so far, which
+    spreads them around the edge of the service area.
+    """
+    coords = network.node_coords
+    count = min(count, network.node_count)
+    if count <= 0:
+        return np.empty(0, dtype=np.int32)
+    lng, lat = coords[:, 0], coords[:, 1]
+    nearest = haversine_km(float(lng.mean()), float(lat.mean()), lng, lat)
+    chosen = []
+    for _ in range(count):
+        node = int(np.argmax(nearest))
+        chosen.append(node)
+        nearest = np.minimum(nearest, haversine_km(float(lng[node]), float(lat[node]), lng, lat))
+    return np.array(chosen, dtype=np.int32)
+
+
+def compute_landmarks(network: TransitNetwork, count: int = DEFAULT_LANDMARK_COUNT,
+                      transfer_penalty_km: float = 0.0) -> Dict[str, np.ndarray]:
+    """Landmark nodes with ``(landmarks, nodes)`` distance tables.
+
+    ``landmark_from[i, v]`` is the cost from landmark ``i`` to ``v`` and
+    ``landmark_to[i, v]`` the cost from ``v`` to landmark ``i``.
+    """
+    size = network.node_count
+    weights = network.weights + transfer_penalty_km * (network.edge_route == TRANSFER_ROUTE)
+    forward = (memoryview(network.indptr), memoryview(network.indices),
+               memoryview(np.ascontiguousarray(weights, dtype=np.float64)).cast('B').cast('d'))
+    reverse_indptr, reverse_indices, reverse_weights = _reverse_csr(network.indptr, network.indices, weights, size)
+    reverse = (memoryview(reverse_indptr), memoryview(reverse_indices),
+               memoryview(np.ascontiguousarray(reverse_weights, dtype=np.float64)).cast('B').cast('d'))
+
+    nodes = select_landmarks(network, count)
+    landmark_from = np.empty((len(nodes), size), dtype=np.float64)
+    landmark_to = np.empty((len(nodes), size), dtype=np.float64)
+    for i, node in enumerate(nodes.tolist()):
+        landmark_from[i] = _dijkstra(*forward, node, size)
+        landmark_to[i] = _dijkstra(*reverse, node, size)
+    logging.info(f"Landmarks: {len(nodes)} landmarks over {size} nodes")
+    return {'landmark_nodes': nodes, 'landmark_from': landmark_from, 'landmark_to': landmark_to}
+
+
+def attach_landmarks(network: TransitNetwork, landmarks: Dict[str, np.ndarray],
+                     transfer_penalty_km: float = 0.0) -> TransitNetwork:
+    """Return a copy of ``network`` carrying the landmark tables."""
+    return replace(
+        network,
+        landmark_nodes=landmarks['landmark_nodes'],
+        landmark_from=landmarks['landmark_from'],
+        landmark_to=landmarks['landmark_to'],
+        metadata=dict(network.metadata, landmark_count=len(landmarks['landmark_nodes']),
+                      landmark_penalty_km=transfer_penalty_km),
+    )
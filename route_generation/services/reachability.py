@@ -0,0 +1,142 @@
+"""
+Reachability Module
+
+Everything a traveller can reach from one origin within a fare and transfer
+budget, found with one search over the whole network.
+
+Rides are searched one transfer level at a time. A boarding is a position on
+a route plus the fare already paid; riding on from it, the fare on alighting
+at a later vertex is ``paid + fare_for_distance(ride)``. Because a route's
+vertices are consecutive nodes, every boarding covers a contiguous run of
+nodes that ends where the fare budget runs out, so each level is a handful
+of vectorised slice updates. Transfer edges out of the nodes reached at one
+level become the boardings of the next, keeping only boardings cheaper than
+any earlier one at the same node.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from route_generation.services.graph_snapshot import TRANSFER_ROUTE, TransitNetwork
+from route_generation.services.routing_engine import (
+    FARE_PER_KM_REGULAR, MIN_FARE_KILOMETERS, MIN_FARE_REGULAR
+)
+
+
+@dataclass
+class Reachability:
+    """Cheapest fare and fewest transfers to reach each node (``inf`` / -1 if not reachable)."""
+    fare: np.ndarray
+    transfers: np.ndarray
+    boardings: int = 0
+
+
+def _fares(ride_km: np.ndarray) -> np.ndarray:
+    """Vectorised ``fare_for_distance``."""
+    return MIN_FARE_REGULAR + np.maximum(0.0, ride_km - MIN_FARE_KILOMETERS) * FARE_PER_KM_REGULAR
+
+
+def _max_ride_km(budget: float) -> float:
+    """Longest single ride affordable with ``budget`` (``-1`` if not even the minimum fare)."""
+    if budget < MIN_FARE_REGULAR:
+        return -1.0
+    return MIN_FARE_KILOMETERS + (budget - MIN_FARE_REGULAR) / FARE_PER_KM_REGULAR
+
+
+def _transfer_edges(network: TransitNetwork) -> Tuple[np.ndarray, np.ndarray]:
+    """``(from, to)`` node arrays of every transfer edge in the CSR rows."""
+    sources = np.repeat(np.arange(network.node_count, dtype=np.int64), np.diff(network.indptr))
+    mask = network.edge_route == TRANSFER_ROUTE
+    return sources[mask], network.indices[mask].astype(np.int64)
+
+
+def compute_reachability(network: TransitNetwork, boardings: List[Tuple[int, float]],
+                         max_fare: float, max_transfers: int) -> Reachability:
+    """Nodes reachable from the origin's ``boardings`` within the budgets.
+
+    ``boardings`` are ``(node, ride_km)`` pairs: the first node reached on a
+    route near the origin and the distance already ridden when reaching it.
+    """
+    cumdist, node_route, offsets = network.node_cumdist, network.node_route, network.route_offsets
+    size = network.node_count
+    best_fare = np.full(size, np.inf)
+    best_transfers = np.full(size, -1, dtype=np.int64)
+    boarded = np.full(size, np.inf)  # cheapest fare paid before boarding at a node
+    transfer_from, transfer_to = _transfer_edges(network)
+
+    # (node, position on the route in km, fare paid before this ride)
+    level = [(node, float(cumdist[node]) - ride_km, 0.0) for node, ride_km in boardings]
+    total_boardings = 0
+    for transfers in range(max_transfers + 1):
+        if not level:
+            break
+        total_boardings += len(level)
+        alight = np.full(size, np.inf)
+        for node, position, paid in level:
+            reach_km = _max_ride_km(max_fare - paid)
+            if reach_km < 0.0:
+                continue
+            route_end = int(offsets[int(node_route[node]) + 1])
+            stop = node + int(np.searchsorted(cumdist[node:route_end], position + reach_km + 1e-9, side='right'))
+            if stop <= node:
+                continue
+            fares = paid + _fares(cumdist[node:stop] - position)
+            np.minimum(alight[node:stop], fares, out=alight[node:stop])
+
+        reached = np.isfinite(alight)
+        newly = reached & (best_transfers < 0)
+        best_transfers[newly] = transfers
+        np.minimum(best_fare, alight, out=best_fare)
+        if transfers == max_transfers:
+            break
+
+        # Alighting at a transfer edge's source pays the fare so far; the next
+        # ride starts at its target with nothing ridden yet
+        paid = alight[transfer_from]
+        usable = paid + MIN_FARE_REGULAR <= max_fare + 1e-9
+        candidates = np.full(size, np.inf)
+        np.minimum.at(candidates, transfer_to[usable], paid[usable])
+        improved = np.flatnonzero(candidates < boarded)
+        boarded[improved] = candidates[improved]
+        level = [(node, float(cumdist[node]), float(candidates[node])) for node in improved.tolist()]
+
+    return Reachability(fare=best_fare, transfers=best_transfers, boardings=total_boardings)
+
+
+def reachability_geojson(network: TransitNetwork, reach: Reachability) -> Dict:
+    """Reachable stretches of each route as LineString features.
+
+    Each feature is a run of consecutive reachable vertices on one route,
+    with the fare range along it and the fewest transfers it needs.
+    """
+    coords = network.node_coords
+    reachable = np.isfinite(reach.fare)
+    features = []
+    for route_index, name in enumerate(network.route_names):
+        start, end = int(network.route_offsets[route_index]), int(network.route_offsets[route_index + 1])
+        flags = reachable[start:end]
+        if not flags.any():
+            continue
+        # Boundaries of runs of True within the route
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], flags.astype(np.int8), [0]))))
+        for run_start, run_stop in zip(edges[0::2].tolist(), edges[1::2].tolist()):
+            if run_stop - run_start < 2:
+                continue
+            nodes = slice(start + run_start, start + run_stop)
+            fares = reach.fare[nodes]
+            features.append({
+                "type": "Feature",
+                "properties": {
+                    "route": name,
+                    "min_fare": round(float(fares.min()), 2),
+                    "max_fare": round(float(fares.max()), 2),
+                    "transfers": int(reach.transfers[nodes].min()),
+                },
+                "geometry": {
+                    "type": "LineString",
+                    "coordinates": [(float(lng), float(lat)) for lng, lat in coords[nodes]],
+                },
+            })
+    return {"type": "FeatureCollection", "features": features}
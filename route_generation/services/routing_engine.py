@@ -0,0 +1,679 @@
+"""
+Routing Engine Module
+
+Route generation over a ``TransitNetwork`` snapshot: finds nearby route
+edges at both ends, runs one CSR A* iteration per boarding edge towards all
+alighting edges and selects the best distinct itineraries. Output matches
+``route_generator``: a list of GeoJSON FeatureCollections, one per route
+option.
+
+Requests that one route serves directly, with no possible multi-route
+alternative ranking better, are answered from cumulative route distances
+without a graph search.
+
+Each request shares one expansion budget and one deadline across its
+searches; when either runs out the best routes found so far are returned
+and the plan is marked incomplete.
+
+A request's searches run one after another, most promising boarding edge
+first. Once ``max_results`` distinct routes are known, a search is skipped
+or cancelled as soon as its lower bound shows that every route it could
+still return would rank below all of them; the bound is taken on the
+ranking itself (fare, or distance), so pruning never drops a route that
+would have been returned.
+
+``route_matrix`` answers many origins and destinations at once from one
+search tree per origin, or per destination when there are fewer of those,
+and ``reachable`` maps everything within a fare budget (see
+``reachability``).
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from route_generation.models.route_models import (
+    Coordinate, NearbyEdge, RouteOptions, RouteResult, RouteSegment, SearchResult
+)
+from route_generation.services.csr_graph import BUDGET_EXHAUSTED, DEADLINE_REACHED, CSRGraph, SearchBounds
+from route_generation.services.graph_snapshot import TRANSFER_ROUTE, TransitNetwork
+from route_generation.utils.array_geometry import haversine_km, project_onto_segments
+
+# Extra cost (km) per transfer so the search does not hop between routes
+# to save a few metres of riding
+DEFAULT_TRANSFER_PENALTY_KM = 1.0
+
+# Same schedule as FareCalculator's defaults
+MIN_FARE_REGULAR = 12.0
+MIN_FARE_KILOMETERS = 4.0
+FARE_PER_KM_REGULAR = 1.8
+
+
+
+def fare_for_distance(distance_km: float) -> float:
+    """Regular jeepney fare for one ride of ``distance_km``."""
+    extra_km = max(0.0, distance_km - MIN_FARE_KILOMETERS)
+    return MIN_FARE_REGULAR + extra_km * FARE_PER_KM_REGULAR
+
+
+@dataclass
+class _Access:
+    """Where a traveller joins or leaves a route segment."""
+    nearby: NearbyEdge
+    segment: int          # segment start node
+    route_index: int
+    offset_km: float      # distance from the segment start to the projection
+    segment_km: float
+    walk_km: float
+
+
+@dataclass
+class _Iteration:
+    start: _Access
+    end: _Access
+    search: SearchResult
+    index: int
+
+
+class _Budget:
+    """Expansions and wall-clock time left for one request.
+
+    A search ``reserve``s expansions before it starts and returns what it
+    did not use through ``spend``, so searches that overlap cannot each
+    spend the whole remainder.
+    """
+
+    def __init__(self, max_expansions: Optional[int], deadline_seconds: Optional[float]):
+        self.remaining = max_expansions
+        self.deadline = time.monotonic() + deadline_seconds if deadline_seconds else None
+        self.expanded = 0
+        self.reason: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @property
+    def exhausted(self) -> bool:
+        with self._lock:
+            if self.reason is None:
+                if self.remaining is not None and self.remaining <= 0:
+                    self.reason = BUDGET_EXHAUSTED
+                elif self.deadline is not None and time.monotonic() >= self.deadline:
+                    self.reason = DEADLINE_REACHED
+            return self.reason is not None
+
+    def reserve(self) -> Optional[int]:
+        """Take every expansion left for one search; None when unlimited."""
+        with self._lock:
+            if self.remaining is None:
+                return None
+            granted = max(0, self.remaining)
+            self.remaining -= granted
+            return granted
+
+    def spend(self, search: SearchResult, reserved: Optional[int] = None):
+        """Count ``search``'s expansions, returning the unused part of ``reserved``."""
+        with self._lock:
+            self.expanded += search.visited_nodes
+            if self.remaining is not None:
+                self.remaining += (reserved or 0) - search.visited_nodes
+            if search.partial and self.reason is None:
+                self.reason = search.error_message
+
+    def stop(self, reason: str):
+        """Mark the request incomplete for ``reason`` unless it already is."""
+        with self._lock:
+            self.reason = self.reason or reason
+
+
+class _Incumbents:
+    """Rank keys of the best distinct routes found so far for one request.
+
+    Routes are told apart and ranked as in ``_select_best_routes``. Once
+    ``keep`` are known, ``limit`` is the largest search cost, less the
+    walking at both ends, that a route can have and still rank no worse
+    than the ``keep``-th; infinity until then.
+
+    The search cost of a route with ``T`` transfers is its walking plus
+    ride distance plus ``T`` times the transfer walk and penalty, and it
+    pays at least the minimum fare on each of its ``T + 1`` rides plus the
+    per-km fare on ride distance past the minimum distance of each. Taking
+    the longest transfer walk in the network gives, for each ``T``, the
+    most search cost such a route can have without its rank key exceeding
+    the ``keep``-th; ``limit`` is the largest over ``T``.
+    """
+
+    def __init__(self, keep: int, options: RouteOptions, transfer_walk_km: float, transfer_penalty_km: float):
+        self.keep = keep
+        self.options = options
+        self.transfer_walk_km = transfer_walk_km
+        self.transfer_penalty_km = transfer_penalty_km
+        self.limit = float('inf')
+        self._best: Dict[Tuple[str, ...], float] = {}
+
+    def offer(self, signature: Tuple[str, ...], key: float):
+        if key >= self._best.get(signature, float('inf')):
+            return
+        self._best[signature] = key
+        if len(self._best) >= self.keep:
+            self.limit = self._cost_limit(sorted(self._best.values())[self.keep - 1])
+
+    def _cost_limit(self, key: float) -> float:
+        options = self.options
+        max_transfers = options.bound('max_transfers')
+        by_distance = _ranks_by_distance(options)
+        if by_distance and max_transfers is None:
+            # Each transfer's penalty buys distance back; no finite bound
+            return float('inf')
+        limit = float('-inf')
+        transfers = 0
+        while max_transfers is None or transfers <= max_transfers:
+            scaled = key / (1.0 + options.penalty_per_transfer * transfers)
+            if by_distance:
+                limit = max(limit, transfers * self.transfer_penalty_km + scaled)
+            else:
+                rides = transfers + 1
+                if MIN_FARE_REGULAR * rides > scaled:
+                    break  # and for every larger number of transfers
+                limit = max(limit, transfers * (self.transfer_walk_km + self.transfer_penalty_km)
+                            + MIN_FARE_KILOMETERS * rides + (scaled - MIN_FARE_REGULAR * rides) / FARE_PER_KM_REGULAR)
+            transfers += 1
+        return limit
+
+
+@dataclass
+class RoutePlan:
+    """Route options plus whether every search ran to completion."""
+    routes: List[Dict] = field(default_factory=list)
+    complete: bool = True
+    reason: Optional[str] = None
+    expanded_nodes: int = 0
+    fast_path: bool = False  # answered by a direct ride without graph search
+
+
+@dataclass
+class RouteMatrix:
+    """Fare, distance and transfers of the cheapest route between each origin and destination.
+
+    Rows follow origins and columns destinations. ``None`` marks pairs with
+    no route inside the walking radius, or not reached before the deadline.
+    """
+    fare: List[List[Optional[float]]]
+    distance_km: List[List[Optional[float]]]
+    transfers: List[List[Optional[int]]]
+    complete: bool = True
+    reason: Optional[str] = None
+    direction: str = 'forward'  # 'backward' when trees were grown from the destinations
+    expanded_nodes: int = 0
+
+
+class RoutingEngine:
+    """Route generator backed by a CSR graph.
+
+    ``max_expansions`` and ``deadline_seconds`` bound the total search work
+    per request; ``None`` leaves that bound off.
+    """
+
+    def __init__(self, network: TransitNetwork, max_candidates: int = 5, max_results: int = 3,
+                 max_expansions: Optional[int] = None, deadline_seconds: Optional[float] = None):
+        self.network = network
+        self.graph = CSRGraph(network, transfer_penalty_km=DEFAULT_TRANSFER_PENALTY_KM)
+        self.max_candidates = max_candidates
+        self.max_results = max_results
+        self.max_expansions = max_expansions
+        self.deadline_seconds = deadline_seconds
+        transfer_weights = network.weights[network.edge_route == TRANSFER_ROUTE]
+        self.max_transfer_walk_km = float(transfer_weights.max()) if len(transfer_weights) else 0.0
+
+    def generate_route(self, start_coord: Tuple[float, float], end_coord: Tuple[float, float],
+                       radius: float, options: Optional[RouteOptions] = None) -> List[Dict]:
+        """Generate route options between two ``(lng, lat)`` points."""
+        return self.plan_route(start_coord, end_coord, radius, options).routes
+
+    def plan_route(self, start_coord: Tuple[float, float], end_coord: Tuple[float, float],
+                   radius: float, options: Optional[RouteOptions] = None) -> RoutePlan:
+        """Like ``generate_route``, also reporting whether the result is complete."""
+        options = options or RouteOptions()
+        budget = _Budget(self.max_expansions, self.deadline_seconds)
+        walk_limit = options.bound('max_walking_distance')
+        if walk_limit is None:
+            walk_limit = float('inf')
+        start_access = [a for a in self._find_access(start_coord, radius) if a.walk_km <= walk_limit]
+        end_access = [a for a in self._find_access(end_coord, radius) if a.walk_km <= walk_limit]
+        if not start_access or not end_access:
+            logging.info("No route edges within walking radius of origin or destination")
+            return RoutePlan()
+
+        direct = self._select_best_routes(self._direct_iterations(start_access, end_access, walk_limit), options)
+        if direct and self._unbeatable(direct[0], start_coord, end_coord, radius, options):
+            return RoutePlan(routes=self._to_geojson(direct, True, options), fast_path=True)
+
+        iterations = self._run_iterations(start_access, end_access, start_coord, end_coord, options, budget)
+        complete = budget.reason is None
+        routes = self._to_geojson(self._select_best_routes(iterations, options), complete, options)
+        if not complete:
+            logging.warning(f"Route search incomplete ({budget.reason}) after {budget.expanded} expansions")
+        return RoutePlan(routes=routes, complete=complete, reason=budget.reason, expanded_nodes=budget.expanded)
+
+    def route_matrix(self, origins: List[Tuple[float, float]], destinations: List[Tuple[float, float]],
+                     radius: float) -> RouteMatrix:
+        """Cheapest route between every origin and destination.
+
+        Each cell is the itinerary with the lowest search cost (ride distance
+        plus transfer penalties), the same cost ``plan_route`` searches on.
+        One search tree serves a whole row, or a whole column when there are
+        fewer destinations than origins. ``max_expansions`` applies per tree
+        and ``deadline_seconds`` to the whole matrix.
+        """
+        start_access = [self._find_access(origin, radius) for origin in origins]
+        end_access = [self._find_access(destination, radius) for destination in destinations]
+        reverse = len(destinations) < len(origins)
+        budget = _Budget(None, self.deadline_seconds)
+
+        best: Dict[Tuple[int, int], Tuple[float, _Access, List[Tuple[int, int, int]], _Access]] = {}
+
+        def offer(i, j, cost, start, path, end):
+            if cost < best.get((i, j), (float('inf'),))[0]:
+                best[(i, j)] = (cost, start, path, end)
+
+        # Boarding and alighting on the same segment needs no search
+        for i, starts in enumerate(start_access):
+            for j, ends in enumerate(end_access):
+                for start in starts:
+                    for end in ends:
+                        if self._is_direct(start, end):
+                            offer(i, j, start.walk_km + (end.offset_km - start.offset_km) + end.walk_km,
+                                  start, [], end)
+
+        if reverse:
+            targets = {start.segment + 1 for starts in start_access for start in starts}
+            for j, ends in enumerate(end_access):
+                if not ends:
+                    continue
+                roots = {}
+                for end in ends:
+                    cost = end.offset_km + end.walk_km
+                    if cost < roots.get(end.segment, (float('inf'),))[0]:
+                        roots[end.segment] = (cost, end)
+                tree = self._tree({node: cost for node, (cost, _) in roots.items()}, targets, True, budget)
+                if tree is None:
+                    break
+                for i, starts in enumerate(start_access):
+                    for start in starts:
+                        node = start.segment + 1
+                        if node in tree.dist:
+                            path = tree.path(node)
+                            root = path[-1][1] if path else node
+                            offer(i, j, self._entry_cost(start) + tree.dist[node], start, path, roots[root][1])
+        else:
+            targets = {end.segment for ends in end_access for end in ends}
+            for i, starts in enumerate(start_access):
+                if not starts:
+                    continue
+                roots = {}
+                for start in starts:
+                    cost = self._entry_cost(start)
+                    if cost < roots.get(start.segment + 1, (float('inf'),))[0]:
+                        roots[start.segment + 1] = (cost, start)
+                tree = self._tree({node: cost for node, (cost, _) in roots.items()}, targets, False, budget)
+                if tree is None:
+                    break
+                for j, ends in enumerate(end_access):
+                    for end in ends:
+                        if end.segment in tree.dist:
+                            path = tree.path(end.segment)
+                            root = path[0][0] if path else end.segment
+                            offer(i, j, tree.dist[end.segment] + end.offset_km + end.walk_km,
+                                  roots[root][1], path, end)
+
+        shape = [[None] * len(destinations) for _ in origins]
+        matrix = RouteMatrix(fare=[row[:] for row in shape], distance_km=[row[:] for row in shape],
+                             transfers=[row[:] for row in shape], complete=budget.reason is None,
+                             reason=budget.reason, direction='backward' if reverse else 'forward',
+                             expanded_nodes=budget.expanded)
+        for (i, j), (_, start, path, end) in best.items():
+            fare, distance_km, transfers = self._path_totals(start, path, end)
+            matrix.fare[i][j] = fare
+            matrix.distance_km[i][j] = distance_km
+            matrix.transfers[i][j] = transfers
+        if not matrix.complete:
+            logging.warning(f"Route matrix incomplete ({budget.reason}) after {budget.expanded} expansions")
+        return matrix
+
+    def reachable(self, origin: Tuple[float, float], radius: float, max_fare: float,
+                  max_transfers: int) -> Dict:
+        """GeoJSON of the route stretches reachable from ``origin`` within the budgets."""
+        from route_generation.services.reachability import compute_reachability, reachability_geojson
+
+        boardings = [(access.segment + 1, access.segment_km - access.offset_km)
+                     for access in self._find_access(origin, radius)]
+        reach = compute_reachability(self.network, boardings, max_fare, max_transfers)
+        return reachability_geojson(self.network, reach)
+
+    def _tree(self, sources: Dict[int, float], targets, reverse: bool, budget: _Budget):
+        """One search tree for the matrix, or None once the deadline has passed.
+
+        A tree cut short by its expansion budget still answers the targets it
+        settled; the matrix is then marked incomplete but later trees run.
+        """
+        if budget.deadline is not None and time.monotonic() >= budget.deadline:
+            budget.stop(DEADLINE_REACHED)
+            return None
+        tree = self.graph.search_tree(sources, targets, reverse=reverse,
+                                      max_expansions=self.max_expansions, deadline=budget.deadline)
+        budget.spend(SearchResult(path=None, visited_nodes=tree.visited_nodes, checked_nodes=0,
+                                  success=tree.reason is None, error_message=tree.reason,
+                                  partial=tree.reason is not None))
+        return tree
+
+    def _path_totals(self, start: _Access, path: List[Tuple[int, int, int]], end: _Access) -> Tuple[float, float, int]:
+        """``(fare, distance_km, transfers)`` as ``_build_route_result`` would total them."""
+        if self._is_direct(start, end):
+            ride_km = end.offset_km - start.offset_km
+            return fare_for_distance(ride_km), ride_km, 0
+
+        weights, edge_route = self.network.weights, self.network.edge_route
+        legs, walked_km, leg_km = [], 0.0, start.segment_km - start.offset_km
+        for _, _, edge in path:
+            if int(edge_route[edge]) == TRANSFER_ROUTE:
+                legs.append(leg_km)
+                walked_km += float(weights[edge])
+                leg_km = 0.0
+            else:
+                leg_km += float(weights[edge])
+        legs.append(leg_km + end.offset_km)
+        return sum(fare_for_distance(km) for km in legs), sum(legs) + walked_km, len(legs) - 1
+
+    @staticmethod
+    def _to_geojson(results: List[RouteResult], complete: bool, options: RouteOptions) -> List[Dict]:
+        routes = []
+        for result in results:
+            geojson = result.to_geojson()
+            geojson['features'][0]['properties']['complete'] = complete
+            if not options.include_walking:
+                geojson['features'] = [feature for feature in geojson['features']
+                                       if feature['properties'].get('route') != "Transfer"]
+            routes.append(geojson)
+        return routes
+
+    def _find_nearby_edges(self, coordinate: Tuple[float, float], radius: float) -> List[NearbyEdge]:
+        """Edges within ``radius`` metres, closest first, at most two per route."""
+        return [access.nearby for access in self._find_access(coordinate, radius)]
+
+    def _find_access(self, coordinate: Tuple[float, float], radius: float) -> List[_Access]:
+        lng, lat = coordinate
+        segments = self.network.candidate_segments(lng, lat, radius)
+        if segments.size == 0:
+            return []
+
+        coords = self.network.node_coords
+        a, b = coords[segments], coords[segments + 1]
+        _, qx, qy = project_onto_segments(lng, lat, a[:, 0], a[:, 1], b[:, 0], b[:, 1])
+        distance_m = haversine_km(lng, lat, qx, qy) * 1000.0
+        within = np.flatnonzero(distance_m <= radius)
+        if within.size == 0:
+            return []
+
+        # Closest segment per route, plus one more per route when it lies on a
+        # different stretch (e.g. the return leg running along the same street)
+        chosen, per_route = [], {}
+        for i in within[np.argsort(distance_m[within], kind='stable')].tolist():
+            segment = int(segments[i])
+            taken = per_route.setdefault(int(self.network.node_route[segment]), [])
+            if len(taken) >= 2 or any(abs(segment - other) <= 2 for other in taken):
+                continue
+            taken.append(segment)
+            chosen.append(i)
+            if len(chosen) >= self.max_candidates:
+                break
+
+        access = []
+        for i in chosen:
+            segment = int(segments[i])
+            route_index = int(self.network.node_route[segment])
+            point = Coordinate(float(qx[i]), float(qy[i]))
+            access.append(_Access(
+                nearby=NearbyEdge(
+                    edge=(str(segment), str(segment + 1)),
+                    route_name=self.network.route_names[route_index],
+                    nearest_point=point,
+                    distance_meters=float(distance_m[i]),
+                ),
+                segment=segment,
+                route_index=route_index,
+                offset_km=float(haversine_km(coords[segment, 0], coords[segment, 1], point.longitude, point.latitude)),
+                segment_km=float(self.network.node_cumdist[segment + 1] - self.network.node_cumdist[segment]),
+                walk_km=float(distance_m[i]) / 1000.0,
+            ))
+        return access
+
+    def _direct_iterations(self, start_access: List[_Access], end_access: List[_Access],
+                           walk_limit: float) -> List[_Iteration]:
+        """Shortest ride per route that passes both ends in travel order."""
+        cumdist, indptr = self.network.node_cumdist, self.network.indptr
+        best = {}
+        for start in start_access:
+            for end in end_access:
+                if start.route_index != end.route_index or start.segment > end.segment:
+                    continue
+                if start.walk_km + end.walk_km > walk_limit:
+                    continue
+                if start.segment == end.segment and not self._is_direct(start, end):
+                    continue
+                ride_km = (float(cumdist[end.segment]) + end.offset_km) - (float(cumdist[start.segment]) + start.offset_km)
+                if start.route_index not in best or ride_km < best[start.route_index][0]:
+                    best[start.route_index] = (ride_km, start, end)
+
+        iterations = []
+        for _, start, end in sorted(best.values(), key=lambda item: item[0]):
+            # A node's ride edge comes before its transfers in the CSR rows
+            path = [(node, node + 1, int(indptr[node])) for node in range(start.segment + 1, end.segment)]
+            search = SearchResult(path=path, visited_nodes=0, checked_nodes=0, success=True)
+            iterations.append(_Iteration(start=start, end=end, search=search, index=len(iterations)))
+        return iterations
+
+    @staticmethod
+    def _unbeatable(direct: RouteResult, start_coord, end_coord, radius: float, options: RouteOptions) -> bool:
+        """Whether no itinerary with a transfer could rank above ``direct``.
+
+        Any such itinerary pays at least two minimum fares and rides at least
+        the straight-line distance between the two walking circles, both
+        scaled by one transfer penalty.
+        """
+        if options.bound('max_transfers') == 0:
+            return True
+        penalty = 1.0 + options.penalty_per_transfer
+        if _ranks_by_distance(options):
+            gap_km = float(haversine_km(start_coord[0], start_coord[1], end_coord[0], end_coord[1])) - 2.0 * radius / 1000.0
+            return direct.total_distance_km < max(0.0, gap_km) * penalty
+        return direct.total_fare < 2.0 * MIN_FARE_REGULAR * penalty
+
+    def _run_iterations(self, start_access, end_access, start_coord, end_coord,
+                        options: RouteOptions, budget: _Budget) -> List[_Iteration]:
+        """One search per boarding candidate, towards every alighting candidate."""
+        targets, ends_by_node = {}, {}
+        for end in end_access:
+            cost = end.offset_km + end.walk_km
+            if cost < targets.get(end.segment, float('inf')):
+                targets[end.segment] = cost
+                ends_by_node[end.segment] = end
+
+        heuristic = self._heuristic(options, start_access, targets, end_coord)
+        # Unenforced options leave their bound off; with neither, astar runs unbounded
+        bounds = SearchBounds(
+            max_transfers=options.bound('max_transfers'),
+            max_walk_km=options.bound('max_walking_distance'),
+            target_walk={node: end.walk_km for node, end in ends_by_node.items()},
+        )
+        incumbents = _Incumbents(self.max_results, options, self.max_transfer_walk_km,
+                                 self.graph.transfer_penalty_km)
+        egress_walk_km = max(end.walk_km for end in end_access)
+
+        # Most promising boarding edges first, so their routes prune the rest sooner
+        lower_bounds = {id(start): self._entry_cost(start) + heuristic(start.segment + 1) for start in start_access}
+        iterations = []
+        for start in sorted(start_access, key=lambda start: lower_bounds[id(start)]):
+            walk_km = start.walk_km + egress_walk_km
+            if lower_bounds[id(start)] > walk_km + incumbents.limit:
+                continue
+            iterations.extend(self._iterations_from(
+                start, end_access, targets, ends_by_node, heuristic, budget, bounds, options,
+                incumbents, lambda walk_km=walk_km: walk_km + incumbents.limit,
+            ))
+
+        for index, iteration in enumerate(iterations):
+            iteration.index = index
+        return iterations
+
+    @staticmethod
+    def _entry_cost(start: _Access) -> float:
+        """Search cost on reaching the end of the boarding segment."""
+        return start.walk_km + (start.segment_km - start.offset_km)
+
+    def _heuristic(self, options: RouteOptions, start_access, targets, end_coord):
+        """Straight-line distance, or ALT bounds when requested and available."""
+        haversine = self.graph.haversine_heuristic(end_coord)
+        if options.heuristic != 'alt':
+            return haversine
+        if not self.graph.has_landmarks:
+            logging.warning("ALT heuristic requested but the snapshot has no usable landmarks")
+            return haversine
+        landmarks = self.graph.landmark_heuristic([start.segment + 1 for start in start_access], targets)
+        return lambda node: max(landmarks(node), haversine(node))
+
+    @staticmethod
+    def _is_direct(start: _Access, end: _Access) -> bool:
+        """Boarding and alighting on the same segment, in travel order."""
+        return start.segment == end.segment and start.offset_km <= end.offset_km
+
+    def _iterations_from(self, start: _Access, end_access: List[_Access], targets: Dict[int, float],
+                         ends_by_node: Dict[int, _Access], heuristic, budget: _Budget,
+                         bounds: SearchBounds, options: RouteOptions, incumbents: _Incumbents,
+                         cutoff) -> List[_Iteration]:
+        """Same-segment rides plus one search from ``start``; indices are set by the caller.
+
+        Routes found are offered to ``incumbents``; the search is cancelled
+        once its lower bound exceeds ``cutoff()``.
+        """
+        iterations = []
+        for end in end_access:
+            if self._is_direct(start, end) and (bounds.max_walk_km is None
+                                                or start.walk_km + end.walk_km <= bounds.max_walk_km):
+                cost = start.walk_km + (end.offset_km - start.offset_km) + end.walk_km
+                direct = SearchResult(path=[], visited_nodes=0, checked_nodes=0, success=True, cost=cost)
+                iterations.append(_Iteration(start=start, end=end, search=direct, index=-1))
+                self._offer(iterations[-1], options, incumbents)
+
+        if budget.exhausted:
+            return iterations
+        source = start.segment + 1
+        reserved = budget.reserve()
+        search = self._search({source: self._entry_cost(start)}, targets, heuristic, reserved,
+                              budget.deadline, replace(bounds, source_walk={source: start.walk_km}), cutoff)
+        budget.spend(search, reserved)
+        if search.success:
+            exit_node = search.path[-1][1] if search.path else source
+            iterations.append(_Iteration(start=start, end=ends_by_node[exit_node], search=search, index=-1))
+            self._offer(iterations[-1], options, incumbents)
+        return iterations
+
+    def _offer(self, iteration: _Iteration, options: RouteOptions, incumbents: _Incumbents):
+        result = self._build_route_result(iteration)
+        incumbents.offer(_signature(result), _rank(result, options)[0])
+
+    def _search(self, sources: Dict[int, float], targets: Dict[int, float], heuristic,
+                max_expansions: Optional[int], deadline: Optional[float],
+                bounds: Optional[SearchBounds] = None, cutoff=None) -> SearchResult:
+        return self.graph.astar(sources, targets, heuristic, max_expansions=max_expansions,
+                                deadline=deadline, bounds=bounds, cutoff=cutoff)
+
+    def _build_route_result(self, iteration: _Iteration) -> RouteResult:
+        """Turn a CSR path into ride and transfer segments."""
+        start, end = iteration.start, iteration.end
+        coords = self.network.node_coords
+        weights, edge_route, node_route = self.network.weights, self.network.edge_route, self.network.node_route
+
+        def point(node):
+            return Coordinate(float(coords[node, 0]), float(coords[node, 1]))
+
+        legs = []  # (route_index, [Coordinate], distance_km)
+        if self._is_direct(start, end):
+            legs.append((start.route_index, [start.nearby.nearest_point, end.nearby.nearest_point],
+                         end.offset_km - start.offset_km))
+        else:
+            current = [start.nearby.nearest_point, point(start.segment + 1)]
+            current_km = start.segment_km - start.offset_km
+            current_route = start.route_index
+            for u, v, edge in iteration.search.path:
+                if int(edge_route[edge]) == TRANSFER_ROUTE:
+                    legs.append((current_route, current, current_km))
+                    legs.append((TRANSFER_ROUTE, [point(u), point(v)], float(weights[edge])))
+                    current, current_km, current_route = [point(v)], 0.0, int(node_route[v])
+                    continue
+                current.append(point(v))
+                current_km += float(weights[edge])
+            current.extend((point(end.segment), end.nearby.nearest_point))
+            legs.append((current_route, current, current_km + end.offset_km))
+
+        segments = []
+        for route_index, leg_coords, distance_km in legs:
+            is_transfer = route_index == TRANSFER_ROUTE
+            segments.append(RouteSegment(
+                route_name="Transfer" if is_transfer else self.network.route_names[route_index],
+                start_coordinate=leg_coords[0],
+                end_coordinate=leg_coords[-1],
+                distance_km=distance_km,
+                fare=0.0 if is_transfer else fare_for_distance(distance_km),
+                coordinates=_dedupe(leg_coords),
+            ))
+
+        return RouteResult(
+            segments=segments,
+            total_distance_km=sum(s.distance_km for s in segments),
+            total_fare=sum(s.fare for s in segments),
+            total_transfers=sum(1 for s in segments if s.route_name == "Transfer"),
+            walk_distance_km=start.walk_km + end.walk_km,
+            iteration=iteration.index,
+        )
+
+    def _select_best_routes(self, iterations: List[_Iteration], options: RouteOptions) -> List[RouteResult]:
+        """Distinct successful itineraries, best first."""
+        results = [self._build_route_result(it) for it in iterations if it.search.success]
+        selected, seen = [], set()
+        for result in sorted(results, key=lambda result: _rank(result, options)):
+            signature = _signature(result)
+            if signature in seen:
+                continue
+            seen.add(signature)
+            selected.append(result)
+            if len(selected) >= self.max_results:
+                break
+        return selected
+
+
+def _ranks_by_distance(options: RouteOptions) -> bool:
+    return options.prefer_distance or not options.prefer_fare
+
+
+def _rank(result: RouteResult, options: RouteOptions) -> Tuple[float, float]:
+    """Sort key of ``_select_best_routes``; lower is better."""
+    penalty = 1.0 + options.penalty_per_transfer * result.total_transfers
+    if _ranks_by_distance(options):
+        return (result.total_distance_km * penalty, result.total_fare)
+    return (result.total_fare * penalty, result.total_distance_km)
+
+
+def _signature(result: RouteResult) -> Tuple[str, ...]:
+    """Route names ridden, transfers included; equal signatures are one option."""
+    return tuple(s.route_name for s in result.segments)
+
+
+def _dedupe(coordinates: List[Coordinate]) -> List[Coordinate]:
+    """Drop consecutive duplicate points."""
+    unique = coordinates[:1]
+    for coord in coordinates[1:]:
+        if coord.to_tuple() != unique[-1].to_tuple():
+            unique.append(coord)
+    return unique
@@ -0,0 +1,168 @@
+"""
+Tiles Module
+
+Route geometry cut into Web Mercator ``z/x/y`` tiles for the map client.
+Each route polyline from the ``TransitNetwork`` is simplified to about half a
+pixel at the tile's zoom, clipped to the tile (plus a few pixels of margin so
+lines join cleanly across tile edges) and written as a GeoJSON
+FeatureCollection with the route's id, name and map color.
+
+``generate_tiles`` pre-renders every non-empty tile of a zoom range into a
+directory; ``render_tile`` builds one tile on demand.
+"""
+
+import json
+import logging
+import math
+import os
+import time
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from route_generation.models.route_models import route_color
+from route_generation.services.graph_snapshot import TransitNetwork
+
+TILE_SIZE_PX = 256
+
+# Simplification tolerance and clip margin, in pixels at the tile's zoom
+SIMPLIFY_PX = 0.5
+BUFFER_PX = 4
+
+# Marks a fully generated tile directory
+COMPLETE_MARKER = '_complete'
+
+EMPTY_TILE = json.dumps({"type": "FeatureCollection", "features": []}).encode('utf-8')
+
+
+def lnglat_to_tile(lng, lat, zoom):
+    """Fractional tile coordinates of ``(lng, lat)`` (arrays allowed)."""
+    scale = 2.0 ** zoom
+    lat_rad = np.radians(np.clip(lat, -85.05112878, 85.05112878))
+    x = (np.asarray(lng) + 180.0) / 360.0 * scale
+    y = (1.0 - np.log(np.tan(lat_rad) + 1.0 / np.cos(lat_rad)) / math.pi) / 2.0 * scale
+    return x, y
+
+
+def tile_bounds(zoom: int, x: float, y: float) -> Tuple[float, float, float, float]:
+    """``(west, south, east, north)`` in degrees of tile ``x, y`` (fractions allowed)."""
+    scale = 2.0 ** zoom
+
+    def lat(tile_y):
+        return math.degrees(math.atan(math.sinh(math.pi * (1.0 - 2.0 * tile_y / scale))))
+
+    return x / scale * 360.0 - 180.0, lat(y + 1), (x + 1) / scale * 360.0 - 180.0, lat(y)
+
+
+def _precision(zoom: int) -> int:
+    """Decimal places that keep coordinates under a pixel at ``zoom``."""
+    return max(5, min(7, int(math.ceil(math.log10(TILE_SIZE_PX * 2 ** zoom / 360.0)))))
+
+
+def _route_lines(network: TransitNetwork, zoom: int):
+    """``(route_index, simplified LineString)`` for every route."""
+    import shapely
+
+    tolerance = SIMPLIFY_PX * 360.0 / (TILE_SIZE_PX * 2 ** zoom)
+    offsets, coords = network.route_offsets, network.node_coords
+    for route_index in range(network.route_count):
+        polyline = coords[int(offsets[route_index]):int(offsets[route_index + 1])]
+        if len(polyline) >= 2:
+            yield route_index, shapely.simplify(shapely.linestrings(polyline), tolerance, preserve_topology=False)
+
+
+def _touched_tiles(line, zoom: int) -> set:
+    """Tiles whose buffered extent any segment of ``line`` may cross."""
+    import shapely
+
+    points = shapely.get_coordinates(line)
+    x, y = lnglat_to_tile(points[:, 0], points[:, 1], zoom)
+    margin = BUFFER_PX / TILE_SIZE_PX
+    low_x = np.floor(np.minimum(x[:-1], x[1:]) - margin).astype(np.int64)
+    high_x = np.floor(np.maximum(x[:-1], x[1:]) + margin).astype(np.int64)
+    low_y = np.floor(np.minimum(y[:-1], y[1:]) - margin).astype(np.int64)
+    high_y = np.floor(np.maximum(y[:-1], y[1:]) + margin).astype(np.int64)
+    tiles = set()
+    for x0, x1, y0, y1 in zip(low_x.tolist(), high_x.tolist(), low_y.tolist(), high_y.tolist()):
+        for tile_x in range(x0, x1 + 1):
+            for tile_y in range(y0, y1 + 1):
+                tiles.add((tile_x, tile_y))
+    return tiles
+
+
+def _feature(network: TransitNetwork, route_index: int, line, zoom: int, x: int, y: int):
+    """The part of ``line`` inside buffered tile ``x, y``, or None."""
+    import shapely
+
+    margin = BUFFER_PX / TILE_SIZE_PX
+    west, _, _, north = tile_bounds(zoom, x - margin, y - margin)
+    _, south, east, _ = tile_bounds(zoom, x + margin, y + margin)
+    clipped = shapely.clip_by_rect(line, west, south, east, north)
+    if clipped.is_empty:
+        return None
+    clipped = shapely.set_precision(clipped, 10.0 ** -_precision(zoom))
+    if clipped.is_empty or clipped.geom_type not in ('LineString', 'MultiLineString'):
+        return None
+    name = network.route_names[route_index]
+    return {
+        "type": "Feature",
+        "properties": {"route_id": route_index, "route": name, "color": route_color(name)},
+        "geometry": shapely.geometry.mapping(clipped),
+    }
+
+
+def _encode(features: List[Dict]) -> bytes:
+    return json.dumps({"type": "FeatureCollection", "features": features},
+                      separators=(',', ':')).encode('utf-8')
+
+
+def iter_tiles(network: TransitNetwork, zoom: int) -> Iterator[Tuple[Tuple[int, int], bytes]]:
+    """Every non-empty tile at ``zoom`` as ``((x, y), encoded GeoJSON)``."""
+    by_tile: Dict[Tuple[int, int], List[Dict]] = {}
+    for route_index, line in _route_lines(network, zoom):
+        for x, y in _touched_tiles(line, zoom):
+            feature = _feature(network, route_index, line, zoom, x, y)
+            if feature is not None:
+                by_tile.setdefault((x, y), []).append(feature)
+    for tile, features in by_tile.items():
+        yield tile, _encode(features)
+
+
+def render_tile(network: TransitNetwork, zoom: int, x: int, y: int) -> bytes:
+    """One tile, encoded; ``EMPTY_TILE`` if no route crosses it."""
+    features = []
+    for route_index, line in _route_lines(network, zoom):
+        if (x, y) in _touched_tiles(line, zoom):
+            feature = _feature(network, route_index, line, zoom, x, y)
+            if feature is not None:
+                features.append(feature)
+    return _encode(features) if features else EMPTY_TILE
+
+
+def tile_path(directory: str, zoom: int, x: int, y: int) -> str:
+    return os.path.join(directory, str(zoom), str(x), f"{y}.json")
+
+
+def generate_tiles(network: TransitNetwork, directory: str, min_zoom: int, max_zoom: int) -> int:
+    """Write every non-empty tile from ``min_zoom`` to ``max_zoom`` under ``directory``.
+
+    Files are written atomically and ``COMPLETE_MARKER`` last, so a reader
+    can tell a missing (empty) tile from one not generated yet.
+    """
+    started = time.perf_counter()
+    count = 0
+    for zoom in range(min_zoom, max_zoom + 1):
+        for (x, y), data in iter_tiles(network, zoom):
+            path = tile_path(directory, zoom, x, y)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.tmp-{os.getpid()}"
+            with open(temp_path, 'wb') as fh:
+                fh.write(data)
+            os.replace(temp_path, path)
+            count += 1
+    elapsed = time.perf_counter() - started
+    with open(os.path.join(directory, COMPLETE_MARKER), 'w') as fh:
+        fh.write(json.dumps({'network_id': network.network_id, 'tiles': count,
+                             'min_zoom': min_zoom, 'max_zoom': max_zoom, 'seconds': round(elapsed, 1)}))
+    logging.info(f"Generated {count} route tiles (z{min_zoom}-{max_zoom}) in {elapsed:.1f} s")
+    return count
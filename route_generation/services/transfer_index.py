@@ -0,0 +1,164 @@
+"""
+Transfer Index Module
+
+Offline precomputation of walking transfers between jeepney routes. All
+route vertices are bucketed into a grid whose cells are one walk distance
+wide, so every pair of vertices on different routes within walking distance
+is found by comparing each cell with its neighbours only. Each vertex keeps
+its closest few other routes, and for each ordered route pair only the
+shortest walk per area is kept.
+
+The resulting table is stored in the graph snapshot and merged into the CSR
+adjacency as transfer edges (``edge_route == TRANSFER_ROUTE``), so the A*
+search and route-based searches read the same transfers.
+"""
+
+import logging
+from dataclasses import replace
+from typing import Dict, Iterator
+
+import numpy as np
+
+from route_generation.services.graph_snapshot import TRANSFER_ROUTE, TransitNetwork
+from route_generation.utils.array_geometry import haversine_km, meters_to_degrees
+
+DEFAULT_MAX_WALK_METERS = 200.0
+
+# Transfers between the same two routes are thinned to one per area of this size
+DEFAULT_AREA_SIZE_DEG = 0.005
+
+# Each vertex keeps at most this many transfers, to its closest other routes
+DEFAULT_MAX_PER_NODE = 8
+
+_NEIGHBOUR_OFFSETS = tuple((dx, dy) for dy in (-1, 0, 1) for dx in (-1, 0, 1))
+
+
+def _candidate_batches(node_coords, node_route, max_walk_meters):
+    """Yield ``(i, j)`` index arrays of vertices on different routes in
+    neighbouring cells, one batch per source cell."""
+    cell_size = meters_to_degrees(max_walk_meters, float(node_coords[:, 1].mean()))
+    cells = np.floor((node_coords - node_coords.min(axis=0)) / cell_size).astype(np.int64) + 1
+    width = int(cells[:, 0].max()) + 2
+    keys = cells[:, 1] * width + cells[:, 0]
+    order = np.argsort(keys, kind='stable')
+    unique_keys, starts = np.unique(keys[order], return_index=True)
+    ends = np.append(starts[1:], len(order))
+    members = {int(key): order[start:end] for key, start, end in zip(unique_keys, starts, ends)}
+
+    for key, here in members.items():
+        there = [members[key + dy * width + dx] for dx, dy in _NEIGHBOUR_OFFSETS
+                 if key + dy * width + dx in members]
+        there = np.concatenate(there)
+        i = np.repeat(here, len(there))
+        j = np.tile(there, len(here))
+        keep = node_route[i] != node_route[j]
+        if keep.any():
+            yield i[keep], j[keep]
+
+
+def _first_per_group(sort_keys, group_keys):
+    """Indices of the first row of each group after sorting by ``sort_keys``."""
+    order = np.lexsort(sort_keys)
+    grouped = np.stack(group_keys)[:, order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = np.any(grouped[:, 1:] != grouped[:, :-1], axis=0)
+    return order[first]
+
+
+def compute_transfers(network: TransitNetwork, max_walk_meters: float = DEFAULT_MAX_WALK_METERS,
+                      area_size_deg: float = DEFAULT_AREA_SIZE_DEG,
+                      max_per_node: int = DEFAULT_MAX_PER_NODE) -> Dict[str, np.ndarray]:
+    """Best walking transfers per ordered route pair and area.
+
+    Returns ``transfer_from`` / ``transfer_to`` node arrays and the walking
+    distance ``transfer_km`` for each directed transfer.
+    """
+    coords, routes = network.node_coords, network.node_route
+    kept_from, kept_to, kept_km = [], [], []
+    for i, j in _candidate_batches(coords, routes, max_walk_meters):
+        km = haversine_km(coords[i, 0], coords[i, 1], coords[j, 0], coords[j, 1])
+        close = km <= max_walk_meters / 1000.0
+        i, j, km = i[close], j[close], km[close]
+        if not len(i):
+            continue
+        # Closest vertex on each other route, then the closest routes per vertex
+        best = _first_per_group((km, routes[j], i), (i, routes[j]))
+        i, j, km = i[best], j[best], km[best]
+        order = np.lexsort((km, i))
+        i, j, km = i[order], j[order], km[order]
+        rank = np.arange(len(i)) - np.searchsorted(i, i)
+        keep = rank < max_per_node
+        kept_from.append(i[keep])
+        kept_to.append(j[keep])
+        kept_km.append(km[keep])
+
+    if not kept_from:
+        empty = np.empty(0, dtype=np.int32)
+        return {'transfer_from': empty, 'transfer_to': empty.copy(), 'transfer_km': np.empty(0)}
+
+    source = np.concatenate(kept_from)
+    target = np.concatenate(kept_to)
+    walk_km = np.concatenate(kept_km)
+
+    area = np.floor((coords[source] - coords.min(axis=0)) / area_size_deg).astype(np.int64)
+    area_key = area[:, 1] * (int(area[:, 0].max()) + 1) + area[:, 0]
+    from_route = routes[source].astype(np.int64)
+    to_route = routes[target].astype(np.int64)
+    best = _first_per_group((walk_km, area_key, to_route, from_route), (from_route, to_route, area_key))
+
+    best = best[np.lexsort((target[best], source[best]))]
+    logging.info(f"Transfer index: {len(best)} transfers kept out of {len(source)} candidates")
+    return {
+        'transfer_from': source[best].astype(np.int32),
+        'transfer_to': target[best].astype(np.int32),
+        'transfer_km': walk_km[best],
+    }
+
+
+def attach_transfers(network: TransitNetwork, transfers: Dict[str, np.ndarray],
+                     max_walk_meters: float = DEFAULT_MAX_WALK_METERS) -> TransitNetwork:
+    """Return a copy of ``network`` whose CSR adjacency includes the transfers."""
+    ride = network.edge_route != TRANSFER_ROUTE
+    ride_source = np.repeat(np.arange(network.node_count), np.diff(network.indptr))[ride]
+    source = np.concatenate((ride_source, transfers['transfer_from']))
+    # Stable sort keeps each node's ride edge ahead of its transfers
+    order = np.argsort(source, kind='stable')
+
+    counts = np.bincount(source, minlength=network.node_count)
+    transfer_count = len(transfers['transfer_from'])
+    return replace(
+        network,
+        indptr=np.concatenate(([0], np.cumsum(counts))).astype(np.int64),
+        indices=np.concatenate((network.indices[ride], transfers['transfer_to']))[order].astype(np.int32),
+        weights=np.concatenate((network.weights[ride], transfers['transfer_km']))[order],
+        edge_route=np.concatenate((network.edge_route[ride],
+                                   np.full(transfer_count, TRANSFER_ROUTE, dtype=np.int32)))[order],
+        edge_geom=np.concatenate((network.edge_geom[ride],
+                                  np.full(transfer_count, -1, dtype=np.int64)))[order],
+        transfer_from=transfers['transfer_from'],
+        transfer_to=transfers['transfer_to'],
+        transfer_km=transfers['transfer_km'],
+        metadata=dict(network.metadata, transfer_max_walk_m=max_walk_meters, transfer_count=transfer_count),
+    )
+
+
+def iter_transfers(network: TransitNetwork) -> Iterator[Dict]:
+    """Transfers as plain records, for consumers outside the CSR graph.
+
+    The NetworkX graph and route-level searches key transfers by route name
+    and coordinate rather than by snapshot node index.
+    """
+    if network.transfer_from is None:
+        return
+    coords = network.node_coords
+    for source, target, km in zip(network.transfer_from.tolist(), network.transfer_to.tolist(),
+                                  network.transfer_km.tolist()):
+        yield {
+            'from_node': source,
+            'to_node': target,
+            'from_route': network.route_names[network.node_route[source]],
+            'to_route': network.route_names[network.node_route[target]],
+            'from_coordinate': (float(coords[source, 0]), float(coords[source, 1])),
+            'to_coordinate': (float(coords[target, 0]), float(coords[target, 1])),
+            'walk_km': km,
+        }
@@ -0,0 +1,44 @@
+"""
+Array Geometry Module
+
+Vectorized geometric helpers over NumPy arrays of ``(longitude, latitude)``
+coordinates, for code that works on whole networks at once rather than on
+one coordinate pair at a time.
+"""
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+METERS_PER_DEGREE = 111320.0
+
+
+def haversine_km(lng1, lat1, lng2, lat2):
+    """Great-circle distance in kilometres; all arguments broadcast."""
+    lng1, lat1, lng2, lat2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lng1, lat1, lng2, lat2))
+    a = np.sin((lat2 - lat1) / 2.0) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def meters_to_degrees(meters, latitude=10.7):
+    """Conservative (longitude-sized) degree span covering ``meters``."""
+    return meters / (METERS_PER_DEGREE * np.cos(np.radians(latitude)))
+
+
+def project_onto_segments(px, py, ax, ay, bx, by):
+    """Project point(s) onto segment(s) A-B in a local equirectangular frame.
+
+    Returns ``(t, qx, qy)`` where ``t`` is the clipped fraction along each
+    segment and ``(qx, qy)`` the projected coordinate.
+    """
+    scale = np.cos(np.radians(np.asarray(py, dtype=np.float64)))
+    dx = (np.asarray(bx) - ax) * scale
+    dy = np.asarray(by) - ay
+    wx = (np.asarray(px) - ax) * scale
+    wy = np.asarray(py) - ay
+    length_sq = dx * dx + dy * dy
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t = np.where(length_sq > 0, (wx * dx + wy * dy) / length_sq, 0.0)
+    t = np.clip(t, 0.0, 1.0)
+    qx = ax + t * (np.asarray(bx) - ax)
+    qy = ay + t * (np.asarray(by) - ay)
+    return t, qx, qy
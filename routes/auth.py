@@ -1,6 +1,4 @@
 from flask import Blueprint, request, jsonify, current_app
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
 import logging
 from datetime import datetime
 import pytz
@@ -26,6 +24,10 @@ def google_auth():
         logging.warning("Token is required")
         return jsonify({"error": "Token is required"}), 400
 
+    # google-auth is only needed for this endpoint; keep it off worker startup
+    from google.oauth2 import id_token
+    from google.auth.transport import requests as google_requests
+
     try:
         # Verify the token with Google
         user_info = id_token.verify_oauth2_token(
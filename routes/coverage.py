@@ -0,0 +1,64 @@
+from flask import Blueprint, current_app, request, jsonify
+import logging
+import math
+from services.coverage_service import get_coverage
+from utils.decorators import handle_errors
+
+coverage_bp = Blueprint('coverage', __name__, url_prefix='/api/coverage')
+
+
+@coverage_bp.route('', methods=['GET'])
+@handle_errors
+def get_coverage_grid():
+    """Distance to the nearest route for every grid cell inside a bounding box."""
+    from route_generation.services.coverage import NO_ROUTE
+
+    grid = get_coverage()
+    if grid is None:
+        return jsonify({"error": "Coverage grid has not been built"}), 503
+
+    try:
+        if "bbox" in request.args:
+            west, south, east, north = (float(value) for value in request.args["bbox"].split(","))
+        else:
+            west, south, east, north = grid.window_bounds(*(slice(0, size) for size in grid.shape))
+        within = float(request.args.get("within", current_app.config['COVERAGE_WALK_METERS']))
+    except ValueError:
+        return jsonify({"error": "bbox must be west,south,east,north and within a number"}), 400
+    if not all(math.isfinite(value) for value in (west, south, east, north, within)) \
+            or west >= east or south >= north:
+        return jsonify({"error": "Invalid bbox"}), 400
+
+    rows, cols = grid.window(west, south, east, north)
+    window = grid.distance_m[rows, cols]
+    max_cells = current_app.config['COVERAGE_MAX_CELLS']
+    if window.size > max_cells:
+        return jsonify({"error": f"bbox covers {window.size} cells; at most {max_cells} per request"}), 400
+
+    bounds = [round(value, 7) for value in grid.window_bounds(rows, cols)]
+    logging.debug("Coverage window %s: %d cells", bounds, window.size)
+    if request.args.get("format") == "binary":
+        response = current_app.response_class(window.astype('<u2').tobytes(), mimetype='application/octet-stream')
+        response.headers['X-Coverage-Bounds'] = ",".join(str(value) for value in bounds)
+        response.headers['X-Coverage-Shape'] = f"{window.shape[0]},{window.shape[1]}"
+        response.headers['X-Coverage-Cell-Deg'] = str(grid.cell_deg)
+        response.headers['X-Coverage-No-Route'] = str(NO_ROUTE)
+        return response
+
+    from services.network_service import get_network
+    network = get_network()
+    return jsonify({
+        "network_id": grid.metadata.get("network_id"),
+        "stale": network is not None and network.network_id != grid.metadata.get("network_id"),
+        "built_at": grid.metadata.get("built_at"),
+        "cell_deg": grid.cell_deg,
+        "max_distance_m": grid.max_distance_m,
+        "no_route": int(NO_ROUTE),
+        "bounds": bounds,
+        "shape": list(window.shape),
+        "within_m": within,
+        "covered_cells": int((window <= within).sum()),
+        "total_cells": int(window.size),
+        # Rows run south to north, columns west to east
+        "distance_m": window.tolist(),
+    })
@@ -1,7 +1,10 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, current_app, request, jsonify
+import io
 import logging
+import math
 from services.poi_service import POIService
 from utils.decorators import handle_errors
+from utils.jwt_service import jwt_required
 
 pois_bp = Blueprint('pois', __name__, url_prefix='/api/pois')
 
@@ -14,3 +17,55 @@ def get_pois():
     pois_list = poi_service.get_cached_pois()
     logging.info("Fetched POIs successfully")
     return jsonify(pois_list)
+
+
+@pois_bp.route('/nearby', methods=['GET'])
+@handle_errors
+def get_nearby_pois():
+    """Get the Points of Interest nearest to a point."""
+    try:
+        lng = float(request.args["lng"])
+        lat = float(request.args["lat"])
+        radius = float(request.args.get("radius", 500.0))
+        limit = int(request.args.get("limit", 10))
+    except KeyError as e:
+        return jsonify({"error": f"Missing query parameter: {e.args[0]}"}), 400
+    except (ValueError, TypeError) as e:
+        logging.warning("Invalid nearby POI parameters: %s", e)
+        return jsonify({"error": "lng, lat, radius and limit must be numeric"}), 400
+
+    max_radius = current_app.config['POI_NEARBY_MAX_RADIUS']
+    max_limit = current_app.config['POI_NEARBY_MAX_LIMIT']
+    if not (math.isfinite(lng) and math.isfinite(lat)) or not 0 < radius <= max_radius \
+            or not 0 < limit <= max_limit:
+        return jsonify({"error": f"radius must be in (0, {max_radius}] metres and limit in [1, {max_limit}]"}), 400
+
+    poi_service = POIService()  # Create instance within route context
+    pois_list = poi_service.get_nearby_pois(lng, lat, radius, limit)
+    logging.info("Fetched %d nearby POIs", len(pois_list))
+    return jsonify(pois_list)
+
+
+@pois_bp.route('/bulk', methods=['POST'])
+@jwt_required
+@handle_errors
+def bulk_import_pois():
+    """Upsert POIs from an NDJSON or GeoJSON request body."""
+    if request.user.get("sub") not in current_app.config['POI_ADMIN_USERS']:
+        return jsonify({"error": "Not allowed to import POIs"}), 403
+    chunk_size = request.args.get("chunk_size")
+    if chunk_size is not None:
+        try:
+            chunk_size = int(chunk_size)
+        except ValueError:
+            return jsonify({"error": "chunk_size must be an integer"}), 400
+        if chunk_size <= 0:
+            return jsonify({"error": "chunk_size must be positive"}), 400
+
+    lines = io.TextIOWrapper(request.stream, encoding='utf-8')
+    try:
+        report = POIService().bulk_import(lines, chunk_size)
+    except (ValueError, UnicodeDecodeError) as e:
+        logging.warning("Unreadable POI import body: %s", e)
+        return jsonify({"error": "Body must be NDJSON or a GeoJSON FeatureCollection"}), 400
+    return jsonify(report)
@@ -1,8 +1,11 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 import logging
-from services.route_service import RouteService
+import math
+from services.route_service import RouteService, DEFAULT_WALK_RADIUS
+from utils.admission import AdmissionRejected
 from utils.jwt_service import jwt_required
 from utils.decorators import handle_errors
+from utils.request_logging import current_request_log, redact_headers
 
 routes_bp = Blueprint('routes', __name__, url_prefix='/api/routes')
 
@@ -12,16 +15,12 @@ routes_bp = Blueprint('routes', __name__, url_prefix='/api/routes')
 @handle_errors
 def generate_route():
     """Generate a route between origin and destination."""
-    logging.info("Route generation started")
-    
-    # Log raw request data
-    raw_data = request.get_data(as_text=True)
-    logging.info(f"Raw request data: {raw_data}")
-    logging.info(f"Request headers: {dict(request.headers)}")
-    logging.info(f"Request content type: {request.content_type}")
-    
-    data = request.get_json()
-    logging.info(f"Parsed JSON data: {data}")
+    request_log = current_request_log()
+
+    with request_log.stage('parse'):
+        data = request.get_json(silent=True)
+    request_log.debug_payload("Route request headers", lambda: redact_headers(request.headers))
+    request_log.debug_payload("Route request body", data)
     
     if data is None:
         logging.error("No JSON data received or invalid JSON format")
@@ -30,11 +29,6 @@ def generate_route():
     origin_data = data.get("origin")
     destination_data = data.get("destination")
     walk_radius = data.get("walk_radius")
-    
-    logging.info(f"Origin data: {origin_data}")
-    logging.info(f"Destination data: {destination_data}")
-    logging.info(f"Walk radius: {walk_radius}")
-    logging.info(f"User info: {request.user}")
 
     if not origin_data or not destination_data:
         logging.warning("Origin and Destination are required")
@@ -42,48 +36,161 @@ def generate_route():
     
     # Validate origin and destination structure
     if not isinstance(origin_data, dict) or "lng" not in origin_data or "lat" not in origin_data:
-        logging.error(f"Invalid origin format: {origin_data}")
+        logging.error("Invalid origin format: %s", origin_data)
         return jsonify({"error": "Origin must contain 'lng' and 'lat' fields"}), 400
         
     if not isinstance(destination_data, dict) or "lng" not in destination_data or "lat" not in destination_data:
-        logging.error(f"Invalid destination format: {destination_data}")
+        logging.error("Invalid destination format: %s", destination_data)
         return jsonify({"error": "Destination must contain 'lng' and 'lat' fields"}), 400
     
     # Parse the data into tuples
     try:
         origin = (float(origin_data["lng"]), float(origin_data["lat"]))
         destination = (float(destination_data["lng"]), float(destination_data["lat"]))
-        walk_radius = float(walk_radius) if walk_radius is not None else 100.0
-        
-        logging.info(f"Parsed origin: {origin}")
-        logging.info(f"Parsed destination: {destination}")
-        logging.info(f"Parsed walk_radius: {walk_radius}")
-        
+        walk_radius = float(walk_radius) if walk_radius is not None else DEFAULT_WALK_RADIUS
     except (ValueError, TypeError) as e:
-        logging.error(f"Error parsing coordinates: {e}")
+        logging.error("Error parsing coordinates: %s", e)
         return jsonify({"error": "Invalid coordinate values"}), 400
-    
+    if not all(math.isfinite(value) for value in (*origin, *destination, walk_radius)):
+        return jsonify({"error": "Coordinates and walk_radius must be finite"}), 400
+    if walk_radius <= 0:
+        return jsonify({"error": "walk_radius must be positive"}), 400
+
+    # Search options; "heuristic" is also accepted at the top level
+    from route_generation.models.route_models import RouteOptions
+    options_data = data.get("options") or {}
+    if "heuristic" in data and isinstance(options_data, dict):
+        options_data = dict(options_data, heuristic=data["heuristic"])
+    try:
+        options = RouteOptions.from_dict(options_data)
+    except ValueError as e:
+        logging.warning("Invalid route options: %s", e)
+        return jsonify({"error": str(e)}), 400
+
+    request_log.annotate(origin=origin, destination=destination, walk_radius=walk_radius,
+                         heuristic=options.heuristic, max_transfers=options.bound('max_transfers'))
     route_service = RouteService()  # Create instance within route context
-    logging.info("RouteService instance created, calling generate_route...")
     
     try:
-        route = route_service.generate_route(origin, destination, walk_radius)
-        logging.info(f"Route generated successfully: {type(route)} with length {len(route) if hasattr(route, '__len__') else 'N/A'}")
-        logging.info(f"Route content: {route}")
+        with request_log.stage('generate'):
+            route, complete, reason = route_service.plan_route(origin, destination, walk_radius, options)
+        request_log.annotate(route_count=len(route) if hasattr(route, '__len__') else None,
+                             complete=complete)
+        request_log.debug_payload("Route content", route)
         
         # Store the route in user history
         user_id = request.user["sub"]
-        logging.info(f"Storing route in history for user: {user_id}")
-        route_service.store_route_in_history(user_id, origin, destination, route)
-        logging.info("Route stored in history successfully")
+        with request_log.stage('store_history'):
+            route_service.store_route_in_history(user_id, origin, destination, route, walk_radius)
 
-        return jsonify(route)
+        with request_log.stage('serialize'):
+            response = jsonify(route)
+        # Partial results also carry "complete": false in each route's summary feature
+        response.headers['X-Route-Complete'] = 'true' if complete else 'false'
+        if reason:
+            response.headers['X-Route-Incomplete-Reason'] = reason
+        return response
         
+    except AdmissionRejected:
+        raise
     except Exception as e:
-        logging.error(f"Error in route generation or storage: {e}")
+        logging.error("Error in route generation or storage: %s", e)
         return jsonify({"error": "Route generation failed"}), 500
 
 
+@routes_bp.route('/matrix', methods=['POST'])
+@jwt_required
+@handle_errors
+def route_matrix():
+    """Fare, distance and transfers between every origin and destination."""
+    request_log = current_request_log()
+    data = request.get_json(silent=True)
+    if data is None:
+        logging.error("No JSON data received or invalid JSON format")
+        return jsonify({"error": "Invalid JSON data"}), 400
+
+    origins_data = data.get("origins")
+    destinations_data = data.get("destinations")
+    if not isinstance(origins_data, list) or not isinstance(destinations_data, list) \
+            or not origins_data or not destinations_data:
+        logging.warning("Origins and destinations lists are required")
+        return jsonify({"error": "Origins and destinations lists are required"}), 400
+
+    max_points = current_app.config['ROUTE_MATRIX_MAX_POINTS']
+    if len(origins_data) > max_points or len(destinations_data) > max_points:
+        return jsonify({"error": f"At most {max_points} origins and {max_points} destinations are allowed"}), 400
+
+    try:
+        origins = [(float(point["lng"]), float(point["lat"])) for point in origins_data]
+        destinations = [(float(point["lng"]), float(point["lat"])) for point in destinations_data]
+        walk_radius = data.get("walk_radius")
+        walk_radius = float(walk_radius) if walk_radius is not None else DEFAULT_WALK_RADIUS
+    except (KeyError, ValueError, TypeError) as e:
+        logging.error("Error parsing matrix coordinates: %s", e)
+        return jsonify({"error": "Each point must contain numeric 'lng' and 'lat' fields"}), 400
+
+    request_log.annotate(origins=len(origins), destinations=len(destinations), walk_radius=walk_radius)
+    with request_log.stage('matrix'):
+        matrix = RouteService().route_matrix(origins, destinations, walk_radius)
+    if matrix is None:
+        return jsonify({"error": "Route matrix requires a graph snapshot"}), 503
+    request_log.annotate(complete=matrix["complete"], direction=matrix["direction"])
+    return jsonify(matrix)
+
+
+@routes_bp.route('/reachable', methods=['GET'])
+@jwt_required
+@handle_errors
+def reachable():
+    """Route stretches reachable from a point within a fare and transfer budget."""
+    from route_generation.models.route_models import RouteOptions
+    try:
+        origin = (float(request.args["lng"]), float(request.args["lat"]))
+        max_fare = float(request.args["max_fare"])
+        max_transfers = int(request.args.get("max_transfers", 1))
+        walk_radius = float(request.args.get("walk_radius", DEFAULT_WALK_RADIUS))
+    except KeyError as e:
+        return jsonify({"error": f"Missing query parameter: {e.args[0]}"}), 400
+    except (ValueError, TypeError) as e:
+        logging.warning("Invalid reachability parameters: %s", e)
+        return jsonify({"error": "lng, lat, max_fare, max_transfers and walk_radius must be numeric"}), 400
+    if not all(math.isfinite(value) for value in (*origin, max_fare, walk_radius)):
+        return jsonify({"error": "lng, lat, max_fare and walk_radius must be finite"}), 400
+    if max_fare <= 0 or not 0 <= max_transfers <= RouteOptions.MAX_TRANSFERS_LIMIT or walk_radius <= 0:
+        return jsonify({"error": f"max_fare and walk_radius must be positive and max_transfers "
+                                 f"between 0 and {RouteOptions.MAX_TRANSFERS_LIMIT}"}), 400
+
+    request_log = current_request_log()
+    request_log.annotate(origin=origin, max_fare=max_fare, max_transfers=max_transfers)
+    with request_log.stage('reachable'):
+        result = RouteService().reachable(origin, max_fare, max_transfers, walk_radius)
+    if result is None:
+        return jsonify({"error": "Reachability requires a graph snapshot"}), 503
+    return jsonify(result)
+
+
+@routes_bp.route('/tiles/<int:z>/<int:x>/<int:y>', methods=['GET'])
+@handle_errors
+def get_route_tile(z, x, y):
+    """Simplified route geometry clipped to one map tile."""
+    from services.network_service import get_network
+    from services import tile_service
+
+    min_zoom, max_zoom = tile_service.zoom_range()
+    if not min_zoom <= z <= max_zoom or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        return jsonify({"error": f"Tiles are served for zoom {min_zoom}-{max_zoom}"}), 404
+    network = get_network()
+    if network is None:
+        return jsonify({"error": "Route tiles require a graph snapshot"}), 503
+
+    response = current_app.response_class(tile_service.get_tile(network, z, x, y),
+                                          mimetype='application/geo+json')
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config['TILE_MAX_AGE']
+    response.set_etag(f"{network.network_id}-{z}-{x}-{y}")
+    return response.make_conditional(request)
+
+
 @routes_bp.route('/history', methods=['GET'])
 @jwt_required
 @handle_errors
@@ -133,10 +240,21 @@ def get_route(route_id):
         return jsonify({"error": "route_id is required"}), 400
     
     route_service = RouteService()  # Create instance within route context
-    route = route_service.get_cached_route(route_id)
+    packed = request.accept_mimetypes.best_match(
+        ['application/json', 'application/octet-stream']) == 'application/octet-stream'
+    route = route_service.get_cached_route(route_id, packed=packed)
     if not route:
         logging.warning("Route not found")
         return jsonify({"error": "route not found"}), 404
+    if packed:
+        from route_generation.services.graph_snapshot import (
+            POLYLINE_SCHEMA_VERSION, encode_polyline, route_polyline
+        )
+        points = route_polyline(route)
+        response = current_app.response_class(encode_polyline(points), mimetype='application/octet-stream')
+        response.headers['X-Polyline-Schema'] = str(POLYLINE_SCHEMA_VERSION)
+        response.headers['X-Polyline-Vertices'] = str(len(points))
+        return response
     
     logging.info("Fetched route successfully")
     return jsonify(route)
@@ -0,0 +1,27 @@
+from flask import Blueprint, request, jsonify
+import logging
+from services.search_service import SearchService
+from utils.decorators import handle_errors
+
+search_bp = Blueprint('search', __name__, url_prefix='/api/search')
+
+MAX_LIMIT = 50
+
+
+@search_bp.route('', methods=['GET'])
+@handle_errors
+def search():
+    """Autocomplete POI and route names."""
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"error": "q is required"}), 400
+    try:
+        limit = int(request.args.get("limit", 10))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    if not 1 <= limit <= MAX_LIMIT:
+        return jsonify({"error": f"limit must be between 1 and {MAX_LIMIT}"}), 400
+
+    results = SearchService().search(query, limit)
+    logging.debug("Search for %r returned %d results", query, len(results))
+    return jsonify(results)
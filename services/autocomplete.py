@@ -0,0 +1,242 @@
+"""
+In-memory autocomplete index over POI and route names.
+
+Every word-start suffix of a name ("jaro plaza" -> "jaro plaza", "plaza")
+goes into one sorted array, so a prefix lookup is two bisections. Queries
+with too few prefix hits fall back to trigram similarity, which tolerates
+typos. Scores are boosted by how often a place or route appears in
+``user_history``.
+
+The index is built on first use. Once it is ``AUTOCOMPLETE_INDEX_TTL``
+seconds old it is rebuilt on a background thread while queries keep using
+the old one.
+"""
+import bisect
+import logging
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, defaultdict
+
+_lock = threading.Lock()
+_build_lock = threading.Lock()
+_state = {'index': None, 'built_at': 0.0, 'build_seconds': None, 'generation': 0, 'rebuilding': False}
+
+# Base scores by where the query matched
+FULL_PREFIX_SCORE = 2.0
+WORD_PREFIX_SCORE = 1.5
+DESCRIPTION_PREFIX_SCORE = 0.8
+
+# Least trigram similarity (Jaccard) for a fuzzy match
+MIN_SIMILARITY = 0.3
+
+# History endpoints within this distance of a POI count towards its popularity
+POPULARITY_RADIUS_M = 100.0
+
+_non_word = re.compile(r'[^0-9a-z]+')
+
+
+def normalize(text):
+    """Lowercase ASCII words separated by single spaces."""
+    text = unicodedata.normalize('NFKD', str(text)).encode('ascii', 'ignore').decode('ascii')
+    return _non_word.sub(' ', text.lower()).strip()
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class AutocompleteIndex:
+    """Sorted word-start suffixes plus a trigram inverted index over entries.
+
+    Entries are dicts with ``type``, ``name`` and optional ``id`` /
+    ``description``; ``popularity`` maps ``(type, name)`` to a count.
+    """
+
+    def __init__(self, entries, popularity=None, popularity_weight=0.2):
+        self.entries = entries
+        self.popularity_weight = popularity_weight
+        popularity = popularity or {}
+        self._boost = [1.0 + popularity_weight * math.log1p(popularity.get((entry['type'], entry['name']), 0))
+                       for entry in entries]
+
+        keys = []
+        self._trigrams = defaultdict(list)
+        self._trigram_counts = []
+        for position, entry in enumerate(entries):
+            name = normalize(entry['name'])
+            words = name.split(' ')
+            for i in range(len(words)):
+                keys.append((' '.join(words[i:]), position, FULL_PREFIX_SCORE if i == 0 else WORD_PREFIX_SCORE))
+            if entry.get('description'):
+                words = normalize(entry['description']).split(' ')
+                for i in range(len(words)):
+                    keys.append((' '.join(words[i:]), position, DESCRIPTION_PREFIX_SCORE))
+            grams = trigrams(name)
+            self._trigram_counts.append(len(grams))
+            for gram in grams:
+                self._trigrams[gram].append(position)
+        keys.sort()
+        self._keys = [key for key, _, _ in keys]
+        self._postings = [(position, score) for _, position, score in keys]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def search(self, query, limit=10):
+        """Best ``limit`` entries for ``query``, each with its ``score``."""
+        query = normalize(query)
+        if not query:
+            return []
+        scores = {}
+        low = bisect.bisect_left(self._keys, query)
+        high = bisect.bisect_left(self._keys, query + '\x7f', low)
+        for position, score in self._postings[low:high]:
+            if score > scores.get(position, 0.0):
+                scores[position] = score
+
+        if len(scores) < limit and len(query) >= 3:
+            grams = trigrams(query)
+            shared = Counter()
+            for gram in grams:
+                shared.update(self._trigrams.get(gram, ()))
+            for position, count in shared.items():
+                similarity = count / (len(grams) + self._trigram_counts[position] - count)
+                if similarity >= MIN_SIMILARITY and similarity > scores.get(position, 0.0):
+                    scores[position] = similarity
+
+        ranked = sorted(((score * self._boost[position], position) for position, score in scores.items()),
+                        key=lambda item: (-item[0], self.entries[item[1]]['name']))
+        return [dict(self.entries[position], score=round(score, 3)) for score, position in ranked[:limit]]
+
+
+def _entries(db):
+    entries, seen = [], set()
+    for poi in db.iloilo_pois.find({}, {"_id": 0, "name": 1, "category": 1}):
+        name = poi.get('name')
+        if name and ('poi', name) not in seen:
+            seen.add(('poi', name))
+            entries.append({'type': 'poi', 'name': name, 'category': poi.get('category')})
+    for route in db.route_descriptions.find({}, {"_id": 0, "route_id": 1, "route_name": 1, "route_desc": 1}):
+        name = route.get('route_name')
+        if name and ('route', name) not in seen:
+            seen.add(('route', name))
+            entries.append({'type': 'route', 'name': name, 'id': route.get('route_id'),
+                            'description': route.get('route_desc')})
+    return entries
+
+
+def route_popularity(db, history_limit):
+    """How many itineraries rode each route name.
+
+    Only the latest ``history_limit`` history entries are read, and only the
+    first (best ranked) alternative of each, counting a route once per entry
+    however many segments it has there.
+    """
+    pipeline = [
+        {"$sort": {"timestamp": -1}},
+        {"$limit": history_limit},
+        {"$project": {"route": {"$cond": [{"$isArray": "$route"}, {"$arrayElemAt": ["$route", 0]}, "$route"]}}},
+        {"$unwind": "$route.features"},
+        {"$group": {"_id": {"entry": "$_id", "route": "$route.features.properties.route"}}},
+        {"$group": {"_id": "$_id.route", "count": {"$sum": 1}}},
+    ]
+    return {('route', row['_id']): row['count'] for row in db.user_history.aggregate(pipeline)
+            if row['_id'] and row['_id'] != "Transfer"}
+
+
+def poi_popularity(db, poi_lookup, history_limit):
+    """How often a history origin or destination lies next to each POI.
+
+    ``poi_lookup(lng, lat)`` returns the name of the nearest POI within
+    ``POPULARITY_RADIUS_M`` or None. Only the latest ``history_limit``
+    entries are read; identical endpoints are looked up once.
+    """
+    endpoints = Counter()
+    cursor = db.user_history.find({}, {"_id": 0, "origin": 1, "destination": 1}).sort("timestamp", -1)
+    for entry in cursor.limit(history_limit):
+        for point in (entry.get('origin'), entry.get('destination')):
+            if isinstance(point, (list, tuple)) and len(point) >= 2:
+                endpoints[(round(float(point[0]), 5), round(float(point[1]), 5))] += 1
+    counts = Counter()
+    for (lng, lat), count in endpoints.items():
+        name = poi_lookup(lng, lat)
+        if name:
+            counts[('poi', name)] += count
+    return counts
+
+
+def build_index(db, poi_lookup=None, popularity_weight=0.2, history_limit=20000):
+    """Index every POI and route name, boosted by popularity in the latest ``history_limit`` entries."""
+    started = time.perf_counter()
+    popularity = route_popularity(db, history_limit)
+    if poi_lookup is not None:
+        popularity.update(poi_popularity(db, poi_lookup, history_limit))
+    index = AutocompleteIndex(_entries(db), popularity, popularity_weight)
+    logging.info(f"Autocomplete index built with {len(index)} entries in "
+                 f"{(time.perf_counter() - started) * 1000:.0f} ms")
+    return index
+
+
+def _rebuild(build, generation):
+    started = time.monotonic()
+    index = build()
+    with _lock:
+        # An invalidate() during the build makes this index stale already
+        if _state['generation'] == generation:
+            _state['index'] = index
+            _state['built_at'] = time.monotonic()
+            _state['build_seconds'] = round(_state['built_at'] - started, 3)
+    return index
+
+
+def _rebuild_in_background(build, generation):
+    try:
+        _rebuild(build, generation)
+    except Exception as e:
+        logging.error(f"Autocomplete index rebuild failed: {e}")
+    finally:
+        _state['rebuilding'] = False
+
+
+def get_index(build, ttl_seconds):
+    """The worker's autocomplete index; ``build()`` makes a new one when needed.
+
+    The first query builds the index. Once it is ``ttl_seconds`` old, the
+    next query starts a rebuild on a background thread and the old index
+    keeps serving until the new one is ready, so ``build()`` must not
+    depend on the request (or app) context of its caller.
+    """
+    index = _state['index']
+    if index is None:
+        with _build_lock:
+            index = _state['index']
+            if index is None:
+                index = _rebuild(build, _state['generation'])
+    elif ttl_seconds and time.monotonic() - _state['built_at'] > ttl_seconds and not _state['rebuilding']:
+        with _lock:
+            if _state['rebuilding']:
+                return index
+            _state['rebuilding'] = True
+        threading.Thread(target=_rebuild_in_background, args=(build, _state['generation']),
+                         name='autocomplete-index', daemon=True).start()
+    return index
+
+
+def status():
+    """Size, age and build time of the current index, for diagnostics."""
+    index = _state['index']
+    if index is None:
+        return {'built': False}
+    return {'built': True, 'entries': len(index), 'build_seconds': _state['build_seconds'],
+            'age_seconds': round(time.monotonic() - _state['built_at'], 1)}
+
+
+def invalidate():
+    """Drop the index so the next query rebuilds it."""
+    with _lock:
+        _state['index'] = None
+        _state['generation'] += 1
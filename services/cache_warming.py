@@ -0,0 +1,116 @@
+"""
+Route result cache warming from historical demand.
+
+The most requested origin/destination cells in ``user_history`` (coordinates
+snapped to ``ROUTE_COALESCE_PRECISION``, as in the cache key) are routed
+ahead of time into the route result cache, so a fresh worker does not serve
+its first popular requests cold.
+
+Each gunicorn worker runs one background thread, started from
+``post_worker_init``, that warms once the worker is up, again whenever a new graph snapshot is mapped, and every
+``ROUTE_WARM_INTERVAL`` seconds. The thread is reniced where the OS allows
+it, but the GIL makes that a hint at best, so it also pauses between routes
+and waits while any live route search holds an admission slot.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+_lock = threading.Lock()
+_state = {'pid': None, 'event': None}
+
+# Nice value of the warming thread (Linux only)
+WARM_THREAD_NICE = 19
+
+
+def popular_od_pairs(db, top_n, precision, history_limit, default_walk_radius):
+    """``((origin, destination, walk_radius), count)`` for the ``top_n`` busiest cells.
+
+    Only the latest ``history_limit`` history entries are read.
+    """
+    snap = lambda point: (round(float(point[0]), precision), round(float(point[1]), precision))
+    counts = Counter()
+    cursor = db.user_history.find({}, {"_id": 0, "origin": 1, "destination": 1, "walk_radius": 1})
+    for entry in cursor.sort("timestamp", -1).limit(history_limit):
+        origin, destination = entry.get('origin'), entry.get('destination')
+        if not all(isinstance(point, (list, tuple)) and len(point) >= 2 for point in (origin, destination)):
+            continue
+        counts[(snap(origin), snap(destination), float(entry.get('walk_radius') or default_walk_radius))] += 1
+    return counts.most_common(top_n)
+
+
+def warm(app):
+    """Route the most popular history pairs into the route result cache."""
+    from services.route_service import RouteService, DEFAULT_WALK_RADIUS, searches_in_flight
+
+    with app.app_context():
+        config = app.config
+        started = time.perf_counter()
+        pairs = popular_od_pairs(
+            app.extensions['pymongo'].db,
+            config['ROUTE_WARM_TOP_N'],
+            config['ROUTE_COALESCE_PRECISION'],
+            config['ROUTE_WARM_HISTORY_LIMIT'],
+            DEFAULT_WALK_RADIUS,
+        )
+        service = RouteService()
+        warmed = 0
+        for (origin, destination, walk_radius), _ in pairs:
+            # Yield to live traffic
+            time.sleep(config['ROUTE_WARM_PAUSE'])
+            while searches_in_flight():
+                time.sleep(config['ROUTE_WARM_PAUSE'] or 0.05)
+            try:
+                if service.warm_route(origin, destination, walk_radius):
+                    warmed += 1
+            except Exception as e:
+                logging.warning(f"Could not warm route {origin} -> {destination}: {e}")
+        logging.info(f"Route cache warmed with {warmed} of {len(pairs)} popular pairs in "
+                     f"{time.perf_counter() - started:.1f} s")
+        return warmed
+
+
+def _lower_priority():
+    # Linux applies nice values to single threads; elsewhere a thread id
+    # passed to setpriority could name an unrelated process
+    if sys.platform.startswith('linux'):
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), WARM_THREAD_NICE)
+        except OSError:
+            pass
+
+
+def _run(app, event, interval):
+    _lower_priority()
+    while True:
+        try:
+            warm(app)
+        except Exception as e:
+            logging.error(f"Route cache warming failed: {e}")
+        event.wait(interval or None)
+        event.clear()
+
+
+def start(app):
+    """Start this process's warming thread if it is not already running."""
+    if not app.config['ROUTE_WARM']:
+        return
+    with _lock:
+        if _state['pid'] == os.getpid():
+            return
+        event = threading.Event()
+        # A forked worker inherits the parent's state but not its threads
+        _state.update(pid=os.getpid(), event=event)
+    threading.Thread(target=_run, args=(app, event, app.config['ROUTE_WARM_INTERVAL']),
+                     name='route-cache-warmer', daemon=True).start()
+
+
+def request_warm():
+    """Ask this process's warming thread for another pass, e.g. after a reload."""
+    event = _state['event']
+    if event is not None and _state['pid'] == os.getpid():
+        event.set()
+
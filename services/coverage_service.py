@@ -0,0 +1,65 @@
+"""
+Walk-access coverage grid: built from the graph snapshot by
+``flask build-coverage`` and memory-mapped for ``/api/coverage``.
+"""
+import logging
+import os
+import threading
+from flask import current_app, has_app_context
+from config import Config
+
+_lock = threading.Lock()
+_state = {'key': None, 'grid': None}
+
+
+def _setting(name):
+    """Config value, with or without an app context."""
+    if has_app_context():
+        return current_app.config[name]
+    return getattr(Config, name)
+
+
+def get_coverage(path=None):
+    """The memory-mapped coverage grid, or None if it has not been built.
+
+    Re-mapped when the file changes, like the graph snapshot.
+    """
+    path = path or _setting('COVERAGE_PATH')
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    key = (path, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    if _state['key'] == key:
+        return _state['grid']
+
+    with _lock:
+        if _state['key'] != key:
+            from route_generation.services.coverage import load_coverage, CoverageError
+            try:
+                _state['grid'] = load_coverage(path)
+            except CoverageError as e:
+                logging.error(f"Failed to load coverage grid: {e}")
+            _state['key'] = key
+    return _state['grid']
+
+
+def build_coverage(path=None, cell_deg=None, max_distance_m=None):
+    """Compute the coverage grid of the current snapshot and write it to ``path``.
+
+    Raises ``RuntimeError`` without a snapshot and ``ValueError`` for an
+    invalid cell size or distance.
+    """
+    from route_generation.services.coverage import compute_coverage, write_coverage
+    from services.network_service import get_network
+
+    network = get_network()
+    if network is None:
+        raise RuntimeError("Coverage requires a graph snapshot; run build-graph-snapshot first")
+    if cell_deg is None:
+        cell_deg = _setting('COVERAGE_CELL_DEG')
+    if max_distance_m is None:
+        max_distance_m = _setting('COVERAGE_MAX_DISTANCE_M')
+    grid = compute_coverage(network, cell_deg, max_distance_m)
+    write_coverage(grid, path or _setting('COVERAGE_PATH'))
+    return grid
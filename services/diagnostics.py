@@ -0,0 +1,201 @@
+"""
+Diagnostics served from memory.
+
+The database checks behind ``/db-test`` and ``/debug-routes`` (``ping``,
+``dbStats``, collection names and counts, a sample of ``jeepney_routes``)
+run on a background thread every ``DIAGNOSTICS_REFRESH_SECONDS`` and
+requests read the last result, so an uptime checker polling them puts no
+load on MongoDB. Engine, index and cache figures are already in memory and
+are read on each request.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+_lock = threading.Lock()
+_start_lock = threading.Lock()
+_state = {'pid': None, 'database': None, 'routes': None, 'refreshed_at': None, 'refreshed': 0.0}
+
+# Fields probed for coordinates in the sampled route documents
+SAMPLE_COORDINATE_FIELDS = ('coordinates', 'coords', 'geometry', 'route', 'path', 'points', 'features')
+SAMPLE_DOCUMENTS = 3
+
+
+def _error(e):
+    return {"status": "error", "database": "disconnected", "error": str(e), "error_type": type(e).__name__}
+
+
+def database_report(mongo):
+    """Connection check, database stats and collection counts."""
+    db = mongo.db
+    started = time.perf_counter()
+    ping = db.command("ping")
+    ping_ms = (time.perf_counter() - started) * 1000
+    stats = db.command("dbStats")
+    collections = db.list_collection_names()
+    return {
+        "status": "success",
+        "database": "connected",
+        "ping": ping,
+        "ping_ms": round(ping_ms, 2),
+        "database_name": stats.get("db", "unknown"),
+        "data_size_bytes": stats.get("dataSize"),
+        "storage_size_bytes": stats.get("storageSize"),
+        "collections": collections,
+        "collections_count": len(collections),
+        # From collection metadata, without scanning
+        "users_count": db.users.estimated_document_count(),
+        "connection_string_host": mongo.cx.address if hasattr(mongo.cx, 'address') else "Atlas Cluster",
+    }
+
+
+def _describe_sample(index, sample):
+    from route_generation.services.graph_snapshot import POLYLINE_FIELD, POLYLINE_SCHEMA_FIELD, decode_polyline
+
+    described = {"document_index": index, "keys": list(sample.keys()), "sample_data": {}}
+    points = decode_polyline(sample)
+    if points is not None:
+        described["sample_data"][POLYLINE_FIELD] = {
+            "type": "binary",
+            "schema": sample[POLYLINE_SCHEMA_FIELD],
+            "length": len(points),
+            "sample": str(points[:3].tolist()),
+        }
+    for field in SAMPLE_COORDINATE_FIELDS:
+        if field in sample:
+            value = sample[field]
+            text = str(value)
+            described["sample_data"][field] = {
+                "type": type(value).__name__,
+                "length": len(value) if hasattr(value, '__len__') else "N/A",
+                "sample": text[:200] + "..." if len(text) > 200 else text,
+            }
+    for key in ('name', 'uid', 'id', 'route_name'):
+        if key in sample:
+            described["sample_data"][key] = str(sample[key])
+    return described
+
+
+def routes_report(mongo):
+    """Size of ``jeepney_routes`` and the structure of a few of its documents."""
+    from route_generation.services.graph_snapshot import POLYLINE_SCHEMA_FIELD, POLYLINE_SCHEMA_VERSION
+
+    collection = mongo.db.jeepney_routes
+    samples = list(collection.find({}, {"_id": 0}).limit(SAMPLE_DOCUMENTS))
+    return {
+        "total_routes": collection.estimated_document_count(),
+        "packed_polylines": collection.count_documents({POLYLINE_SCHEMA_FIELD: POLYLINE_SCHEMA_VERSION}),
+        "sample_count": len(samples),
+        "document_structures": [_describe_sample(i, sample) for i, sample in enumerate(samples)],
+    }
+
+
+def refresh(app):
+    """Re-run the database checks and keep the results."""
+    with app.app_context():
+        mongo = app.extensions['pymongo']
+        reports = {}
+        for name, build in (('database', database_report), ('routes', routes_report)):
+            try:
+                reports[name] = build(mongo)
+            except Exception as e:
+                logging.error(f"Diagnostics refresh of {name} failed: {e}")
+                reports[name] = _error(e)
+    with _lock:
+        _state.update(reports, refreshed_at=datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                      refreshed=time.monotonic())
+
+
+def _run(app, interval):
+    while True:
+        time.sleep(interval)
+        refresh(app)
+
+
+def _cached(app, name):
+    """Section ``name`` of the last refresh; the first call in a process refreshes."""
+    if _state['pid'] != os.getpid():
+        with _start_lock:
+            # A forked worker inherits the parent's results but not its thread
+            if _state['pid'] != os.getpid():
+                refresh(app)
+                _state['pid'] = os.getpid()
+                threading.Thread(target=_run, args=(app, app.config['DIAGNOSTICS_REFRESH_SECONDS']),
+                                 name='diagnostics', daemon=True).start()
+    return dict(_state[name], refreshed_at=_state['refreshed_at'],
+                age_seconds=round(time.monotonic() - _state['refreshed'], 1))
+
+
+def database(app):
+    """Cached ``/db-test`` result."""
+    return _cached(app, 'database')
+
+
+def routes(app):
+    """Cached ``/debug-routes`` result."""
+    return _cached(app, 'routes')
+
+
+def engine_report():
+    """Graph size, memory footprint, build and load times of the route engine."""
+    from services.network_service import get_network, load_seconds
+
+    network = get_network()
+    if network is None:
+        return {"engine": "networkx", "snapshot": None}
+    from route_generation.services.graph_snapshot import FORMAT_VERSION
+
+    metadata = network.metadata
+    footprint = network.memory_footprint()
+    return {
+        "engine": "csr",
+        "snapshot_format_version": FORMAT_VERSION,
+        "network_id": network.network_id,
+        "built_at": metadata.get('built_at'),
+        "build_seconds": metadata.get('build_seconds'),
+        "load_seconds": load_seconds(),
+        "routes": network.route_count,
+        "nodes": network.node_count,
+        "edges": network.edge_count,
+        "transfers": metadata.get('transfer_count', 0),
+        "landmarks": metadata.get('landmark_count', 0),
+        "memory_bytes": footprint,
+        "memory_total_bytes": sum(footprint.values()),
+    }
+
+
+def _coverage_status():
+    from services.coverage_service import get_coverage
+
+    grid = get_coverage()
+    if grid is None:
+        return {'built': False}
+    return {'built': True, 'shape': list(grid.shape), 'cell_deg': grid.cell_deg,
+            'network_id': grid.metadata.get('network_id'), 'built_at': grid.metadata.get('built_at')}
+
+
+def report(app):
+    """Everything: cached database checks plus live engine, index and cache figures."""
+    from services import autocomplete, poi_index, tile_service
+    from services.network_service import get_network
+    from services.route_service import cache_stats
+    from utils import metrics
+
+    network = get_network()
+    snapshot = metrics.snapshot()
+    return {
+        "pid": snapshot['pid'],
+        "uptime_seconds": snapshot['uptime_seconds'],
+        "database": database(app),
+        "routes": routes(app),
+        "engine": engine_report(),
+        "indexes": {
+            "poi_nearby": poi_index.status(),
+            "autocomplete": autocomplete.status(),
+            "tiles": tile_service.status(network) if network is not None else None,
+            "coverage": _coverage_status(),
+        },
+        "caches": dict(cache_stats(), rates=snapshot['rates']),
+    }
@@ -0,0 +1,180 @@
+import logging
+import os
+import threading
+import time
+from flask import current_app, has_app_context
+from config import Config
+
+_lock = threading.Lock()
+_state = {'key': None, 'network': None, 'engine': None, 'load_seconds': None}
+
+
+def _setting(name):
+    """Config value, with or without an app context."""
+    if has_app_context():
+        return current_app.config[name]
+    return getattr(Config, name)
+
+
+def snapshot_path():
+    """Configured graph snapshot path, with or without an app context."""
+    return _setting('GRAPH_SNAPSHOT_PATH')
+
+
+def get_network(path=None):
+    """Return the memory-mapped route network, or None if no snapshot exists.
+
+    The file is re-mapped when its inode or mtime changes, so publishing a new
+    snapshot with an atomic rename swaps the graph without restarting workers.
+    Requests already holding the previous network keep using its mapping.
+    """
+    path = path or snapshot_path()
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    key = (path, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    if _state['key'] == key:
+        return _state['network']
+
+    with _lock:
+        if _state['key'] != key:
+            from route_generation.services.graph_snapshot import load_snapshot, SnapshotError
+            started = time.perf_counter()
+            try:
+                network = load_snapshot(path)
+            except SnapshotError as e:
+                # Remember the bad file so it is not retried on every request
+                logging.error(f"Failed to load graph snapshot: {e}")
+                _state['key'] = key
+                return _state['network']
+            reloaded = _state['network'] is not None
+            _state['network'] = network
+            _state['engine'] = None
+            _state['key'] = key
+            _state['load_seconds'] = round(time.perf_counter() - started, 4)
+            logging.info(
+                f"Graph snapshot {network.network_id} mapped: {network.route_count} routes, "
+                f"{network.node_count} nodes, {network.edge_count} edges"
+            )
+            if reloaded:
+                # Only workers reload (the gunicorn master maps the snapshot once,
+                # before forking), so background threads are safe to start here
+                from services.tile_service import pregenerate
+                pregenerate(network)
+                # Cached routes are keyed on the old network; warm the new one
+                from services.cache_warming import request_warm
+                request_warm()
+    return _state['network']
+
+
+def load_seconds():
+    """Seconds the current snapshot took to map in this process, or None."""
+    return _state['load_seconds']
+
+
+def get_engine(path=None):
+    """Return a ``RoutingEngine`` over the current snapshot, or None."""
+    network = get_network(path)
+    if network is None:
+        return None
+    engine = _state['engine']
+    if engine is None or engine.network is not network:
+        from route_generation.services.routing_engine import RoutingEngine
+        engine = _state['engine'] = RoutingEngine(
+            network,
+            max_expansions=_setting('SEARCH_MAX_EXPANSIONS') or None,
+            deadline_seconds=_setting('SEARCH_DEADLINE_SECONDS') or None,
+        )
+    return engine
+
+
+def build_snapshot(path=None, cell_size_deg=None, transfer_walk_meters=None, landmark_count=None):
+    """Compile ``jeepney_routes`` into a snapshot file and return the network."""
+    from route_generation.services.graph_snapshot import (
+        compile_network, write_snapshot, DEFAULT_CELL_SIZE_DEG
+    )
+    from route_generation.services.transfer_index import attach_transfers, compute_transfers
+    from route_generation.services.landmarks import attach_landmarks, compute_landmarks
+    from route_generation.services.routing_engine import DEFAULT_TRANSFER_PENALTY_KM
+
+    path = path or snapshot_path()
+    transfer_walk_meters = transfer_walk_meters or current_app.config['TRANSFER_MAX_WALK_METERS']
+    if landmark_count is None:
+        landmark_count = current_app.config['GRAPH_LANDMARK_COUNT']
+    mongo = current_app.extensions['pymongo']
+    documents = mongo.db.jeepney_routes.find({}, {"_id": 0})
+    timings = {}
+    started = time.perf_counter()
+    network = compile_network(documents, cell_size_deg or DEFAULT_CELL_SIZE_DEG)
+    timings['compile'] = time.perf_counter() - started
+    started = time.perf_counter()
+    transfers = compute_transfers(network, transfer_walk_meters)
+    network = attach_transfers(network, transfers, transfer_walk_meters)
+    timings['transfers'] = time.perf_counter() - started
+    if landmark_count > 0:
+        started = time.perf_counter()
+        landmarks = compute_landmarks(network, landmark_count, DEFAULT_TRANSFER_PENALTY_KM)
+        network = attach_landmarks(network, landmarks, DEFAULT_TRANSFER_PENALTY_KM)
+        timings['landmarks'] = time.perf_counter() - started
+    # Stored in the snapshot header for /diagnostics
+    network.metadata['build_seconds'] = {stage: round(seconds, 3) for stage, seconds in timings.items()}
+    write_snapshot(network, path)
+    return network
+
+
+def migrate_polylines(batch_size=500, drop_legacy=False):
+    """Store every ``jeepney_routes`` polyline in the packed binary field.
+
+    Documents already at ``POLYLINE_SCHEMA_VERSION`` are skipped. Legacy
+    coordinate fields are kept, so code that predates the packed field keeps
+    working, unless ``drop_legacy`` is set; then they are removed, including
+    from documents migrated by an earlier run. Returns a report of counts.
+    """
+    from pymongo import UpdateOne
+    from route_generation.services.graph_snapshot import (
+        COORDINATE_FIELDS, POLYLINE_FIELD, POLYLINE_SCHEMA_FIELD, POLYLINE_SCHEMA_VERSION,
+        decode_polyline, encode_polyline, extract_route_coordinates
+    )
+
+    collection = current_app.extensions['pymongo'].db.jeepney_routes
+    query = {POLYLINE_SCHEMA_FIELD: {"$ne": POLYLINE_SCHEMA_VERSION}}
+    if drop_legacy:
+        query = {"$or": [query] + [{name: {"$exists": True}} for name in COORDINATE_FIELDS]}
+    report = {'scanned': 0, 'migrated': 0, 'legacy_dropped': 0, 'skipped': 0}
+
+    def flush(operations):
+        if operations:
+            collection.bulk_write(operations, ordered=False)
+
+    operations = []
+    for document in collection.find(query):
+        report['scanned'] += 1
+        update = {}
+        if decode_polyline(document) is None:
+            coordinates = extract_route_coordinates(document)
+            if len(coordinates) < 2:
+                logging.warning(f"Not migrating route without usable coordinates: {document.get('name')}")
+                report['skipped'] += 1
+                continue
+            update["$set"] = {POLYLINE_FIELD: encode_polyline(coordinates),
+                              POLYLINE_SCHEMA_FIELD: POLYLINE_SCHEMA_VERSION}
+            report['migrated'] += 1
+        if drop_legacy:
+            legacy = [name for name in COORDINATE_FIELDS
+                      if name in document and extract_route_coordinates({name: document[name]})]
+            if legacy:
+                update["$unset"] = {name: "" for name in legacy}
+                report['legacy_dropped'] += 1
+        if update:
+            operations.append(UpdateOne({"_id": document["_id"]}, update))
+        if len(operations) >= batch_size:
+            flush(operations)
+            operations = []
+    flush(operations)
+
+    logging.info(
+        f"Polyline migration: {report['scanned']} scanned, {report['migrated']} packed, "
+        f"{report['legacy_dropped']} legacy fields dropped, {report['skipped']} skipped"
+    )
+    return report
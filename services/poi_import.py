@@ -0,0 +1,141 @@
+"""
+Bulk POI import from NDJSON or GeoJSON.
+
+Records are read one at a time, converted to POI documents and written in
+chunks of unordered ``bulk_write`` upserts keyed on ``poi_id``, so a city GIS
+export of thousands of POIs takes a handful of round trips. Records that
+cannot be converted, or that the server rejects, are reported individually
+without stopping the import.
+"""
+import itertools
+import json
+import logging
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from services.poi_index import poi_coordinates
+
+DEFAULT_CHUNK_SIZE = 1000
+
+# Failures listed in a report; the rest are only counted
+MAX_REPORTED_FAILURES = 1000
+
+
+def iter_records(lines):
+    """Yield ``(item, record)`` from NDJSON, a JSON array or a FeatureCollection.
+
+    ``lines`` is any iterable of text lines (an open file, a request stream).
+    ``item`` numbers records from 1. The format is chosen from the opening of
+    the body: ``[`` or a lone ``{`` on the first line starts one JSON
+    document, read whole; anything else is NDJSON, streamed line by line,
+    where a line that is not valid JSON yields a ``ValueError`` in place of
+    the record. A one-line FeatureCollection is expanded into its features.
+    """
+    lines = iter(lines)
+    first = ''
+    for first in lines:
+        if first.strip():
+            break
+    opening = first.strip()
+    if not opening:
+        return
+    if opening.startswith('[') or opening == '{':
+        # A pretty-printed document; ValueError here means the whole body is unreadable
+        value = json.loads(first + ''.join(lines))
+        if isinstance(value, dict) and value.get('type') == 'FeatureCollection':
+            value = value.get('features') or []
+        if not isinstance(value, list):
+            value = [value]
+        yield from enumerate(value, start=1)
+        return
+
+    records = (line for line in itertools.chain([first], lines) if line.strip())
+    for item, line in enumerate(records, start=1):
+        try:
+            value = json.loads(line)
+        except ValueError as e:
+            yield item, ValueError(f"Invalid JSON: {e}")
+            continue
+        if item == 1 and isinstance(value, dict) and value.get('type') == 'FeatureCollection':
+            yield from enumerate(value.get('features') or [], start=1)
+            return
+        yield item, value
+
+
+def to_document(record):
+    """POI document for one NDJSON object or GeoJSON Feature.
+
+    Features are flattened to their properties plus ``coordinates``. The
+    stable id is taken from ``poi_id``, ``id`` or the Feature's ``id``.
+    Raises ``ValueError`` for records without an id or a location.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("Record must be a JSON object")
+    if record.get('type') == 'Feature':
+        geometry = record.get('geometry') or {}
+        if geometry.get('type') != 'Point':
+            raise ValueError("Feature geometry must be a Point")
+        document = dict(record.get('properties') or {}, coordinates=geometry.get('coordinates'))
+        poi_id = document.get('poi_id', document.get('id', record.get('id')))
+    else:
+        document = dict(record)
+        poi_id = document.get('poi_id', document.get('id'))
+    document.pop('_id', None)
+    document.pop('id', None)
+
+    if poi_id is None or poi_id == '':
+        raise ValueError("Missing POI id (poi_id or id)")
+    if poi_coordinates(document) is None:
+        raise ValueError("Missing or invalid coordinates")
+    document['poi_id'] = str(poi_id)
+    return document
+
+
+def import_pois(collection, lines, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Upsert every record from ``lines`` into ``collection``; returns a report."""
+    # Sparse, so POIs added before ids were assigned do not collide on null
+    collection.create_index('poi_id', unique=True, sparse=True)
+    report = {'received': 0, 'upserted': 0, 'modified': 0, 'matched': 0, 'failed': 0, 'failures': []}
+
+    def fail(item, error):
+        report['failed'] += 1
+        if len(report['failures']) < MAX_REPORTED_FAILURES:
+            report['failures'].append({'item': item, 'error': str(error)})
+
+    def flush(chunk):
+        if not chunk:
+            return
+        operations = [UpdateOne({'poi_id': document['poi_id']}, {'$set': document}, upsert=True)
+                      for _, document in chunk]
+        try:
+            result = collection.bulk_write(operations, ordered=False).bulk_api_result
+        except BulkWriteError as e:
+            result = e.details
+            for error in result.get('writeErrors', []):
+                fail(chunk[error['index']][0], error.get('errmsg', 'Write failed'))
+        report['upserted'] += result.get('nUpserted', 0)
+        report['modified'] += result.get('nModified', 0)
+        report['matched'] += result.get('nMatched', 0)
+
+    chunk = []
+    for item, record in iter_records(lines):
+        report['received'] += 1
+        if isinstance(record, Exception):
+            fail(item, record)
+            continue
+        try:
+            chunk.append((item, to_document(record)))
+        except ValueError as e:
+            fail(item, e)
+            continue
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = []
+    flush(chunk)
+
+    logging.info(
+        f"POI import: {report['received']} received, {report['upserted']} inserted, "
+        f"{report['modified']} updated, {report['failed']} failed"
+    )
+    return report
@@ -0,0 +1,201 @@
+"""
+In-memory grid index over ``iloilo_pois`` for nearby queries.
+
+The index is built from the collection on first use and kept current by
+``POIService``'s writes in this worker. Writes made through other workers
+are picked up by a full rebuild once the index is ``POI_INDEX_TTL`` seconds
+old; that rebuild runs on a background thread while the old index keeps
+serving.
+"""
+import logging
+import math
+import threading
+import time
+
+from route_generation.utils.array_geometry import haversine_km, meters_to_degrees
+
+_lock = threading.Lock()
+_build_lock = threading.Lock()
+_state = {'index': None, 'built_at': 0.0, 'build_seconds': None, 'generation': 0, 'rebuilding': False}
+
+
+def _point(lng, lat):
+    """``(lng, lat)`` as floats, or None unless both are finite and in range."""
+    lng, lat = float(lng), float(lat)
+    if math.isfinite(lng) and math.isfinite(lat) and -180.0 <= lng <= 180.0 and -90.0 <= lat <= 90.0:
+        return lng, lat
+    return None
+
+
+def poi_coordinates(document):
+    """``(lng, lat)`` of a POI document, or None if it has no usable location.
+
+    Accepts a ``[lng, lat]`` ``coordinates`` field, a GeoJSON ``geometry`` /
+    ``location`` point, or separate ``lng``/``lat`` (``longitude``/``latitude``)
+    fields. Non-finite or out-of-range values are not a usable location.
+    """
+    for name in ('coordinates', 'geometry', 'location'):
+        value = document.get(name)
+        if isinstance(value, dict):
+            value = value.get('coordinates')
+        if isinstance(value, (list, tuple)) and len(value) >= 2:
+            try:
+                point = _point(value[0], value[1])
+            except (TypeError, ValueError, OverflowError):
+                continue
+            if point is not None:
+                return point
+    for lng_name, lat_name in (('lng', 'lat'), ('longitude', 'latitude')):
+        if lng_name in document and lat_name in document:
+            try:
+                point = _point(document[lng_name], document[lat_name])
+            except (TypeError, ValueError, OverflowError):
+                continue
+            if point is not None:
+                return point
+    return None
+
+
+class POIIndex:
+    """POIs bucketed into square grid cells of ``cell_deg`` degrees, keyed by ``_id``."""
+
+    def __init__(self, cell_deg):
+        self.cell_deg = cell_deg
+        self._cells = {}
+        self._pois = {}  # key -> (lng, lat, document without _id)
+        self._lock = threading.Lock()
+
+    def _cell(self, lng, lat):
+        return math.floor(lng / self.cell_deg), math.floor(lat / self.cell_deg)
+
+    def add(self, key, document):
+        """Insert or replace one POI; returns False if it has no location."""
+        key = str(key)
+        coordinates = poi_coordinates(document)
+        with self._lock:
+            self._discard(key)
+            if coordinates is None:
+                return False
+            lng, lat = coordinates
+            self._pois[key] = (lng, lat, {k: v for k, v in document.items() if k != '_id'})
+            self._cells.setdefault(self._cell(lng, lat), set()).add(key)
+        return True
+
+    def remove(self, key):
+        with self._lock:
+            self._discard(str(key))
+
+    def _discard(self, key):
+        entry = self._pois.pop(key, None)
+        if entry is not None:
+            cell = self._cell(entry[0], entry[1])
+            members = self._cells.get(cell)
+            if members is not None:
+                members.discard(key)
+                if not members:
+                    del self._cells[cell]
+
+    def nearby(self, lng, lat, radius_m, limit):
+        """Up to ``limit`` ``(distance_m, document)`` pairs within ``radius_m``, nearest first."""
+        span = float(meters_to_degrees(radius_m, lat))
+        (x0, y0), (x1, y1) = self._cell(lng - span, lat - span), self._cell(lng + span, lat + span)
+        with self._lock:
+            candidates = [self._pois[key]
+                          for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)
+                          for key in self._cells.get((x, y), ())]
+        found = []
+        for poi_lng, poi_lat, document in candidates:
+            distance_m = float(haversine_km(lng, lat, poi_lng, poi_lat)) * 1000.0
+            if distance_m <= radius_m:
+                found.append((distance_m, document))
+        found.sort(key=lambda item: item[0])
+        return found[:limit]
+
+    def __len__(self):
+        return len(self._pois)
+
+
+def build_index(collection, cell_deg):
+    """Index every POI in ``collection``."""
+    index = POIIndex(cell_deg)
+    skipped = 0
+    for document in collection.find({}):
+        if not index.add(document['_id'], document):
+            skipped += 1
+    if skipped:
+        logging.warning(f"POI index: skipped {skipped} POIs without usable coordinates")
+    logging.info(f"POI index built with {len(index)} POIs")
+    return index
+
+
+def _rebuild(collection, cell_deg, generation):
+    started = time.monotonic()
+    index = build_index(collection, cell_deg)
+    with _lock:
+        # A write or invalidate() during the build may be missing from it
+        if _state['generation'] == generation:
+            _state['index'] = index
+            _state['built_at'] = time.monotonic()
+            _state['build_seconds'] = round(_state['built_at'] - started, 3)
+    return index
+
+
+def _rebuild_in_background(collection, cell_deg, generation):
+    try:
+        _rebuild(collection, cell_deg, generation)
+    except Exception as e:
+        logging.error(f"POI index rebuild failed: {e}")
+    finally:
+        _state['rebuilding'] = False
+
+
+def get_index(collection, cell_deg, ttl_seconds):
+    """The worker's POI index, built or rebuilt from ``collection`` as needed.
+
+    The first query builds the index. Once it is ``ttl_seconds`` old, the
+    next query starts a rebuild on a background thread and the old index
+    keeps serving until the new one is ready.
+    """
+    index = _state['index']
+    if index is None:
+        with _build_lock:
+            index = _state['index']
+            if index is None:
+                index = _rebuild(collection, cell_deg, _state['generation'])
+    elif ttl_seconds and time.monotonic() - _state['built_at'] > ttl_seconds and not _state['rebuilding']:
+        with _lock:
+            if _state['rebuilding']:
+                return index
+            _state['rebuilding'] = True
+        threading.Thread(target=_rebuild_in_background, args=(collection, cell_deg, _state['generation']),
+                         name='poi-index', daemon=True).start()
+    return index
+
+
+def update(apply):
+    """Call ``apply(index)`` on the index if it has been built.
+
+    A rebuild in progress may have read the collection before the write
+    being applied, so it is dropped and the next stale query starts another.
+    """
+    with _lock:
+        index = _state['index']
+        if index is not None:
+            apply(index)
+        _state['generation'] += 1
+
+
+def status():
+    """Size, age and build time of the current index, for diagnostics."""
+    index = _state['index']
+    if index is None:
+        return {'built': False}
+    return {'built': True, 'entries': len(index), 'build_seconds': _state['build_seconds'],
+            'age_seconds': round(time.monotonic() - _state['built_at'], 1)}
+
+
+def invalidate():
+    """Drop the index so the next query rebuilds it."""
+    with _lock:
+        _state['index'] = None
+        _state['generation'] += 1
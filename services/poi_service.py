@@ -1,5 +1,6 @@
 import logging
 from flask import current_app
+from services import autocomplete, poi_index
 
 
 class POIService:
@@ -14,11 +15,23 @@ class POIService:
         pois = mongo.db.iloilo_pois.find({}, {"_id": 0})
         return list(pois)
     
+    def get_nearby_pois(self, lng, lat, radius_m, limit):
+        """Nearest POIs within ``radius_m`` metres, each with its ``distance_m``."""
+        mongo = current_app.extensions['pymongo']
+        index = poi_index.get_index(
+            mongo.db.iloilo_pois,
+            current_app.config['POI_INDEX_CELL_DEG'],
+            current_app.config['POI_INDEX_TTL'],
+        )
+        return [dict(document, distance_m=round(distance_m, 1))
+                for distance_m, document in index.nearby(lng, lat, radius_m, limit)]
+    
     def add_poi(self, poi_data):
         """Add a new Point of Interest."""
         mongo = current_app.extensions['pymongo']
         result = mongo.db.iloilo_pois.insert_one(poi_data)
         logging.info(f"POI added with ID: {result.inserted_id}")
+        poi_index.update(lambda index: index.add(result.inserted_id, poi_data))
         return result.inserted_id
     
     def update_poi(self, poi_id, update_data):
@@ -29,6 +42,10 @@ class POIService:
             {"$set": update_data}
         )
         logging.info(f"POI updated: {result.modified_count} documents modified")
+        if result.modified_count:
+            document = mongo.db.iloilo_pois.find_one({"_id": poi_id})
+            if document is not None:
+                poi_index.update(lambda index: index.add(poi_id, document))
         return result.modified_count
     
     def delete_poi(self, poi_id):
@@ -36,4 +53,20 @@ class POIService:
         mongo = current_app.extensions['pymongo']
         result = mongo.db.iloilo_pois.delete_one({"_id": poi_id})
         logging.info(f"POI deleted: {result.deleted_count} documents deleted")
+        if result.deleted_count:
+            poi_index.update(lambda index: index.remove(poi_id))
         return result.deleted_count
+    
+    def bulk_import(self, lines, chunk_size=None):
+        """Upsert POIs from NDJSON or GeoJSON ``lines`` keyed on ``poi_id``.
+
+        Returns the import report. The nearby and autocomplete indexes are
+        refreshed once at the end rather than per POI.
+        """
+        from services.poi_import import import_pois, DEFAULT_CHUNK_SIZE
+        mongo = current_app.extensions['pymongo']
+        report = import_pois(mongo.db.iloilo_pois, lines, chunk_size or DEFAULT_CHUNK_SIZE)
+        if report['upserted'] or report['modified']:
+            poi_index.invalidate()
+            autocomplete.invalidate()
+        return report
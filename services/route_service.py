@@ -1,12 +1,147 @@
 import logging
+import math
+import threading
+from dataclasses import astuple
 from datetime import datetime
 import pytz
-from flask import current_app
+from flask import current_app, has_app_context
 from config import Config
-from route_gen_clean import route_generator
+from services.network_service import get_engine
+from utils import metrics
+from utils.admission import AdmissionGate, AdmissionRejected
+from utils.single_flight import SingleFlight, FileSingleFlight
+from utils.ttl_cache import TTLCache
 
 tz = pytz.timezone(Config.TIMEZONE)
 
+# Walk radius (metres) of a route request that does not give one
+DEFAULT_WALK_RADIUS = 100.0
+
+_flight_lock = threading.Lock()
+_flights = {}
+_reachable_cache = None
+_route_cache = None
+_gate = None
+
+
+def _setting(name):
+    """Config value, with or without an app context."""
+    if has_app_context():
+        return current_app.config[name]
+    return getattr(Config, name)
+
+
+def _single_flight():
+    """Shared coalescer for route requests, or None when disabled."""
+    if not _setting('ROUTE_COALESCE'):
+        return None
+    directory = _setting('ROUTE_COALESCE_DIR') or None
+    timeout = _setting('ROUTE_COALESCE_TIMEOUT') or None
+    flight = _flights.get(directory)
+    if flight is None:
+        with _flight_lock:
+            flight = _flights.get(directory)
+            if flight is None:
+                flight = FileSingleFlight(directory, timeout) if directory else SingleFlight(timeout)
+                _flights[directory] = flight
+    return flight
+
+
+def _reachability_cache():
+    """Per-worker cache of reachability results, created on first use."""
+    global _reachable_cache
+    if _reachable_cache is None:
+        with _flight_lock:
+            if _reachable_cache is None:
+                _reachable_cache = TTLCache(_setting('REACHABLE_CACHE_SIZE'), _setting('REACHABLE_CACHE_TTL'))
+    return _reachable_cache
+
+
+def _route_result_cache():
+    """Per-worker cache of completed route results, or None when disabled."""
+    global _route_cache
+    if not _setting('ROUTE_CACHE_SIZE'):
+        return None
+    if _route_cache is None:
+        with _flight_lock:
+            if _route_cache is None:
+                _route_cache = TTLCache(_setting('ROUTE_CACHE_SIZE'), _setting('ROUTE_CACHE_TTL'))
+    return _route_cache
+
+
+def _admission_gate():
+    """Shared admission gate for route searches, or None when disabled."""
+    global _gate
+    if not _setting('ROUTE_ADMISSION'):
+        return None
+    if _gate is None:
+        with _flight_lock:
+            if _gate is None:
+                host_limit = _setting('ROUTE_ADMISSION_HOST_LIMIT')
+                _gate = AdmissionGate(
+                    _setting('ROUTE_ADMISSION_WORKER_LIMIT'),
+                    _setting('ROUTE_ADMISSION_QUEUE'),
+                    _setting('ROUTE_ADMISSION_MAX_WAIT'),
+                    directory=_setting('ROUTE_ADMISSION_DIR') if host_limit > 0 else None,
+                    host_limit=host_limit,
+                )
+    return _gate
+
+
+def _admitted(fn):
+    """Run ``fn`` once the admission gate lets it; raises ``AdmissionRejected``."""
+    gate = _admission_gate()
+    if gate is None:
+        return fn()
+    try:
+        with gate.admit():
+            return fn()
+    except AdmissionRejected as e:
+        metrics.increment('route_admission_rejected')
+        metrics.increment(f'route_admission_rejected_{e.reason}')
+        raise
+
+
+def searches_in_flight():
+    """Route searches holding an admission slot in this worker (0 if ungated)."""
+    gate = _gate if _setting('ROUTE_ADMISSION') else None
+    return gate.stats()['active'] if gate is not None else 0
+
+
+def cache_stats():
+    """Entries in this worker's result caches and admission gate state."""
+    return {
+        'route_cache_entries': len(_route_cache) if _route_cache is not None else 0,
+        'reachable_cache_entries': len(_reachable_cache) if _reachable_cache is not None else 0,
+        'admission': _gate.stats() if _gate is not None else None,
+    }
+
+
+def _cache_key(engine, key):
+    return (engine.network.network_id if engine is not None else None,) + key
+
+
+def coalesce_key(origin, destination, walk_radius, options=None):
+    """Key under which identical route requests are coalesced.
+
+    Coordinates are snapped to ``ROUTE_COALESCE_PRECISION`` decimal places so
+    that retries and double-taps from the same spot share one search.
+    """
+    digits = _setting('ROUTE_COALESCE_PRECISION')
+    snap = lambda point: tuple(round(float(value), digits) for value in point)
+    return (snap(origin), snap(destination), float(walk_radius),
+            astuple(options) if options is not None else None)
+
+
+def load_routing_engine():
+    """Import the routing engine, which loads the route network.
+
+    Deferred until the first route request (or an explicit warm-up) so that
+    shapely, networkx and the graph build stay off application startup.
+    """
+    from route_gen_clean import route_generator
+    return route_generator
+
 
 class RouteService:
     """Service class for handling route-related operations."""
@@ -18,11 +153,153 @@ class RouteService:
         else:
             self.mongo = None
     
-    def generate_route(self, origin, destination, walk_radius):
-        """Generate a route between origin and destination."""
-        return route_generator(origin, destination, walk_radius)
+    def generate_route(self, origin, destination, walk_radius, options=None):
+        """Generate a route between origin and destination.
+
+        Uses the CSR engine over the graph snapshot when one has been built,
+        otherwise the NetworkX-based ``route_generator`` (which ignores
+        ``options``).
+        """
+        return self.plan_route(origin, destination, walk_radius, options)[0]
+
+    def plan_route(self, origin, destination, walk_radius, options=None):
+        """Generate a route and report whether the search completed.
+
+        Returns ``(route, complete, reason)``. Only the CSR engine enforces
+        search budgets, so the legacy generator's results are always complete.
+        Complete results are cached per ``coalesce_key``. Concurrent requests
+        with the same key wait for the first one and share its result. Only
+        requests that search pass the admission gate, which raises
+        ``AdmissionRejected`` when the service is saturated.
+        """
+        metrics.increment('route_requests')
+        key = coalesce_key(origin, destination, walk_radius, options)
+        cache_key = _cache_key(get_engine(), key)
+        cache = _route_result_cache()
+        if cache is not None:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                route, warmed = cached
+                metrics.increment('route_cache_hits')
+                if warmed:
+                    metrics.increment('route_cache_warm_hits')
+                return route, True, None
+
+        search = lambda: _admitted(lambda: self._plan_route(origin, destination, walk_radius, options))
+        flight = _single_flight()
+        if flight is None:
+            route, complete, reason = search()
+        else:
+            (route, complete, reason), source = flight.do(key, search)
+            if source is not None:
+                metrics.increment('route_coalesced')
+                if source == 'process':
+                    metrics.increment('route_coalesced_cross_process')
+        if cache is not None and complete:
+            cache.set(cache_key, (route, False))
+        return route, complete, reason
+
+    def warm_route(self, origin, destination, walk_radius):
+        """Precompute a route into the result cache used by ``plan_route``.
+
+        Uses default options, as a request without ``options`` would, and
+        bypasses admission control and request metrics. Returns True when a
+        new entry was cached.
+        """
+        cache = _route_result_cache()
+        if cache is None:
+            return False
+        from route_generation.models.route_models import RouteOptions
+        options = RouteOptions.from_dict({})
+        engine = get_engine()
+        cache_key = _cache_key(engine, coalesce_key(origin, destination, walk_radius, options))
+        if cache.get(cache_key) is not None:
+            return False
+        if engine is not None:
+            plan = engine.plan_route(origin, destination, walk_radius, options)
+            route, complete = plan.routes, plan.complete
+        else:
+            route, complete = load_routing_engine()(origin, destination, walk_radius), True
+        if not complete:
+            return False
+        cache.set(cache_key, (route, True))
+        metrics.increment('route_cache_warmed')
+        return True
+
+    def _plan_route(self, origin, destination, walk_radius, options=None):
+        """Run the route search for ``plan_route``."""
+        engine = get_engine()
+        if engine is not None:
+            plan = engine.plan_route(origin, destination, walk_radius, options)
+            if plan.fast_path:
+                metrics.increment('route_fast_path_hits')
+            if not plan.complete:
+                metrics.increment('route_incomplete')
+            return plan.routes, plan.complete, plan.reason
+        route_generator = load_routing_engine()
+        return route_generator(origin, destination, walk_radius), True, None
+
+    def route_matrix(self, origins, destinations, walk_radius):
+        """Fare, distance and transfer count between every origin and destination.
+
+        Returns the matrix as a dict of row-major lists, or None when no graph
+        snapshot has been built (the legacy generator has no matrix search).
+        The search goes through the same admission gate as ``plan_route``.
+        """
+        engine = get_engine()
+        if engine is None:
+            return None
+        metrics.increment('route_matrix_requests')
+        matrix = _admitted(lambda: engine.route_matrix(origins, destinations, walk_radius))
+        if not matrix.complete:
+            metrics.increment('route_matrix_incomplete')
+        round_row = lambda row, digits: [round(value, digits) if value is not None else None for value in row]
+        return {
+            "origins": len(origins),
+            "destinations": len(destinations),
+            "fare": [round_row(row, 2) for row in matrix.fare],
+            "distance_km": [round_row(row, 3) for row in matrix.distance_km],
+            "transfers": matrix.transfers,
+            "complete": matrix.complete,
+            "reason": matrix.reason,
+            "direction": matrix.direction,
+        }
     
-    def store_route_in_history(self, user_id, origin, destination, route):
+    def reachable(self, origin, max_fare, max_transfers, walk_radius):
+        """Route stretches reachable from ``origin`` within a fare and transfer budget.
+
+        The origin is snapped to the centre of its ``REACHABLE_CELL_DEG`` grid
+        cell and results are cached per cell and budget, so nearby requests
+        share one search; only cache misses pass the admission gate. Returns
+        None when no graph snapshot has been built.
+        """
+        engine = get_engine()
+        if engine is None:
+            return None
+        metrics.increment('reachable_requests')
+        cell = _setting('REACHABLE_CELL_DEG')
+        column, row = math.floor(origin[0] / cell), math.floor(origin[1] / cell)
+        key = (engine.network.network_id, column, row, float(max_fare), int(max_transfers), float(walk_radius))
+
+        cache = _reachability_cache()
+        result = cache.get(key)
+        if result is not None:
+            metrics.increment('reachable_cache_hits')
+            return result
+
+        metrics.increment('reachable_cache_misses')
+        snapped = (round((column + 0.5) * cell, 7), round((row + 0.5) * cell, 7))
+        result = _admitted(lambda: engine.reachable(snapped, walk_radius, max_fare, max_transfers))
+        result["properties"] = {
+            "origin": {"lng": snapped[0], "lat": snapped[1]},
+            "max_fare": max_fare,
+            "max_transfers": max_transfers,
+            "walk_radius": walk_radius,
+        }
+        cache.set(key, result)
+        return result
+
+    def store_route_in_history(self, user_id, origin, destination, route, walk_radius=None):
         """Store route in user's history."""
         if not self.mongo:
             raise RuntimeError("Database connection not available")
@@ -31,6 +308,7 @@ class RouteService:
             "user_id": user_id,
             "origin": origin,
             "destination": destination,
+            "walk_radius": walk_radius,
             "route": route,
             "timestamp": datetime.now(tz),
         })
@@ -70,13 +348,21 @@ class RouteService:
             {"_id": 0, "jeepney_route_id": 0}
         )
     
-    def get_cached_route(self, route_name):
-        """Get route by route name."""
+    def get_cached_route(self, route_name, packed=False):
+        """Get route by route name.
+
+        A packed polyline is expanded into a ``coordinates`` list unless
+        ``packed`` is set, in which case the document is returned as stored.
+        """
         if not self.mongo:
             raise RuntimeError("Database connection not available")
             
         collection = self.mongo.db.jeepney_routes
-        return collection.find_one(
+        route = collection.find_one(
             {"name": route_name}, 
             {"_id": 0, "name": 0, "uid": 0}
         )
+        if route is None or packed:
+            return route
+        from route_generation.services.graph_snapshot import expand_polyline
+        return expand_polyline(route)
@@ -0,0 +1,37 @@
+from flask import current_app
+from services import autocomplete, poi_index
+
+
+class SearchService:
+    """Service class for name autocomplete over POIs and routes."""
+
+    def __init__(self):
+        self.mongo = current_app.extensions['pymongo']
+
+    def _build_index(self):
+        config = current_app.config
+        db = self.mongo.db
+        pois = poi_index.get_index(db.iloilo_pois, config['POI_INDEX_CELL_DEG'], config['POI_INDEX_TTL'])
+
+        def nearest_poi(lng, lat):
+            found = pois.nearby(lng, lat, autocomplete.POPULARITY_RADIUS_M, 1)
+            return found[0][1].get('name') if found else None
+
+        return autocomplete.build_index(
+            db,
+            poi_lookup=nearest_poi,
+            popularity_weight=config['AUTOCOMPLETE_POPULARITY_WEIGHT'],
+            history_limit=config['AUTOCOMPLETE_HISTORY_LIMIT'],
+        )
+
+    def search(self, query, limit=10):
+        """POI and route names matching ``query``, best first."""
+        app = current_app._get_current_object()
+
+        def build():
+            # Rebuilds run on a background thread, outside this request
+            with app.app_context():
+                return self._build_index()
+
+        index = autocomplete.get_index(build, app.config['AUTOCOMPLETE_INDEX_TTL'])
+        return index.search(query, limit)
@@ -0,0 +1,119 @@
+"""
+Local cache of pre-rendered route tiles.
+
+Tiles for a snapshot live under ``TILE_CACHE_DIR/<network_id>/z/x/y.json``.
+Each worker starts generating them in a background thread once it has
+initialised, and again when it maps a new snapshot; never in the gunicorn
+master, whose threads would not survive the fork. A lock file makes sure
+only one worker per host does the work, and that worker then removes the
+directories of superseded snapshots. Until generation completes, missing
+tiles are rendered on request.
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+from flask import current_app, has_app_context
+from config import Config
+
+_lock = threading.Lock()
+_started = set()
+
+
+def _setting(name):
+    """Config value, with or without an app context."""
+    if has_app_context():
+        return current_app.config[name]
+    return getattr(Config, name)
+
+
+def zoom_range():
+    return _setting('TILE_MIN_ZOOM'), _setting('TILE_MAX_ZOOM')
+
+
+def tile_directory(network):
+    return os.path.join(_setting('TILE_CACHE_DIR'), network.network_id)
+
+
+def _generate(network, directory, min_zoom, max_zoom):
+    import fcntl
+    from route_generation.services.tiles import generate_tiles
+
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, '.lock'), 'w') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            logging.info("Route tiles are being generated by another worker")
+            return
+        try:
+            generate_tiles(network, directory, min_zoom, max_zoom)
+        except Exception as e:
+            logging.error(f"Route tile generation failed: {e}")
+            return
+    _prune(os.path.dirname(directory), network.network_id)
+
+
+def _prune(root, network_id):
+    """Remove tile directories of other snapshots that nobody is generating."""
+    import fcntl
+
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if name == network_id or not os.path.isdir(path):
+            continue
+        try:
+            with open(os.path.join(path, '.lock'), 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                shutil.rmtree(path, ignore_errors=True)
+        except BlockingIOError:
+            continue
+        except OSError as e:
+            logging.warning(f"Could not remove superseded tiles {path}: {e}")
+            continue
+        logging.info(f"Removed superseded route tiles {path}")
+
+
+def pregenerate(network):
+    """Start generating ``network``'s tiles in the background, once per process."""
+    from route_generation.services.tiles import COMPLETE_MARKER
+
+    if not _setting('TILE_PREGENERATE'):
+        return None
+    directory = tile_directory(network)
+    with _lock:
+        if network.network_id in _started or os.path.exists(os.path.join(directory, COMPLETE_MARKER)):
+            return None
+        _started.add(network.network_id)
+    min_zoom, max_zoom = zoom_range()
+    thread = threading.Thread(target=_generate, args=(network, directory, min_zoom, max_zoom),
+                              name='route-tiles', daemon=True)
+    thread.start()
+    return thread
+
+
+def get_tile(network, zoom, x, y):
+    """Encoded GeoJSON for one tile, from the cache or rendered now."""
+    from route_generation.services.tiles import COMPLETE_MARKER, EMPTY_TILE, render_tile, tile_path
+
+    directory = tile_directory(network)
+    try:
+        with open(tile_path(directory, zoom, x, y), 'rb') as fh:
+            return fh.read()
+    except FileNotFoundError:
+        pass
+    if os.path.exists(os.path.join(directory, COMPLETE_MARKER)):
+        return EMPTY_TILE
+    return render_tile(network, zoom, x, y)
+
+
+def status(network):
+    """Generation state of ``network``'s tile cache, for diagnostics."""
+    from route_generation.services.tiles import COMPLETE_MARKER
+
+    try:
+        with open(os.path.join(tile_directory(network), COMPLETE_MARKER), 'r') as fh:
+            return dict(json.load(fh), complete=True)
+    except (OSError, ValueError):
+        return {'complete': False, 'generating': network.network_id in _started}
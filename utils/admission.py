@@ -0,0 +1,163 @@
+"""
+Admission control for expensive requests.
+
+An ``AdmissionGate`` caps how many route searches run at once, so a burst of
+route requests cannot tie up every worker while cheap endpoints such as
+``/health`` and ``/auth/refresh`` wait behind them. Callers beyond the limit
+queue for a slot. A caller is turned away with ``AdmissionRejected`` at once
+when the queue is full or its expected wait is over budget, and otherwise
+once it has waited out the budget.
+
+The limit applies per process and, when a directory is given, across every
+worker on the host through a fixed set of ``flock``-ed slot files. The
+kernel drops a dead worker's locks, so a crash never leaks a slot.
+"""
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Poll interval while waiting for a host-wide slot
+SLOT_POLL_SECONDS = 0.005
+
+# Weight of the newest sample in the moving average of service time
+SERVICE_TIME_ALPHA = 0.2
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is not admitted.
+
+    ``reason`` is ``'queue_full'``, ``'overloaded'`` (expected wait over
+    budget) or ``'timeout'``; ``retry_after`` is a whole number of seconds.
+    """
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Request not admitted ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionGate:
+    """At most ``limit`` holders per process (and ``host_limit`` per host).
+
+    Up to ``queue_size`` callers wait for a slot, each for at most
+    ``max_wait`` seconds. The host-wide gate is used only when ``directory``
+    is set.
+    """
+
+    def __init__(self, limit, queue_size, max_wait, directory=None, host_limit=None):
+        self.limit = max(1, limit)
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.directory = directory
+        self.host_limit = max(1, host_limit or self.limit)
+        self._condition = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        self._service_seconds = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @contextmanager
+    def admit(self):
+        """Hold a slot for the body of the ``with`` block."""
+        deadline = time.monotonic() + self.max_wait
+        self._enter_process(deadline)
+        try:
+            held = self._enter_host(deadline) if self.directory else ()
+            started = time.monotonic()
+            try:
+                yield
+            finally:
+                self._observe(time.monotonic() - started)
+                for fd in held:
+                    os.close(fd)
+        finally:
+            with self._condition:
+                self._active -= 1
+                self._condition.notify()
+
+    def stats(self):
+        """Current holders, waiters and mean service time in this process."""
+        with self._condition:
+            return {'active': self._active, 'waiting': self._waiting,
+                    'service_seconds': self._service_seconds}
+
+    def _expected_wait(self, ahead, slots):
+        """Seconds until a caller with ``ahead`` waiters in front gets a slot."""
+        if self._service_seconds is None:
+            return None
+        return (ahead // slots + 1) * self._service_seconds
+
+    def _rejected(self, reason, expected=None):
+        if expected is None:
+            expected = self._service_seconds or 1.0
+        logging.warning(f"Route request not admitted: {reason}")
+        return AdmissionRejected(reason, max(1, math.ceil(expected)))
+
+    def _observe(self, seconds):
+        with self._condition:
+            if self._service_seconds is None:
+                self._service_seconds = seconds
+            else:
+                self._service_seconds += SERVICE_TIME_ALPHA * (seconds - self._service_seconds)
+
+    def _enter_process(self, deadline):
+        with self._condition:
+            if self._active >= self.limit:
+                if self._waiting >= self.queue_size:
+                    raise self._rejected('queue_full')
+                expected = self._expected_wait(self._waiting, self.limit)
+                if expected is not None and expected > self.max_wait:
+                    raise self._rejected('overloaded', expected)
+                self._waiting += 1
+                try:
+                    while self._active >= self.limit:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise self._rejected('timeout')
+                        self._condition.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            self._active += 1
+
+    def _enter_host(self, deadline):
+        """Take a queue ticket, then a run slot; returns the held descriptors.
+
+        Tickets and slots are taken lowest-numbered first, so the busy files
+        passed over on the way to a free ticket estimate the host's queue.
+        """
+        ticket, busy = self._try_lock('queue', self.host_limit + self.queue_size)
+        if ticket is None:
+            raise self._rejected('queue_full')
+        try:
+            ahead = busy - self.host_limit
+            if ahead >= 0:
+                expected = self._expected_wait(ahead, self.host_limit)
+                if expected is not None and expected > self.max_wait:
+                    raise self._rejected('overloaded', expected)
+            while True:
+                slot, _ = self._try_lock('run', self.host_limit)
+                if slot is not None:
+                    return ticket, slot
+                if time.monotonic() >= deadline:
+                    raise self._rejected('timeout')
+                time.sleep(SLOT_POLL_SECONDS)
+        except BaseException:
+            os.close(ticket)
+            raise
+
+    def _try_lock(self, prefix, count):
+        """``(fd, busy)``: a newly locked ``prefix`` file and how many were taken."""
+        import fcntl
+
+        for index in range(count):
+            fd = os.open(os.path.join(self.directory, f"{prefix}-{index}.lock"), os.O_CREAT | os.O_RDWR, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd, index
+            except BlockingIOError:
+                os.close(fd)
+        return None, count
@@ -1,8 +1,6 @@
 from functools import wraps
 from flask import request, jsonify, current_app
 import logging
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
 from datetime import datetime, timedelta
 import pytz
 from config import Config
@@ -55,6 +53,8 @@ def auth_middleware(f):
         # Check if the token is in the database
         user_info = get_token_from_db(token)
         if not user_info:
+            from google.oauth2 import id_token
+            from google.auth.transport import requests as google_requests
             try:
                 user_info = id_token.verify_oauth2_token(
                     token, google_requests.Request(), Config.GOOGLE_CLIENT_ID
@@ -0,0 +1,144 @@
+"""
+Flask CLI commands.
+"""
+import json
+import subprocess
+import sys
+import click
+
+# Run in a fresh interpreter so that nothing is already imported
+_STARTUP_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+from app_new import create_app
+app = create_app(sys.argv[1])
+app_ready = time.perf_counter()
+from services.route_service import load_routing_engine
+from services.network_service import get_network
+with app.app_context():
+    load_routing_engine()
+    engine_ready = time.perf_counter()
+    get_network()
+snapshot_ready = time.perf_counter()
+print(json.dumps({
+    "create_app_s": app_ready - start,
+    "engine_load_s": engine_ready - app_ready,
+    "snapshot_map_s": snapshot_ready - engine_ready,
+}))
+'''
+
+
+def parse_importtime(stderr):
+    """Parse ``python -X importtime`` output into (module, self_us, cumulative_us)."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        rows.append((module[1:].rstrip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def register_commands(app):
+    """Register custom CLI commands on the application."""
+
+    @app.cli.command('startup-profile')
+    @click.option('--config', 'config_name', default='production', help='Configuration to start with.')
+    @click.option('--top', default=25, help='Number of modules to list.')
+    def startup_profile(config_name, top):
+        """Report import time per module and time spent loading the graph."""
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', _STARTUP_SCRIPT, config_name],
+            capture_output=True, text=True, cwd=app.root_path
+        )
+        rows = parse_importtime(result.stderr)
+        if result.returncode != 0:
+            click.echo(result.stderr.splitlines()[-1] if result.stderr else 'startup failed', err=True)
+            sys.exit(result.returncode)
+
+        timings = json.loads(result.stdout.strip().splitlines()[-1])
+        # Top-level entries (no leading indentation) are what startup pays for
+        top_level = [row for row in rows if not row[0].startswith(' ')]
+        click.echo(f"create_app:  {timings['create_app_s'] * 1000:8.1f} ms")
+        click.echo(f"graph load:  {timings['engine_load_s'] * 1000:8.1f} ms")
+        click.echo(f"snapshot:    {timings['snapshot_map_s'] * 1000:8.1f} ms")
+        click.echo(f"imports:     {sum(r[2] for r in top_level) / 1000:8.1f} ms across {len(rows)} modules\n")
+        click.echo(f"{'cumulative ms':>14} {'self ms':>9}  module")
+        for module, self_us, cumulative_us in sorted(rows, key=lambda r: r[2], reverse=True)[:top]:
+            click.echo(f"{cumulative_us / 1000:14.1f} {self_us / 1000:9.1f}  {module}")
+
+    @app.cli.command('build-graph-snapshot')
+    @click.option('--output', default=None, help='Snapshot path (defaults to GRAPH_SNAPSHOT_PATH).')
+    @click.option('--cell-size', type=float, default=None, help='Spatial index cell size in degrees.')
+    @click.option('--transfer-walk', type=float, default=None,
+                  help='Longest walking transfer in metres (defaults to TRANSFER_MAX_WALK_METERS).')
+    @click.option('--landmarks', type=int, default=None,
+                  help='ALT landmarks to precompute (defaults to GRAPH_LANDMARK_COUNT, 0 disables).')
+    def build_graph_snapshot(output, cell_size, transfer_walk, landmarks):
+        """Compile jeepney_routes into a memory-mappable graph snapshot."""
+        from services.network_service import build_snapshot
+
+        network = build_snapshot(output, cell_size, transfer_walk, landmarks)
+        footprint = network.memory_footprint()
+        click.echo(
+            f"Snapshot {network.network_id}: {network.route_count} routes, {network.node_count} nodes, "
+            f"{network.edge_count} edges ({network.metadata.get('transfer_count', 0)} transfers), "
+            f"{network.metadata.get('landmark_count', 0)} landmarks, "
+            f"{sum(footprint.values()) / 1048576:.1f} MiB"
+        )
+        click.echo(f"Written to {output or app.config['GRAPH_SNAPSHOT_PATH']}")
+
+    @app.cli.command('build-coverage')
+    @click.option('--output', default=None, help='Grid path (defaults to COVERAGE_PATH).')
+    @click.option('--cell-size', type=float, default=None, help='Cell size in degrees (defaults to COVERAGE_CELL_DEG).')
+    @click.option('--max-distance', type=float, default=None,
+                  help='Farthest distance measured in metres (defaults to COVERAGE_MAX_DISTANCE_M).')
+    def build_coverage(output, cell_size, max_distance):
+        """Compute the walk-access coverage grid from the graph snapshot."""
+        from services.coverage_service import build_coverage as build
+
+        try:
+            grid = build(output, cell_size, max_distance)
+        except (RuntimeError, ValueError) as e:
+            click.echo(str(e), err=True)
+            sys.exit(1)
+        rows, cols = grid.shape
+        within = app.config['COVERAGE_WALK_METERS']
+        covered = int((grid.distance_m <= within).sum())
+        click.echo(
+            f"Coverage {rows}x{cols} cells of {grid.cell_deg} deg for network {grid.metadata['network_id']}: "
+            f"{covered / grid.distance_m.size:.1%} within {within:g} m of a route"
+        )
+        click.echo(f"Written to {output or app.config['COVERAGE_PATH']}")
+
+    @app.cli.command('migrate-polylines')
+    @click.option('--batch-size', type=int, default=500, help='Routes per bulk_write.')
+    @click.option('--drop-legacy', is_flag=True,
+                  help='Remove the nested-array coordinate fields once packed.')
+    def migrate_polylines(batch_size, drop_legacy):
+        """Store jeepney_routes polylines as packed float64 binary."""
+        from services.network_service import migrate_polylines as migrate
+
+        report = migrate(batch_size, drop_legacy)
+        click.echo(
+            f"{report['scanned']} routes scanned: {report['migrated']} packed, "
+            f"{report['legacy_dropped']} legacy fields dropped, {report['skipped']} skipped"
+        )
+
+    @app.cli.command('import-pois')
+    @click.argument('source', type=click.File('r', encoding='utf-8'))
+    @click.option('--chunk-size', type=click.IntRange(min=1), default=None,
+                  help='POIs per bulk_write (default 1000).')
+    def import_pois(source, chunk_size):
+        """Upsert POIs from an NDJSON or GeoJSON file ("-" for stdin), keyed on poi_id."""
+        from services.poi_service import POIService
+
+        report = POIService().bulk_import(source, chunk_size)
+        click.echo(
+            f"{report['received']} records: {report['upserted']} inserted, {report['modified']} updated, "
+            f"{report['matched'] - report['modified']} unchanged, {report['failed']} failed"
+        )
+        for failure in report['failures']:
+            click.echo(f"  item {failure['item']}: {failure['error']}", err=True)
+        if report['failed'] > len(report['failures']):
+            click.echo(f"  ... and {report['failed'] - len(report['failures'])} more", err=True)
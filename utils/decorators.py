@@ -1,6 +1,7 @@
 from functools import wraps
 from flask import jsonify
 import logging
+from utils.admission import AdmissionRejected
 
 
 def handle_errors(f):
@@ -9,6 +10,9 @@ def handle_errors(f):
     def decorated_function(*args, **kwargs):
         try:
             return f(*args, **kwargs)
+        except AdmissionRejected as e:
+            return jsonify({"error": "Service busy, retry later", "reason": e.reason}), 503, \
+                {"Retry-After": str(e.retry_after)}
         except Exception as e:
             logging.error(f"An error occurred in {f.__name__}: {e}")
             return jsonify({"error": "An error occurred", "message": str(e)}), 500
@@ -0,0 +1,46 @@
+"""
+Process-local counters exposed on ``/metrics``.
+
+Each gunicorn worker keeps its own counts; scrape every worker (or sum the
+per-pid snapshots) for service-wide numbers.
+"""
+import os
+import threading
+import time
+
+_lock = threading.Lock()
+_counters = {}
+_started = time.time()
+
+# Derived rates reported alongside the raw counters: name -> (numerator, denominator)
+RATES = {
+    'route_fast_path_hit_rate': ('route_fast_path_hits', 'route_requests'),
+    'route_coalesced_rate': ('route_coalesced', 'route_requests'),
+    'route_cache_hit_rate': ('route_cache_hits', 'route_requests'),
+    'route_cache_warm_hit_rate': ('route_cache_warm_hits', 'route_requests'),
+    'route_admission_reject_rate': ('route_admission_rejected', 'route_requests'),
+    'reachable_cache_hit_rate': ('reachable_cache_hits', 'reachable_requests'),
+}
+
+
+def increment(name, amount=1):
+    """Add ``amount`` to counter ``name``."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def snapshot():
+    """Counters and derived rates for this worker."""
+    with _lock:
+        counters = dict(_counters)
+    rates = {}
+    for name, (numerator, denominator) in RATES.items():
+        total = counters.get(denominator, 0)
+        rates[name] = round(counters.get(numerator, 0) / total, 4) if total else None
+    return {
+        'pid': os.getpid(),
+        'uptime_seconds': round(time.time() - _started, 1),
+        'counters': counters,
+        'rates': rates,
+    }
+
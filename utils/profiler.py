@@ -0,0 +1,120 @@
+"""
+On-demand stack sampling profiler for live workers.
+
+Nothing runs until a profile is requested: a signal handler (installed from
+``gunicorn.conf.py``) starts a background thread that samples the stacks of
+the worker's other threads for a fixed duration and writes them in
+collapsed-stack format, ready for ``flamegraph.pl`` or speedscope. Frames
+are prefixed with the request stage recorded by ``utils.request_logging``
+so route-generation stages show up as their own flamegraph towers.
+"""
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+
+# Checked by the request logger before recording stages, so stage tracking
+# costs nothing while no profile is running.
+active = False
+
+_thread_stages = {}
+_lock = threading.Lock()
+
+
+def push_stage(name):
+    """Mark the calling thread as being in ``name``; return the previous stage."""
+    ident = threading.get_ident()
+    previous = _thread_stages.get(ident)
+    _thread_stages[ident] = name
+    return previous
+
+
+def pop_stage(previous):
+    """Restore the stage returned by ``push_stage``."""
+    ident = threading.get_ident()
+    if previous is None:
+        _thread_stages.pop(ident, None)
+    else:
+        _thread_stages[ident] = previous
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    module = frame.f_globals.get('__name__', os.path.basename(code.co_filename))
+    return f"{module}:{code.co_name}"
+
+
+class StackSampler(threading.Thread):
+    """Samples every other thread's stack at a fixed interval."""
+
+    def __init__(self, duration, interval, output_path):
+        super().__init__(name='stack-sampler', daemon=True)
+        self.duration = duration
+        self.interval = interval
+        self.output_path = output_path
+        self.samples = Counter()
+        self.sample_count = 0
+
+    def run(self):
+        global active
+        own_ident = threading.get_ident()
+        deadline = time.monotonic() + self.duration
+        try:
+            while time.monotonic() < deadline:
+                for ident, frame in sys._current_frames().items():
+                    if ident == own_ident:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(_frame_label(frame))
+                        frame = frame.f_back
+                    stack.reverse()
+                    stage = _thread_stages.get(ident)
+                    if stage:
+                        stack.insert(0, f"stage:{stage}")
+                    self.samples[';'.join(stack)] += 1
+                self.sample_count += 1
+                time.sleep(self.interval)
+        finally:
+            with _lock:
+                active = False
+                _thread_stages.clear()
+            self.write()
+
+    def write(self):
+        with open(self.output_path, 'w') as fh:
+            for stack, count in self.samples.most_common():
+                fh.write(f"{stack} {count}\n")
+        logging.info(
+            "Profile written to %s (%d samples, %d distinct stacks)",
+            self.output_path, self.sample_count, len(self.samples)
+        )
+
+
+def start_profile(duration=None, interval=None, output_dir=None):
+    """Start sampling this process; returns the output path or None if busy."""
+    global active
+    duration = duration or float(os.getenv('PROFILE_SECONDS', '30'))
+    interval = interval or float(os.getenv('PROFILE_INTERVAL_MS', '5')) / 1000.0
+    output_dir = output_dir or os.getenv('PROFILE_DIR', '/tmp')
+
+    with _lock:
+        if active:
+            logging.warning("Profile already running in worker %s", os.getpid())
+            return None
+        active = True
+
+    output_path = os.path.join(
+        output_dir, f"publink-{os.getpid()}-{int(time.time())}.collapsed"
+    )
+    StackSampler(duration, interval, output_path).start()
+    logging.info("Profiling worker %s for %.0fs", os.getpid(), duration)
+    return output_path
+
+
+def install_signal_handler(signum=signal.SIGUSR2):
+    """Start a profile whenever this process receives ``signum``."""
+    signal.signal(signum, lambda *_: start_profile())
@@ -0,0 +1,165 @@
+"""
+Structured request logging.
+
+Emits one record per request with stage timings instead of ad-hoc INFO
+lines, samples payload-level debug logs and defers all formatting until a
+record is actually emitted. Optionally moves handler I/O off the request
+thread through a queue listener.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from flask import g, request, has_request_context
+from utils import profiler
+
+request_logger = logging.getLogger('publink.request')
+
+# Headers that may carry credentials are never written to the logs
+REDACTED_HEADERS = {'authorization', 'cookie', 'x-api-key'}
+
+_queue_listener = None
+
+
+class LazyJSON:
+    """Defer ``json.dumps`` until the logging record is formatted."""
+
+    __slots__ = ('payload',)
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def __str__(self):
+        return json.dumps(self.payload, default=str, separators=(',', ':'))
+
+
+class RequestLog:
+    """Per-request timing and sampling state, stored on ``flask.g``."""
+
+    def __init__(self, sampled):
+        self.request_id = uuid.uuid4().hex[:16]
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.fields = {}
+        self.sampled = sampled
+
+    @contextmanager
+    def stage(self, name):
+        """Time a named stage of the request."""
+        previous = profiler.push_stage(name) if profiler.active else None
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if profiler.active:
+                profiler.pop_stage(previous)
+            elapsed = (time.perf_counter() - start) * 1000.0
+            self.stages[name] = round(self.stages.get(name, 0.0) + elapsed, 3)
+
+    def annotate(self, **fields):
+        """Attach extra fields to the request record."""
+        self.fields.update(fields)
+
+    def debug_payload(self, label, value):
+        """Log a payload at DEBUG, only for sampled requests.
+
+        ``value`` may be a zero-argument callable so that building the payload
+        is skipped entirely for unsampled requests.
+        """
+        if self.sampled and request_logger.isEnabledFor(logging.DEBUG):
+            if callable(value):
+                value = value()
+            request_logger.debug("%s [%s]: %s", label, self.request_id, LazyJSON(value))
+
+    def to_dict(self, response):
+        total = (time.perf_counter() - self.started) * 1000.0
+        record = {
+            'request_id': self.request_id,
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'duration_ms': round(total, 3),
+            'stages_ms': self.stages,
+        }
+        if response.content_length is not None:
+            record['response_bytes'] = response.content_length
+        record.update(self.fields)
+        return record
+
+
+def current_request_log():
+    """Return the active ``RequestLog`` or a throwaway one outside requests."""
+    if has_request_context() and 'request_log' in g:
+        return g.request_log
+    return RequestLog(sampled=False)
+
+
+@contextmanager
+def log_stage(name):
+    """Shortcut for ``current_request_log().stage(name)``."""
+    with current_request_log().stage(name):
+        yield
+
+
+def redact_headers(headers):
+    """Return a dict of headers with credential-bearing values removed."""
+    return {
+        key: ('<redacted>' if key.lower() in REDACTED_HEADERS else value)
+        for key, value in headers.items()
+    }
+
+
+def init_request_logging(app):
+    """Register the per-request logging hooks on the application."""
+    sample_rate = app.config.get('REQUEST_LOG_SAMPLE_RATE', 0.0)
+
+    @app.before_request
+    def start_request_log():
+        g.request_log = RequestLog(sampled=random.random() < sample_rate)
+
+    @app.after_request
+    def emit_request_log(response):
+        log = g.pop('request_log', None)
+        if log is not None and request_logger.isEnabledFor(logging.INFO):
+            request_logger.info("request %s", LazyJSON(log.to_dict(response)))
+        return response
+
+    if app.config.get('REQUEST_LOG_ASYNC'):
+        enable_async_logging()
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Queue records unformatted so formatting also runs on the listener thread."""
+
+    def prepare(self, record):
+        return record
+
+
+def enable_async_logging():
+    """Route root handlers through a queue so I/O happens on a listener thread."""
+    global _queue_listener
+    if _queue_listener is not None:
+        return
+
+    root = logging.getLogger()
+    handlers = [h for h in root.handlers if not isinstance(h, _DeferredQueueHandler)]
+    if not handlers:
+        return
+
+    log_queue = queue.SimpleQueue()
+    for handler in handlers:
+        root.removeHandler(handler)
+    root.addHandler(_DeferredQueueHandler(log_queue))
+
+    _queue_listener = logging.handlers.QueueListener(
+        log_queue, *handlers, respect_handler_level=True
+    )
+    _queue_listener.start()
+    atexit.register(_queue_listener.stop)
+    logging.info("Asynchronous log handler enabled")
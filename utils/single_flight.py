@@ -0,0 +1,216 @@
+"""
+Single-flight request coalescing.
+
+Concurrent calls with the same key share one computation: the first caller
+(the leader) runs it and every caller that arrives while it is in flight
+waits for and receives the same result.
+
+``SingleFlight`` coalesces threads within one process. ``FileSingleFlight``
+extends this to every worker on a host with one ``flock``-ed file per key
+in a shared directory; the leader writes its JSON-serialisable result next
+to the lock before releasing it.
+"""
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+# Result files older than this are swept by leaders now and then
+STALE_RESULT_SECONDS = 60.0
+
+# Poll interval while waiting on another process's lock
+LOCK_POLL_SECONDS = 0.01
+
+# Returned by _wait_for_leader when its wait runs out
+_TIMED_OUT = object()
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with equal keys within this process."""
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Return ``(result, source)``.
+
+        ``source`` is None when this caller computed the result and
+        ``'thread'`` when it was shared by another thread. A follower that
+        times out waiting computes the result itself; exceptions raised by
+        the leader are re-raised in its followers.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if call.done.wait(self.timeout):
+                if call.error is not None:
+                    raise call.error
+                return call.result, 'thread'
+            logging.warning("Single-flight wait timed out; computing independently")
+            return fn(), None
+
+        try:
+            call.result = fn()
+            return call.result, None
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+
+class FileSingleFlight(SingleFlight):
+    """``SingleFlight`` that also coalesces across processes through ``directory``.
+
+    Results must be JSON-serialisable. ``source`` is ``'process'`` when the
+    result was computed by another worker.
+    """
+
+    def __init__(self, directory, timeout=None):
+        super().__init__(timeout)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def do(self, key, fn):
+        result, source = super().do(key, lambda: self._across_processes(key, fn))
+        if isinstance(result, _FromProcess):
+            return result.value, source or 'process'
+        return result, source
+
+    def _paths(self, key):
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        base = os.path.join(self.directory, digest)
+        return f"{base}.lock", f"{base}.json"
+
+    def _across_processes(self, key, fn):
+        import fcntl
+
+        lock_path, result_path = self._paths(key)
+        started = time.time_ns()
+        while True:
+            fd = os.open(lock_path, os.O_CREAT | os.O_RDWR, 0o644)
+            try:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    shared = self._wait_for_leader(fd, result_path, started)
+                    if shared is _TIMED_OUT:
+                        # As in SingleFlight: compute independently, leaving the
+                        # lock and result file to the leader
+                        return fn()
+                    if shared is not None:
+                        return _FromProcess(shared)
+                    # The leader failed before writing a result; lead in its place
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                if not _is_current(fd, lock_path):
+                    # Swept while we waited; lock the file other callers now see
+                    continue
+
+                result = fn()
+                self._write_result(result_path, result)
+                if random.random() < 0.01:
+                    self._sweep()
+                return result
+            finally:
+                os.close(fd)
+
+    def _wait_for_leader(self, fd, result_path, started):
+        """Wait for the other process's lock, then read what it wrote.
+
+        Returns the shared result, None when the leader wrote none, or
+        ``_TIMED_OUT`` once ``timeout`` has passed.
+        """
+        import fcntl
+
+        deadline = time.monotonic() + self.timeout if self.timeout else None
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if deadline is not None and time.monotonic() >= deadline:
+                    logging.warning("Cross-process single-flight wait timed out; computing independently")
+                    return _TIMED_OUT
+                time.sleep(LOCK_POLL_SECONDS)
+        try:
+            if os.stat(result_path).st_mtime_ns < started:
+                return None  # the leader failed before writing a result
+            with open(result_path, 'r', encoding='utf-8') as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _write_result(path, result):
+        temp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(temp_path, 'w', encoding='utf-8') as fh:
+            json.dump(result, fh, default=str)
+        os.replace(temp_path, path)
+
+    def _sweep(self):
+        """Remove stale result files, and lock files no caller holds."""
+        import fcntl
+
+        cutoff = time.time() - STALE_RESULT_SECONDS
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.stat(path).st_mtime >= cutoff:
+                    continue
+                if not name.endswith('.lock'):
+                    os.remove(path)
+                    continue
+                # A leader's lock keeps its mtime however long it runs, so
+                # only unlink locks that can be taken; callers that opened
+                # this one before the unlink notice and reopen the path
+                fd = os.open(path, os.O_RDWR)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    if _is_current(fd, path):
+                        os.remove(path)
+                except BlockingIOError:
+                    pass
+                finally:
+                    os.close(fd)
+            except OSError:
+                pass
+
+
+def _is_current(fd, path):
+    """Whether ``fd`` is still the file at ``path`` (not unlinked or replaced)."""
+    try:
+        current = os.stat(path)
+    except FileNotFoundError:
+        return False
+    opened = os.fstat(fd)
+    return (opened.st_dev, opened.st_ino) == (current.st_dev, current.st_ino)
+
+
+class _FromProcess:
+    """Marks a result that was read from another worker's result file."""
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value